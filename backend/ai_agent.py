@@ -3,34 +3,34 @@ ai_agent.py
 Description: Minimal interaction logic using the OpenAI public API only.
 Enhancement: Ask the model to return structured JSON (key_points, steps),
 and parse it with a safe fallback to plain text.
+Streaming: analyze_issue_stream() yields key points/steps as soon as each one is
+complete in the token stream, then the same normalized dict analyze_issue() returns.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator, Optional, Tuple
 import json
 import os
 try:
-	from .config import get_chat_client
+	from .config import get_chat_client, chat_timeout
+	from .llm_cache import cached_call, alookup as cache_lookup, astore as cache_store
 except Exception:
-	from config import get_chat_client
+	from config import get_chat_client, chat_timeout
+	from llm_cache import cached_call, alookup as cache_lookup, astore as cache_store
 
 
+# Bump when the prompt or response handling changes (invalidates cached reports)
+REPORT_PROMPT_VERSION = "1"
 
+# List fields of the report JSON, and the event type used for their elements when streaming
+REPORT_LIST_FIELDS = {"key_points": "key_point", "steps": "step"}
 
-async def analyze_issue(issue_description: str) -> Dict[str, Any]:
-	"""
-	Minimal analysis: summarize key points and next steps based on the description.
-	Returns a dict that always includes:
-	- model: str
-	- issue_description: str
-	- analysis: str (raw model text)
-	And, when possible, also includes parsed fields:
-	- key_points: List[str]
-	- steps: List[str]
-	"""
-	client, model = get_chat_client()
+
+def _report_model(model: Optional[str]) -> str:
 	# Ensure agent uses gpt-4o-mini by default unless explicitly overridden
-	model = os.getenv("OPENAI_MODEL", model or "gpt-4o-mini")
+	return os.getenv("OPENAI_MODEL", model or "gpt-4o-mini")
+
 
+def _build_prompts(issue_description: str) -> Tuple[str, str]:
 	system_prompt = (
 		"You are an e-commerce after-sales dispute assistant. Based on the user's issue description, "
 		"provide a concise summary of the key points and actionable next-step suggestions."
@@ -46,21 +46,25 @@ async def analyze_issue(issue_description: str) -> Dict[str, Any]:
 		"- key_points: bullet points summarizing the core problems.\n"
 		"- steps: up to 3 actionable next steps.\n"
 	)
+	return system_prompt, user_prompt
 
+
+def _load_report_json(content: str) -> Any:
+	"""
+	json.loads, falling back to the first {...} object when the model wraps it in text
+	(e.g. ``` fences); text after that object is ignored, as in ReportStreamParser.
+	"""
 	try:
-		resp = await client.chat.completions.create(
-			model=model,
-			messages=[
-				{"role": "system", "content": system_prompt},
-				{"role": "user", "content": user_prompt},
-			],
-		)
-		content = resp.choices[0].message.content if resp.choices else ""
-	except Exception as e:
-		# Keep behavior simple: log and return a stable object below
-		print(f"OpenAI API error: {str(e)}")
-		content = ""
+		return json.loads(content)
+	except ValueError:
+		start = content.find("{")
+		if start < 0:
+			raise
+		return json.JSONDecoder().raw_decode(content, start)[0]
+
 
+def normalize_report(model: str, issue_description: str, content: str, cached: bool) -> Dict[str, Any]:
+	"""Turn raw model text into the report dict (shared by the streaming and non-streaming paths)."""
 	# Try to parse the JSON shape { key_points: [...], steps: [...] }
 	key_points: List[str] = []
 	steps: List[str] = []
@@ -69,7 +73,7 @@ async def analyze_issue(issue_description: str) -> Dict[str, Any]:
 	if content:
 		# First, if content looks like JSON, try to parse it
 		try:
-			parsed = json.loads(content)
+			parsed = _load_report_json(content)
 			if isinstance(parsed, dict):
 				kp = parsed.get("key_points")
 				st = parsed.get("steps")
@@ -110,6 +114,192 @@ async def analyze_issue(issue_description: str) -> Dict[str, Any]:
 		"raw": content,
 		"key_points": key_points,
 		"steps": steps,
+		"cached": cached,
 	}
 
 
+class ReportStreamParser:
+	"""
+	Incremental scanner for a streamed JSON object. feed() returns (field, index, text)
+	for every element of a top-level key_points/steps array completed by the new chunk.
+	Elements are reported the way normalize_report() keeps them (strings and numbers,
+	stringified); anything before the opening brace or after the closing one is ignored.
+	"""
+
+	def __init__(self) -> None:
+		self._started = False
+		self._finished = False
+		self._depth = 0
+		self._in_str = False
+		self._esc = False
+		self._str: List[str] = []
+		self._scalar: List[str] = []
+		self._key: Optional[str] = None
+		self._expect_key = False
+		self._array: Optional[str] = None
+		self._counts = {field: 0 for field in REPORT_LIST_FIELDS}
+
+	def _emit(self, value: Any, out: List[Tuple[str, int, str]]) -> None:
+		field = self._array
+		if field is None or self._depth != 2:
+			return
+		if isinstance(value, (str, int, float)):
+			out.append((field, self._counts[field], str(value)))
+			self._counts[field] += 1
+
+	def _flush_scalar(self, out: List[Tuple[str, int, str]]) -> None:
+		if not self._scalar:
+			return
+		token = "".join(self._scalar)
+		self._scalar = []
+		try:
+			self._emit(json.loads(token), out)
+		except ValueError:
+			pass
+
+	def feed(self, chunk: str) -> List[Tuple[str, int, str]]:
+		out: List[Tuple[str, int, str]] = []
+		for ch in chunk:
+			if self._finished:
+				break
+			if not self._started:
+				if ch == "{":
+					self._started = True
+					self._depth = 1
+					self._expect_key = True
+				continue
+			if self._in_str:
+				if self._esc:
+					self._esc = False
+					self._str.append(ch)
+				elif ch == "\\":
+					self._esc = True
+					self._str.append(ch)
+				elif ch == '"':
+					self._in_str = False
+					try:
+						text = json.loads('"' + "".join(self._str) + '"')
+					except ValueError:
+						text = "".join(self._str)
+					if self._depth == 1 and self._expect_key:
+						self._key = text
+					else:
+						self._emit(text, out)
+				else:
+					self._str.append(ch)
+				continue
+			if ch == '"':
+				self._in_str = True
+				self._str = []
+			elif ch in "{[":
+				self._depth += 1
+				if self._depth == 2:
+					self._array = self._key if ch == "[" and self._key in REPORT_LIST_FIELDS else None
+			elif ch in "}]":
+				self._flush_scalar(out)
+				self._depth -= 1
+				if self._depth <= 1:
+					self._array = None
+				if self._depth == 0:
+					self._finished = True
+			elif ch == ",":
+				self._flush_scalar(out)
+				if self._depth == 1:
+					self._expect_key = True
+			elif ch == ":":
+				if self._depth == 1:
+					self._expect_key = False
+			elif ch.isspace():
+				self._flush_scalar(out)
+			else:
+				self._scalar.append(ch)
+		return out
+
+
+async def analyze_issue(issue_description: str, use_cache: bool = True) -> Dict[str, Any]:
+	"""
+	Minimal analysis: summarize key points and next steps based on the description.
+	Returns a dict that always includes:
+	- model: str
+	- issue_description: str
+	- analysis: str (raw model text)
+	- cached: bool (served from the LLM response cache; pass use_cache=False to bypass)
+	And, when possible, also includes parsed fields:
+	- key_points: List[str]
+	- steps: List[str]
+	"""
+	client, model = get_chat_client()
+	model = _report_model(model)
+	system_prompt, user_prompt = _build_prompts(issue_description)
+
+	async def _call() -> str:
+		resp = await client.chat.completions.create(
+			model=model,
+			messages=[
+				{"role": "system", "content": system_prompt},
+				{"role": "user", "content": user_prompt},
+			],
+			timeout=chat_timeout("report"),
+		)
+		return resp.choices[0].message.content if resp.choices else ""
+
+	cached = False
+	try:
+		content, cached = await cached_call(
+			"report", model, REPORT_PROMPT_VERSION, system_prompt, user_prompt, _call, use_cache
+		)
+	except Exception as e:
+		# Keep behavior simple: log and return a stable object below
+		print(f"OpenAI API error: {str(e)}")
+		content = ""
+
+	return normalize_report(model, issue_description, content, cached)
+
+
+async def analyze_issue_stream(issue_description: str, use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+	"""
+	Streaming variant of analyze_issue. Yields, in order:
+	- {"type": "start", "model": str}  (before the model is called, for time-to-first-byte)
+	- {"type": "key_point" | "step", "index": int, "text": str}  as each element completes
+	- {"type": "final", "report": dict}  identical to what analyze_issue() returns
+	Cached reports replay their elements through the same parser.
+	"""
+	client, model = get_chat_client()
+	model = _report_model(model)
+	system_prompt, user_prompt = _build_prompts(issue_description)
+	yield {"type": "start", "model": model}
+
+	parser = ReportStreamParser()
+	content = await cache_lookup("report", model, REPORT_PROMPT_VERSION, system_prompt, user_prompt) if use_cache else None
+	cached = content is not None
+	if cached:
+		for field, index, text in parser.feed(content):
+			yield {"type": REPORT_LIST_FIELDS[field], "index": index, "text": text}
+	else:
+		parts: List[str] = []
+		try:
+			stream = await client.chat.completions.create(
+				model=model,
+				messages=[
+					{"role": "system", "content": system_prompt},
+					{"role": "user", "content": user_prompt},
+				],
+				stream=True,
+				timeout=chat_timeout("report"),
+			)
+			async for chunk in stream:
+				delta = chunk.choices[0].delta.content if chunk.choices else None
+				if not delta:
+					continue
+				parts.append(delta)
+				for field, index, text in parser.feed(delta):
+					yield {"type": REPORT_LIST_FIELDS[field], "index": index, "text": text}
+			content = "".join(parts)
+			if use_cache:
+				await cache_store("report", model, REPORT_PROMPT_VERSION, system_prompt, user_prompt, content)
+		except Exception as e:
+			# Same outcome as the non-streaming path: log and fall back to an empty report
+			print(f"OpenAI API error: {str(e)}")
+			content = ""
+
+	yield {"type": "final", "report": normalize_report(model, issue_description, content, cached)}
@@ -0,0 +1,229 @@
+"""
+auth.py
+
+Login helpers that keep the database and the event loop out of the hot path:
+- an in-process user cache (email -> {id, email, role, password_hash}) with a TTL and
+  explicit invalidation (create_user calls invalidate_user); only hits are cached, so a
+  newly created user can log in right away
+- HMAC-SHA256 signed, expiring tokens that verify_token() checks without the database
+- bcrypt checks on a dedicated, bounded thread pool so a burst of logins cannot occupy
+  the default executor FastAPI uses for sync endpoints
+
+Token format: base64url(JSON claims) "." base64url(HMAC-SHA256(AUTH_SECRET, claims part)),
+claims = {sub: user id, email, role, iat, exp}.
+
+Configuration (environment):
+- AUTH_SECRET: signing key; set the same value on every worker. When unset a random
+  per-process key is used, so tokens stop verifying after a restart
+- AUTH_TOKEN_TTL: token lifetime in seconds (default 86400)
+- USER_CACHE_TTL: seconds a cached user is trusted (default 300)
+- USER_CACHE_MAX_ENTRIES: users kept in memory (default 10000)
+- AUTH_BCRYPT_WORKERS: threads for bcrypt (default 2)
+- AUTH_BCRYPT_MAX_PENDING: checks queued or running before logins get 503 (default 32)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+try:
+    import bcrypt  # type: ignore
+except Exception:
+    bcrypt = None  # type: ignore
+
+try:
+    from . import metrics
+    from .cache import LRUCache
+except Exception:
+    import metrics
+    from cache import LRUCache
+
+
+class InvalidToken(ValueError):
+    """Token is malformed, has a bad signature, or has expired."""
+
+
+class PasswordCheckBusy(RuntimeError):
+    """Too many bcrypt checks are already queued."""
+
+
+# ---------------------------------------------------------------------------
+# User cache
+# ---------------------------------------------------------------------------
+
+_USERS: Optional[LRUCache] = None
+
+
+def _user_cache() -> LRUCache:
+    global _USERS
+    if _USERS is None:
+        _USERS = LRUCache(
+            max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+            ttl=float(os.getenv("USER_CACHE_TTL", "300")) or None,
+        )
+    return _USERS
+
+
+def _user_key(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+def cached_user(email: str) -> Optional[Dict[str, Any]]:
+    user = _user_cache().get(_user_key(email))
+    metrics.incr("auth.user_cache.hit" if user is not None else "auth.user_cache.miss")
+    return user
+
+
+def remember_user(row: Any) -> Dict[str, Any]:
+    """Cache an AppUser row (as a plain dict, safe to use after its session is closed)."""
+    user = {
+        "id": getattr(row, "id", None),
+        "email": getattr(row, "email", None),
+        "role": getattr(row, "role", None),
+        "password_hash": getattr(row, "password_hash", None) or "",
+    }
+    _user_cache().set(_user_key(user["email"]), user)
+    return user
+
+
+def invalidate_user(email: str) -> None:
+    _user_cache().delete(_user_key(email))
+
+
+def public_user(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": user.get("id"), "email": user.get("email"), "role": user.get("role")}
+
+
+# ---------------------------------------------------------------------------
+# Signed tokens
+# ---------------------------------------------------------------------------
+
+_SECRET: Optional[bytes] = None
+
+
+def _secret() -> bytes:
+    global _SECRET
+    if _SECRET is None:
+        env = os.getenv("AUTH_SECRET")
+        if env:
+            _SECRET = env.encode("utf-8")
+        else:
+            print("[auth] AUTH_SECRET not set; using a random per-process key")
+            _SECRET = secrets.token_bytes(32)
+    return _SECRET
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _unb64(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _sign(body: bytes) -> bytes:
+    return base64.urlsafe_b64encode(hmac.new(_secret(), body, hashlib.sha256).digest()).rstrip(b"=")
+
+
+def issue_token(user: Dict[str, Any], ttl: Optional[float] = None) -> Dict[str, Any]:
+    """Returns {token, expires_at} for a user dict from the cache."""
+    now = int(time.time())
+    ttl = int(ttl if ttl is not None else float(os.getenv("AUTH_TOKEN_TTL", "86400")))
+    claims = {**public_user(user), "sub": user.get("id"), "iat": now, "exp": now + ttl}
+    claims.pop("id", None)
+    body = _b64(json.dumps(claims, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+    return {"token": f"{body}.{_sign(body.encode('ascii')).decode('ascii')}", "expires_at": claims["exp"]}
+
+
+def verify_token(token: str) -> Dict[str, Any]:
+    """
+    Check signature and expiry; returns the claims. Never touches the database.
+    Any bad input (wrong type, non-ASCII, bad base64/JSON, missing or non-numeric exp)
+    raises InvalidToken, never another exception.
+    """
+    try:
+        # Signature is checked on bytes: str compare_digest rejects non-ASCII with TypeError
+        body, sig = token.strip().encode("utf-8").split(b".")
+    except (AttributeError, UnicodeError, ValueError):
+        raise InvalidToken("malformed token")
+    if not hmac.compare_digest(sig, _sign(body)):
+        raise InvalidToken("bad signature")
+    try:
+        claims = json.loads(_unb64(body))
+        exp = claims["exp"]
+        if isinstance(exp, bool) or not isinstance(exp, (int, float)):
+            raise TypeError("exp is not a number")
+    except Exception:
+        raise InvalidToken("malformed token")
+    if exp <= time.time():
+        raise InvalidToken("token expired")
+    return claims
+
+
+# ---------------------------------------------------------------------------
+# Bounded bcrypt pool
+# ---------------------------------------------------------------------------
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+_PENDING = 0
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ThreadPoolExecutor(
+                    max_workers=max(1, int(os.getenv("AUTH_BCRYPT_WORKERS", "2"))),
+                    thread_name_prefix="bcrypt",
+                )
+    return _POOL
+
+
+def _checkpw(password: str, password_hash: str) -> bool:
+    try:
+        return bool(password_hash) and bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+    except Exception:
+        # Malformed hashes count as a mismatch
+        return False
+
+
+async def check_password(password: str, password_hash: str) -> bool:
+    """bcrypt.checkpw on the auth pool; raises PasswordCheckBusy when the pool's queue is full."""
+    global _PENDING
+    if bcrypt is None:
+        raise RuntimeError("bcrypt not installed on server")
+    max_pending = int(os.getenv("AUTH_BCRYPT_MAX_PENDING", "32"))
+    with _POOL_LOCK:
+        if _PENDING >= max_pending:
+            metrics.incr("auth.bcrypt.rejected")
+            raise PasswordCheckBusy(f"{_PENDING} password checks pending")
+        _PENDING += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_pool(), _checkpw, password, password_hash)
+    finally:
+        with _POOL_LOCK:
+            _PENDING -= 1
+
+
+def auth_stats() -> Dict[str, Any]:
+    return {"user_cache_entries": len(_user_cache()), "bcrypt_pending": _PENDING}
+
+
+def shutdown_auth() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,161 @@
+"""
+Benchmark: v_case_overview with the LATERAL latest-decision join vs. the denormalized
+case.latest_* columns from migrations/002_case_latest_decision.sql.
+
+Builds a scratch schema (bench_overview) in the configured PostgreSQL database, fills
+it with synthetic cases and eligibility decisions, creates both view variants and
+prints EXPLAIN (ANALYZE, BUFFERS) results for the dashboard queries:
+- page:      first page, ORDER BY case_id DESC LIMIT 50
+- filtered:  first page of eligibility_status = 'needs_review'
+- count:     count(*) of eligibility_status = 'eligible' (a full pass)
+- full:      the old unpaginated SELECT * ... ORDER BY case_id DESC
+"before" has only the original single-column idx_elig_case, as in final5620.sql.
+The schema is dropped afterwards unless --keep is given; real tables are not touched.
+
+Usage:
+    python -m backend.bench.case_overview [--decisions 1000000] [--cases 250000] [--plans] [--keep]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+try:
+    from ..case.database import DB_URL
+except Exception:
+    _HERE = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(os.path.dirname(_HERE), "case"))
+    from database import DB_URL  # type: ignore
+
+SCHEMA = "bench_overview"
+
+SETUP = """
+DROP SCHEMA IF EXISTS {s} CASCADE;
+CREATE SCHEMA {s};
+SET search_path = {s};
+CREATE TABLE "case" (
+    id bigserial PRIMARY KEY,
+    user_id bigint NOT NULL,
+    status text NOT NULL,
+    title text,
+    latest_summary text,
+    needs_review boolean DEFAULT false,
+    created_at timestamptz DEFAULT now(),
+    updated_at timestamptz DEFAULT now(),
+    latest_eligibility_status text,
+    latest_lenient_flag boolean,
+    latest_decided_at timestamptz
+);
+CREATE TABLE eligibility_decision (
+    id bigserial PRIMARY KEY,
+    case_id bigint NOT NULL REFERENCES "case"(id) ON DELETE CASCADE,
+    policy_snapshot_id bigint,
+    status text NOT NULL,
+    rationale text NOT NULL,
+    lenient_flag boolean DEFAULT false,
+    decided_at timestamptz DEFAULT now()
+);
+INSERT INTO "case" (user_id, status, title, latest_summary, needs_review, created_at, updated_at)
+SELECT 1 + (g % 5000), 'analysis_completed', 'Receipt Analysis', 'Key points: ...', false,
+       now() - (g || ' minutes')::interval, now() - (g || ' minutes')::interval
+  FROM generate_series(1, :cases) g;
+INSERT INTO eligibility_decision (case_id, status, rationale, lenient_flag, decided_at)
+SELECT 1 + (random() * (:cases - 1))::bigint,
+       (ARRAY['eligible', 'ineligible', 'needs_review'])[1 + (g % 3)],
+       'synthetic', (g % 7 = 0),
+       now() - ((random() * 100000)::int || ' minutes')::interval
+  FROM generate_series(1, :decisions) g;
+CREATE INDEX idx_elig_case ON eligibility_decision (case_id);
+UPDATE "case" c
+   SET latest_eligibility_status = d.status, latest_lenient_flag = d.lenient_flag, latest_decided_at = d.decided_at,
+       status = CASE WHEN d.status = 'eligible' THEN 'eligible'
+                     WHEN d.status = 'needs_review' THEN 'in_review' ELSE 'rejected' END,
+       needs_review = (d.status = 'needs_review')
+  FROM (SELECT DISTINCT ON (case_id) case_id, status, lenient_flag, decided_at
+          FROM eligibility_decision ORDER BY case_id, decided_at DESC) d
+ WHERE c.id = d.case_id;
+CREATE INDEX idx_case_elig_id ON "case" (latest_eligibility_status, id DESC);
+CREATE VIEW v_before AS
+ SELECT c.id AS case_id, c.user_id, c.status AS case_status, c.needs_review, c.latest_summary,
+        c.created_at, c.updated_at, ed.status AS eligibility_status, ed.lenient_flag, ed.decided_at
+   FROM "case" c
+   LEFT JOIN LATERAL (SELECT e.status, e.lenient_flag, e.decided_at
+                        FROM eligibility_decision e WHERE e.case_id = c.id
+                       ORDER BY e.decided_at DESC LIMIT 1) ed ON true;
+CREATE VIEW v_after AS
+ SELECT c.id AS case_id, c.user_id, c.status AS case_status, c.needs_review, c.latest_summary,
+        c.created_at, c.updated_at, c.latest_eligibility_status AS eligibility_status,
+        c.latest_lenient_flag AS lenient_flag, c.latest_decided_at AS decided_at
+   FROM "case" c;
+VACUUM ANALYZE "case";
+VACUUM ANALYZE eligibility_decision;
+"""
+
+QUERIES = {
+    "page": "SELECT * FROM {v} ORDER BY case_id DESC LIMIT 50",
+    "filtered": "SELECT * FROM {v} WHERE eligibility_status = 'needs_review' ORDER BY case_id DESC LIMIT 50",
+    "count": "SELECT count(*) FROM {v} WHERE eligibility_status = 'eligible'",
+    "full": "SELECT * FROM {v} ORDER BY case_id DESC",
+}
+
+
+def _explain(conn, sql: str) -> dict:
+    row = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).scalar()
+    return (json.loads(row) if isinstance(row, str) else row)[0]
+
+
+def _explain_text(conn, sql: str) -> str:
+    return "\n".join(r[0] for r in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")))
+
+
+def _buffers(plan: dict) -> int:
+    return int(plan.get("Shared Hit Blocks", 0)) + int(plan.get("Shared Read Blocks", 0))
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Case overview: LATERAL view vs. denormalized columns")
+    parser.add_argument("--decisions", type=int, default=1_000_000, help="Eligibility decisions to generate")
+    parser.add_argument("--cases", type=int, default=250_000, help="Cases to generate")
+    parser.add_argument("--runs", type=int, default=3, help="EXPLAIN ANALYZE runs per query (best is reported)")
+    parser.add_argument("--plans", action="store_true", help="Also print the text plans")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(DB_URL, future=True, isolation_level="AUTOCOMMIT")
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for stmt in SETUP.format(s=SCHEMA).split(";\n"):
+            if stmt.strip():
+                params = {k: v for k, v in (("cases", args.cases), ("decisions", args.decisions)) if f":{k}" in stmt}
+                conn.execute(text(stmt), params)
+        print(f"cases={args.cases} decisions={args.decisions} setup={time.perf_counter() - start:.1f}s")
+        try:
+            conn.execute(text(f"SET search_path = {SCHEMA}"))
+            print(f"{'query':<10} {'before ms':>11} {'after ms':>10} {'speedup':>8} {'buffers before/after':>22}")
+            for name, sql in QUERIES.items():
+                results = {}
+                for variant in ("v_before", "v_after"):
+                    q = sql.format(v=variant)
+                    runs = [_explain(conn, q) for _ in range(max(1, args.runs))]
+                    best = min(runs, key=lambda p: p["Execution Time"])
+                    results[variant] = best
+                    if args.plans:
+                        print(f"\n-- {name} / {variant}\n{_explain_text(conn, q)}\n")
+                before, after = results["v_before"], results["v_after"]
+                b_ms, a_ms = before["Execution Time"], after["Execution Time"]
+                print(
+                    f"{name:<10} {b_ms:>11.1f} {a_ms:>10.1f} {b_ms / max(a_ms, 1e-3):>7.1f}x "
+                    f"{_buffers(before['Plan']):>11}/{_buffers(after['Plan']):<10}"
+                )
+        finally:
+            if not args.keep:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
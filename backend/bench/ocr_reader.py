@@ -0,0 +1,61 @@
+"""
+Benchmark: cold vs. warm EasyOCR reader latency per page.
+
+"cold" rebuilds the reader before every page (what extract_text_from_image used to do),
+"warm" reuses the shared reader from ocr_utils.get_reader().
+
+Usage:
+    python -m backend.bench.ocr_reader [image ...] [--runs 3]
+
+Defaults to backend/scanned-receipt-example.webp when no images are given.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+try:
+    from .. import ocr_utils
+except Exception:
+    _HERE = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(_HERE))
+    import ocr_utils  # type: ignore
+
+
+def _time_page(image_path: str) -> float:
+    start = time.perf_counter()
+    ocr_utils.extract_text_from_image(image_path, use_preprocessing=True)
+    return time.perf_counter() - start
+
+
+def main(argv: list[str]) -> int:
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Cold vs. warm OCR reader latency")
+    parser.add_argument("images", nargs="*", default=[os.path.join(here, "scanned-receipt-example.webp")])
+    parser.add_argument("--runs", type=int, default=3, help="Pages timed per mode (per image)")
+    args = parser.parse_args(argv)
+
+    cold: list[float] = []
+    warm: list[float] = []
+    for img in args.images:
+        for _ in range(args.runs):
+            ocr_utils.clear_readers()
+            cold.append(_time_page(img))
+        ocr_utils.warm_reader()
+        for _ in range(args.runs):
+            warm.append(_time_page(img))
+
+    print(f"images={len(args.images)} runs={args.runs}")
+    for label, vals in (("cold", cold), ("warm", warm)):
+        print(
+            f"{label:>5}: mean={statistics.mean(vals):.3f}s "
+            f"median={statistics.median(vals):.3f}s min={min(vals):.3f}s max={max(vals):.3f}s"
+        )
+    print(f"speedup (median): {statistics.median(cold) / max(statistics.median(warm), 1e-9):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,222 @@
+"""
+Benchmark: receipt text parser throughput over a synthetic corpus.
+
+Generates thousands of Walmart-style receipt texts (with OCR noise such as split
+decimals, commas for dots and stray spaces), checks that parse_receipt_fields
+returns exactly what the original multi-pass parser returned, and times both.
+
+Usage:
+    python -m backend.bench.parser [--receipts 5000] [--seed 7] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Dict
+
+try:
+    from ..ocr_utils import parse_receipt_fields
+except Exception:
+    _HERE = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(_HERE))
+    from ocr_utils import parse_receipt_fields  # type: ignore
+
+
+# Original implementation, kept verbatim as the reference for output equality
+def _legacy_parse_receipt_fields(ocr_text: str, debug: bool = False) -> Dict[str, Any]:
+    result = {
+        "seller_name": None,
+        "receipt_id": None,
+        "purchase_date": None,
+        "item_list": [],
+        "purchase_total": {"currency": "USD", "value": None},
+        "payment_method": None,
+        "field_confidence": {
+            "seller_name": 0.0,
+            "receipt_id": 0.0,
+            "purchase_date": 0.0,
+            "purchase_total": 0.0,
+            "item_list": 0.0,
+            "payment_method": 0.0
+        }
+    }
+    text = ocr_text.upper()
+    lines = [l.strip() for l in text.split('\n') if l.strip()]
+    norm_lines = []
+    for line in lines:
+        # Normalize OCR errors
+        line = line.replace(',', '.')
+        line = re.sub(r'\$ *([0-9]+\. *[0-9]{2})', lambda m: f"${m.group(1).replace(' ', '')}", line)
+        line = re.sub(r'# *([0-9]+\. *[0-9]{2})', lambda m: f"{m.group(1).replace(' ', '')}", line)
+        line = re.sub(r'([0-9]+)\.\s*([0-9]{2})', r'\1.\2', line)
+        line = re.sub(r'\s+', ' ', line)
+        norm_lines.append(line)
+    lines = norm_lines
+
+    # Extract Seller Name (First line with many capitals, usually)
+    for line in lines:
+        if re.search(r'[A-Z]{3,}', line):
+            result["seller_name"] = line.title()
+            result["field_confidence"]["seller_name"] = 1.0
+            break
+
+    # Extract Receipt/Order Number
+    # Try TC#/TR#/REF#
+    rec_match = (re.search(r'(TC[#:\s]*([0-9]+))', " ".join(lines))
+                or re.search(r'(TR[#:\s]*([0-9]+))', " ".join(lines))
+                or re.search(r'(REF[#:\s]*([A-Z0-9]+))', " ".join(lines)))
+    if rec_match:
+        result["receipt_id"] = rec_match.group(2)
+        result["field_confidence"]["receipt_id"] = 0.95
+
+    # Extract Purchase Date
+    date_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', " ".join(lines))
+    if date_match:
+        result["purchase_date"] = date_match.group(1)
+        result["field_confidence"]["purchase_date"] = 0.95
+
+    # Extract Payment Method
+    for line in lines:
+        pmatch = re.search(r'(VISA|MASTERCARD|AMEX|PAYPAL|CASH|CARD)', line)
+        if pmatch:
+            result["payment_method"] = pmatch.group(1).title()
+            result["field_confidence"]["payment_method"] = 1.0
+            break
+
+    # Extract Purchase Total
+    total_value, total_conf = None, 0.0
+    for i, line in enumerate(lines):
+        if 'TOTAL' in line and 'SUBTOTAL' not in line:
+            if i+1 < len(lines):
+                raw = lines[i+1]
+                pmatch = re.search(r'([0-9]+\.[0-9]{2})', raw)
+                if pmatch:
+                    total_value = float(pmatch.group(1))
+                    total_conf = 0.95
+                    break
+            pmatch = re.search(r'([0-9]+\.[0-9]{2})', line)
+            if pmatch:
+                total_value = float(pmatch.group(1))
+                total_conf = 0.9
+                break
+    if total_value:
+        result["purchase_total"]["value"] = total_value
+        result["field_confidence"]["purchase_total"] = total_conf
+
+    # Extract Item List (description + price, two-line format)
+    exclude_words = [
+        "WALMART", "SAVE MONEY", "LIVE BETTER", "TOTAL", "SUBTOTAL", "TAX", "TEND", "BALANCE",
+        "APPROVAL", "ACCOUNT", "VISA", "MASTERCARD", "AMEX", "PAYPAL", "CASH", "CARD",
+        "ST#", "OP#", "TE#", "TR#", "REF", "TRANS", "VALIDATION", "PAYMENT", "TERMINAL", "ITEMS SOLD",
+        "TC#", "TC #", "CAMINO", "DURANGO", "MAR ", "JIM", "JAMES", "LOW PRICE", "EVERY DAY", "THANK YOU"
+    ]
+    for i, line in enumerate(lines):
+        if any(w in line for w in exclude_words):
+            continue
+        if i+1 < len(lines):
+            next_line = lines[i+1]
+            pmatch = re.match(r'^\$?([0-9]+\.[0-9]{2})$', next_line)
+            if not re.match(r'^\$?([0-9]+\.[0-9]{2})$', line) and pmatch and len(line) >= 5:
+                desc = line.strip().title()
+                price = float(pmatch.group(1))
+                # Factual clarity of line association
+                result["item_list"].append({
+                    "description": desc,
+                    "price": price
+                })
+    if result["item_list"]:
+        result["field_confidence"]["item_list"] = 0.85
+
+    return result
+
+
+SELLERS = ["Walmart", "Target Store 1123", "Costco Wholesale", "Joe's Diner", "7-Eleven", "Best Buy"]
+ITEMS = [
+    "Bananas", "Whole Milk 1gal", "Paper Towels", "USB-C Cable", "Chicken Breast", "Coffee Beans",
+    "Dish Soap", "Greek Yogurt", "AA Batteries", "Bread Loaf", "Orange Juice", "Tax Free Gift",
+]
+PAYMENTS = ["VISA", "MASTERCARD", "AMEX", "PAYPAL", "CASH", "DEBIT CARD", "GIFT"]
+
+
+def _noisy_amount(rng: random.Random, value: float) -> str:
+    txt = f"{value:.2f}"
+    roll = rng.random()
+    if roll < 0.1:
+        txt = txt.replace(".", ",")
+    elif roll < 0.2:
+        txt = txt.replace(".", ". ")
+    elif roll < 0.3:
+        txt = "$ " + txt
+    elif roll < 0.35:
+        txt = "# " + txt
+    return txt
+
+
+def make_receipt(rng: random.Random) -> str:
+    lines = [rng.choice(SELLERS), "SAVE MONEY. LIVE BETTER.", f"ST# {rng.randint(1000, 9999)} OP# {rng.randint(1, 99)}"]
+    total = 0.0
+    for _ in range(rng.randint(1, 12)):
+        price = round(rng.uniform(0.5, 120), 2)
+        total += price
+        lines.append(rng.choice(ITEMS) + ("  " if rng.random() < 0.2 else ""))
+        lines.append(_noisy_amount(rng, price))
+    lines.append("SUBTOTAL")
+    lines.append(_noisy_amount(rng, total))
+    if rng.random() < 0.8:
+        lines.append("TOTAL")
+        lines.append(_noisy_amount(rng, total * 1.08))
+    else:
+        lines.append(f"TOTAL {_noisy_amount(rng, total * 1.08)}")
+    lines.append(rng.choice(PAYMENTS) + " TEND")
+    if rng.random() < 0.7:
+        lines.append(f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(2018, 2025)} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}")
+    ref = rng.random()
+    if ref < 0.4:
+        lines.append(f"TC# {rng.randint(10**9, 10**10)}")
+    elif ref < 0.6:
+        lines.append(f"TR# {rng.randint(1000, 9999)}")
+    elif ref < 0.8:
+        lines.append(f"REF # A{rng.randint(10000, 99999)}")
+    if rng.random() < 0.3:
+        lines.insert(rng.randint(0, len(lines)), "")
+    lines.append("THANK YOU")
+    return "\n".join(lines)
+
+
+def _dump(result: Dict[str, Any]) -> str:
+    return json.dumps(result, ensure_ascii=False)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Receipt parser micro-benchmark")
+    parser.add_argument("--receipts", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    corpus = [make_receipt(rng) for _ in range(args.receipts)]
+
+    mismatches = sum(
+        1 for text in corpus
+        if _dump(parse_receipt_fields(text)) != _dump(_legacy_parse_receipt_fields(text))
+    )
+    print(f"receipts={len(corpus)} mismatches={mismatches}")
+
+    for label, fn in (("legacy", _legacy_parse_receipt_fields), ("current", parse_receipt_fields)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for text in corpus:
+                fn(text)
+            best = min(best, time.perf_counter() - start)
+        print(f"{label:>8}: {best:.3f}s total, {best / len(corpus) * 1e6:.1f} us/receipt")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
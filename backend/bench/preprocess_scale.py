@@ -0,0 +1,108 @@
+"""
+Benchmark: OCR time per page and field-extraction accuracy per working resolution.
+
+For each OCR_TARGET_TEXT_HEIGHT setting (0 = no normalization, the old behavior)
+every image is OCR'd with a warm reader and the key receipt fields are compared
+against ground truth.
+
+Usage:
+    python -m backend.bench.preprocess_scale [image_or_dir ...] [--targets 0,16,20,28] [--truth truth.json]
+
+truth.json maps an image file name to expected fields, e.g.
+    {"receipt1.jpg": {"seller_name": "Walmart", "purchase_date": "04/27/2019", "purchase_total": 98.21}}
+Without --truth the target=0 results are used as the reference, so the
+accuracy column reads as agreement with the unnormalized pipeline.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+try:
+    from .. import ocr_utils
+except Exception:
+    _HERE = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(_HERE))
+    import ocr_utils  # type: ignore
+
+FIELDS = ("seller_name", "receipt_id", "purchase_date", "purchase_total")
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def _collect(paths: list[str]) -> list[str]:
+    out: list[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(os.path.join(p, n) for n in os.listdir(p) if n.lower().endswith(IMAGE_EXTS)))
+        else:
+            out.append(p)
+    return out
+
+
+def _fields(parsed: dict) -> dict:
+    vals = {k: parsed.get(k) for k in FIELDS}
+    vals["purchase_total"] = (parsed.get("purchase_total") or {}).get("value")
+    return vals
+
+
+def _matches(expected, actual) -> bool:
+    if expected is None:
+        return actual is None
+    if isinstance(expected, (int, float)):
+        return isinstance(actual, (int, float)) and abs(float(expected) - float(actual)) < 0.005
+    return str(expected).strip().lower() == str(actual or "").strip().lower()
+
+
+def main(argv: list[str]) -> int:
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="OCR latency/accuracy per working resolution")
+    parser.add_argument("images", nargs="*", default=[os.path.join(here, "scanned-receipt-example.webp")])
+    parser.add_argument("--targets", default="0,16,20,28", help="Comma-separated OCR_TARGET_TEXT_HEIGHT values")
+    parser.add_argument("--truth", help="JSON file with expected fields per image file name")
+    args = parser.parse_args(argv)
+
+    images = _collect(args.images)
+    targets = [float(t) for t in args.targets.split(",") if t.strip()]
+    truth = {}
+    if args.truth:
+        with open(args.truth, "r", encoding="utf-8") as f:
+            truth = json.load(f)
+
+    ocr_utils.warm_reader()
+    results: dict[float, dict[str, dict]] = {}
+    timings: dict[float, list[float]] = {}
+    scales: dict[float, list[float]] = {}
+    for target in targets:
+        results[target], timings[target], scales[target] = {}, [], []
+        for img in images:
+            start = time.perf_counter()
+            parsed = ocr_utils.extract_receipt_info(img, target_height=target, tiers=["full"])
+            timings[target].append(time.perf_counter() - start)
+            scales[target].append(float((parsed.get("ocr_meta") or {}).get("scale", 1.0)))
+            results[target][img] = _fields(parsed)
+
+    reference = {img: truth.get(os.path.basename(img)) for img in images} if truth else results.get(0.0)
+    print(f"images={len(images)} reference={'truth' if truth else 'target=0'}")
+    print(f"{'target':>7} {'mean s/page':>12} {'median':>8} {'scale':>6} {'accuracy':>9}")
+    for target in targets:
+        correct = total = 0
+        if reference:
+            for img, fields in results[target].items():
+                expected = reference.get(img) or {}
+                for k in FIELDS:
+                    if k in expected:
+                        total += 1
+                        correct += _matches(expected[k], fields.get(k))
+        acc = f"{correct / total:.1%}" if total else "n/a"
+        print(
+            f"{target:>7g} {statistics.mean(timings[target]):>12.3f} {statistics.median(timings[target]):>8.3f}"
+            f" {statistics.median(scales[target]):>6.2f} {acc:>9}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,268 @@
+"""
+cache.py
+
+Small JSON-value caches shared by the pipeline:
+- LRUCache: in-process, bounded by entry count
+- SQLiteCache: on-disk, bounded by total value size (least recently used rows are evicted)
+- TieredCache: memory in front of an optional disk tier, with hit/miss counters
+
+Every tier takes an optional default ttl (seconds); expired entries read as misses.
+Values must be JSON-serializable.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = 512, ttl: Optional[float] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        # key -> (expires_at or None, value)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        # Unexpired presence; does not refresh recency
+        entry = self._data.get(key)
+        return entry is not None and (entry[0] is None or entry[0] > time.time())
+
+
+class SQLiteCache:
+    """
+    Size-bounded key/value store in a single SQLite file (safe to share between processes).
+    The total size is tracked incrementally; it is re-read from the table (which also
+    picks up other processes' writes) and expired rows are swept every SYNC_EVERY writes.
+    """
+
+    SYNC_EVERY = 256
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl = ttl
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entry ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entry_accessed ON cache_entry (accessed_at)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache_entry)")}
+        if "expires_at" not in columns:
+            # Files created before TTL support
+            self._conn.execute("ALTER TABLE cache_entry ADD COLUMN expires_at REAL")
+        self._writes = 0
+        self._bytes = self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        return int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entry").fetchone()[0])
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache_entry WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache_entry SET accessed_at = ? WHERE key = ?", (now, key))
+        try:
+            return json.loads(row[0])
+        except Exception:
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM cache_entry WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entry (key, value, size, accessed_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now + ttl if ttl else None),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            self._writes += 1
+            if self._writes % self.SYNC_EVERY == 0:
+                self._conn.execute("DELETE FROM cache_entry WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+                self._bytes = self._total_bytes()
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        self._conn.execute("DELETE FROM cache_entry WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        # Eviction is rare; start from the real total so other processes' writes count too
+        total = self._total_bytes()
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM cache_entry ORDER BY accessed_at LIMIT 32"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._bytes = total
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM cache_entry WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+            if old:
+                self._bytes -= old[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entry")
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entry"
+            ).fetchone()
+        return {"path": self.path, "entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """Memory LRU in front of an optional disk tier. Disk hits are promoted to memory."""
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def _count(self, tier: Optional[str]) -> None:
+        with self._lock:
+            if tier is None:
+                self.misses += 1
+            else:
+                self.hits[tier] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory")
+            return value
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except Exception as e:
+                print(f"[cache] disk read failed: {e}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("disk")
+                return value
+        self._count(None)
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, ttl)
+            except Exception as e:
+                print(f"[cache] disk write failed: {e}")
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for coroutines: memory hits stay inline, the disk tier is read off the event loop."""
+        if self.disk is None or key in self.memory:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if self.disk is None:
+            self.set(key, value, ttl)
+        else:
+            await asyncio.to_thread(self.set, key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = dict(self.hits)
+            misses = self.misses
+        lookups = sum(hits.values()) + misses
+        out: Dict[str, Any] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": (sum(hits.values()) / lookups) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_max_entries": self.memory.max_entries,
+        }
+        if self.disk is not None:
+            try:
+                out["disk"] = self.disk.stats()
+            except Exception as e:
+                out["disk"] = {"error": str(e)}
+        return out
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
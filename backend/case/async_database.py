@@ -0,0 +1,56 @@
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+import os
+
+try:
+    from .database import DB_URL  # type: ignore
+except Exception:
+    from database import DB_URL  # type: ignore
+
+# Async drivers for the sync URL schemes used in DATABASE_URL
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """postgresql://... -> postgresql+asyncpg://..., sqlite:///x.db -> sqlite+aiosqlite:///x.db"""
+    scheme, sep, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+ASYNC_DB_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DB_URL)
+
+_engine = None
+_sessionmaker = None
+
+
+def get_async_engine() -> AsyncEngine:
+    # Created lazily so importing this module never requires asyncpg/aiosqlite
+    global _engine
+    if _engine is None:
+        kwargs = {}
+        if not ASYNC_DB_URL.startswith("sqlite"):
+            kwargs = {
+                "pool_pre_ping": True,
+                "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+                "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            }
+        _engine = create_async_engine(ASYNC_DB_URL, **kwargs)
+    return _engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = async_sessionmaker(get_async_engine(), expire_on_commit=False)
+    return _sessionmaker
+
+
+async def dispose_async_engine() -> None:
+    global _engine, _sessionmaker
+    engine, _engine, _sessionmaker = _engine, None, None
+    if engine is not None:
+        await engine.dispose()
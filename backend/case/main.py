@@ -1,10 +1,16 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import base64
+import json
+import os
 # from backend.database import Base, engine, get_db
 # from backend import models, schemas
 
-from database import Base, engine, get_db
+from database import Base, engine, get_db, SessionLocal
 import models, schemas
 
 app = FastAPI(title="ELEC-5620 Minimal Backend")
@@ -70,8 +76,117 @@ def add_eligibility(payload: schemas.EligibilityCreate, db: Session = Depends(ge
     case_status = getattr(current_case, "status", None)
     return {"eligibility_id": ed.id, "case_status": case_status}
 
-# 5) Dashboard: query view directly
+# 5) Dashboard: keyset-paginated view over v_case_overview
+#    Newest first by case_id (default) or by (updated_at, case_id); the cursor is the
+#    sort key of the last row returned, so every page is an index range scan
+#    (see migrations/001_dashboard_overview_indexes.sql) no matter how deep it is.
+DASHBOARD_MAX_PAGE_SIZE = int(os.getenv("DASHBOARD_MAX_PAGE_SIZE", "200"))
+DASHBOARD_FETCH_SIZE = 100  # rows per round-trip from the server-side cursor
+
+def _encode_cursor(order: str, row) -> str:
+    key = row["updated_at"].isoformat() if order == "updated_at" else None
+    raw = json.dumps({"o": order, "k": key, "id": row["case_id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str, order: str) -> dict:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if data["o"] != order:
+            raise ValueError("cursor belongs to a different order")
+        out = {"c_id": int(data["id"])}
+        if order == "updated_at":
+            out["c_key"] = datetime.fromisoformat(data["k"])
+        return out
+    except Exception:
+        raise HTTPException(400, "invalid cursor")
+
+def _json_default(o):
+    return o.isoformat() if hasattr(o, "isoformat") else str(o)
+
 @app.get("/dashboard/overview")
-def dashboard_overview(db: Session = Depends(get_db)):
-    rows = db.execute(text("SELECT * FROM v_case_overview ORDER BY case_id DESC")).mappings().all()
-    return {"items": [dict(r) for r in rows]}
+def dashboard_overview(
+    limit: int = Query(50, ge=1, le=DASHBOARD_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    order: str = Query("case_id", pattern="^(case_id|updated_at)$"),
+    case_status: Optional[str] = None,
+    eligibility_status: Optional[str] = None,
+    needs_review: Optional[bool] = None,
+    user_id: Optional[int] = None,
+):
+    where, params = [], {"limit": limit + 1}
+    if case_status is not None:
+        where.append("case_status = :case_status"); params["case_status"] = case_status
+    if eligibility_status is not None:
+        where.append("eligibility_status = :eligibility_status"); params["eligibility_status"] = eligibility_status
+    if needs_review is not None:
+        where.append("needs_review" if needs_review else "needs_review IS NOT TRUE")
+    if user_id is not None:
+        where.append("user_id = :user_id"); params["user_id"] = user_id
+    if cursor:
+        params.update(_decode_cursor(cursor, order))
+        where.append("(updated_at, case_id) < (:c_key, :c_id)" if order == "updated_at" else "case_id < :c_id")
+    sql = "SELECT * FROM v_case_overview"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY updated_at DESC, case_id DESC" if order == "updated_at" else " ORDER BY case_id DESC"
+    sql += " LIMIT :limit"
+
+    # Own session: the response body is produced after the endpoint has returned.
+    # stream_results uses a server-side cursor, so rows are encoded as they arrive
+    # instead of being materialized with .all(). The query runs here, before the
+    # response starts, so a failure is an error response rather than a 200 with a
+    # truncated body.
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            text(sql).execution_options(stream_results=True, yield_per=DASHBOARD_FETCH_SIZE), params
+        ).mappings()
+    except Exception as e:
+        db.close()
+        raise HTTPException(500, f"overview query failed: {e}")
+
+    def body():
+        try:
+            yield '{"items":['
+            last, count, has_more = None, 0, False
+            for row in result:
+                if count == limit:
+                    has_more = True  # the extra (limit + 1)th row only tells us there is a next page
+                    break
+                yield ("," if count else "") + json.dumps(dict(row), default=_json_default)
+                last, count = row, count + 1
+            next_cursor = _encode_cursor(order, last) if has_more else None
+            yield "]," + json.dumps({"count": count, "has_more": has_more, "next_cursor": next_cursor})[1:]
+        finally:
+            result.close()
+            db.close()
+
+    return StreamingResponse(body(), media_type="application/json")
+
+# 6) Dashboard: aggregate counts from case_stats (migrations/003_case_stats.sql)
+#    The table is kept current by triggers, so this reads at most a few hundred rows
+#    however many cases exist. Day buckets are limited to the last `days` days.
+STATS_DIMENSIONS = ("status", "needs_review", "eligibility_status", "classification")
+
+@app.get("/dashboard/stats")
+def dashboard_stats(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db)):
+    since = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+    rows = db.execute(
+        text(
+            "SELECT dimension, bucket, sum(n) AS n FROM case_stats"
+            " WHERE dimension <> 'day' OR (bucket >= :since AND bucket <> 'none')"
+            " GROUP BY dimension, bucket"
+        ),
+        {"since": since},
+    ).all()
+    out = {dim: {} for dim in STATS_DIMENSIONS}
+    by_day = []
+    for dimension, bucket, n in rows:
+        if not n:
+            continue
+        if dimension == "day":
+            by_day.append({"day": bucket, "count": int(n)})
+        elif dimension in out:
+            out[dimension][bucket] = int(n)
+    by_day.sort(key=lambda d: d["day"])
+    return {"total_cases": sum(out["status"].values()), **out, "by_day": by_day}
@@ -7,9 +7,12 @@ try:
 except Exception:
     from database import Base  # type: ignore
 
+# BIGINT ids on PostgreSQL; SQLite only autoincrements an INTEGER PRIMARY KEY (the rowid)
+BigIntId = BigInteger().with_variant(Integer, "sqlite")
+
 class AppUser(Base):
     __tablename__ = "app_user"
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntId, primary_key=True)
     email = Column(Text, unique=True, nullable=False)
     password_hash = Column(Text, nullable=False)
     role = Column(Text, nullable=False)
@@ -17,7 +20,7 @@ class AppUser(Base):
 
 class Case(Base):
     __tablename__ = "case"
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntId, primary_key=True)
     user_id = Column(BigInteger, ForeignKey("app_user.id", ondelete="CASCADE"), nullable=False)
     status = Column(Text, nullable=False)
     title = Column(Text)
@@ -25,13 +28,17 @@ class Case(Base):
     needs_review = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    # Latest eligibility decision, maintained by trg_sync_case_status (migrations/002)
+    latest_eligibility_status = Column(Text)
+    latest_lenient_flag = Column(Boolean)
+    latest_decided_at = Column(DateTime(timezone=True))
     user = relationship("AppUser")
 
 """Receipt model removed per requirement: we no longer persist receipts in DB."""
 
 class Issue(Base):
     __tablename__ = "issue"
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntId, primary_key=True)
     case_id = Column(BigInteger, ForeignKey("case.id", ondelete="CASCADE"), nullable=False)
     description = Column(Text, nullable=False)
     classification = Column(Text)
@@ -41,7 +48,7 @@ class Issue(Base):
 
 class PolicySnapshot(Base):
     __tablename__ = "policy_snapshot"
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntId, primary_key=True)
     name = Column(Text, nullable=False)
     source = Column(Text, nullable=False)
     matched_rules = Column(JSON, nullable=False)
@@ -49,7 +56,7 @@ class PolicySnapshot(Base):
 
 class EligibilityDecision(Base):
     __tablename__ = "eligibility_decision"
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntId, primary_key=True)
     case_id = Column(BigInteger, ForeignKey("case.id", ondelete="CASCADE"), nullable=False)
     policy_snapshot_id = Column(BigInteger, ForeignKey("policy_snapshot.id"))
     status = Column(Text, nullable=False)
@@ -59,7 +66,7 @@ class EligibilityDecision(Base):
 
 class WarrantyDeadline(Base):
     __tablename__ = "warranty_deadline"
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntId, primary_key=True)
     case_id = Column(BigInteger, ForeignKey("case.id", ondelete="CASCADE"), nullable=False)
     deadline_date = Column(Date, nullable=False)
     type = Column(Text, nullable=False)
@@ -68,7 +75,7 @@ class WarrantyDeadline(Base):
 
 class Reminder(Base):
     __tablename__ = "reminder"
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntId, primary_key=True)
     case_id = Column(BigInteger, ForeignKey("case.id", ondelete="CASCADE"), nullable=False)
     deadline_id = Column(BigInteger, ForeignKey("warranty_deadline.id", ondelete="SET NULL"))
     scheduled_at = Column(DateTime(timezone=True), nullable=False)
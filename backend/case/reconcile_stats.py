@@ -0,0 +1,84 @@
+r"""
+Rebuild (or check) the case_stats dashboard counters from the source tables.
+
+case_stats is maintained by triggers (migrations/003_case_stats.sql). Run this after
+bulk loads done with triggers disabled, restores, or whenever /dashboard/stats looks off.
+
+Usage:
+   python -m backend.case.reconcile_stats            (recount and replace case_stats)
+   python -m backend.case.reconcile_stats --check    (report drift only, change nothing)
+
+With conda, as for ping_db:
+    D:\anaconda\Scripts\conda.exe run -p D:\Desktop\ELEC_5620_Final\.conda --no-capture-output python -m backend.case.reconcile_stats
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+# Load backend/.env as authoritative before importing engine so that DATABASE_URL is correct
+try:
+    backend_dir = Path(__file__).resolve().parents[1]
+    backend_env = backend_dir / ".env"
+    if backend_env.exists():
+        load_dotenv(str(backend_env), override=True)
+    load_dotenv(override=False)
+except Exception:
+    pass
+
+from .database import engine, DB_URL  # reuse configuration
+
+# Same buckets as case_stats_buckets() / trg_case_stats_issue_fn, without shards
+RECOUNT_SQL = """
+SELECT b.dimension, b.bucket, count(*) AS n
+  FROM "case" c CROSS JOIN LATERAL case_stats_buckets(c) b
+ GROUP BY 1, 2
+UNION ALL
+SELECT 'classification', coalesce(i.classification, 'unclassified'), count(*)
+  FROM issue i
+ GROUP BY 1, 2
+"""
+
+CURRENT_SQL = "SELECT dimension, bucket, sum(n) AS n FROM case_stats GROUP BY 1, 2"
+
+
+def check() -> int:
+    # One snapshot for both sides, so concurrent writes do not show up as drift
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+        expected = {(d, b): int(n) for d, b, n in conn.execute(text(RECOUNT_SQL))}
+        current = {(d, b): int(n) for d, b, n in conn.execute(text(CURRENT_SQL))}
+    drift = {
+        key: (current.get(key, 0), expected.get(key, 0))
+        for key in set(expected) | set(current)
+        if current.get(key, 0) != expected.get(key, 0)
+    }
+    for (dimension, bucket), (have, want) in sorted(drift.items()):
+        print(f"{dimension:<20} {bucket:<24} case_stats={have:<10} actual={want}")
+    print(f"{len(drift)} bucket(s) drifted out of {len(expected)}")
+    return 1 if drift else 0
+
+
+def rebuild() -> int:
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT case_stats_rebuild()")).scalar()
+    print(f"case_stats rebuilt: {rows} row(s)")
+    return 0
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild the case_stats dashboard counters")
+    parser.add_argument("--check", action="store_true", help="Only compare case_stats with a fresh recount")
+    args = parser.parse_args(argv)
+    try:
+        print(f"Connecting to: {DB_URL}")
+        return check() if args.check else rebuild()
+    except Exception as e:
+        print("case_stats reconcile: FAILED")
+        print("Error:", repr(e))
+        return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -2,13 +2,19 @@
 config.py (OpenAI only)
 Note: Minimal configuration wrapper using the public OpenAI API only.
 Provides get_chat_client() → (client, model) and get_settings()
+
+The AsyncOpenAI client is shared process-wide so every LLM call reuses one
+httpx connection pool (keep-alive, HTTP/2 when the `h2` package is installed).
+Close it with close_chat_client() on shutdown.
 """
 
 import os
+import threading
 from dataclasses import dataclass
 from dotenv import load_dotenv
+import httpx
 from openai import AsyncOpenAI
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Dict, Any
 
 # Load environment variables from .env file (robust to working directory)
 _HERE = os.path.dirname(__file__)
@@ -25,11 +31,33 @@ class Settings:
     openai_api_key: Optional[str] = None
     openai_base_url: Optional[str] = None
     openai_model: str = "gpt-4o-mini"
+    # Shared HTTP connection pool for all OpenAI calls
+    openai_timeout: float = 60.0
+    openai_connect_timeout: float = 10.0
+    openai_max_connections: int = 20
+    openai_max_keepalive: int = 10
+    openai_keepalive_expiry: float = 30.0
+    openai_http2: bool = True
+    openai_max_retries: int = 2
+    # Per-call read timeouts (seconds), passed to each chat call; openai_timeout is the client default
+    openai_classify_timeout: float = 20.0
+    openai_eligibility_timeout: float = 30.0
+    openai_report_timeout: float = 60.0
 
     def __post_init__(self):
         self.openai_api_key = os.getenv("OPENAI_API_KEY", self.openai_api_key)
         self.openai_base_url = os.getenv("OPENAI_BASE_URL", self.openai_base_url)
         self.openai_model = os.getenv("OPENAI_MODEL", self.openai_model)
+        self.openai_timeout = float(os.getenv("OPENAI_TIMEOUT", self.openai_timeout))
+        self.openai_connect_timeout = float(os.getenv("OPENAI_CONNECT_TIMEOUT", self.openai_connect_timeout))
+        self.openai_max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", self.openai_max_connections))
+        self.openai_max_keepalive = int(os.getenv("OPENAI_MAX_KEEPALIVE", self.openai_max_keepalive))
+        self.openai_keepalive_expiry = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", self.openai_keepalive_expiry))
+        self.openai_http2 = os.getenv("OPENAI_HTTP2", str(self.openai_http2)).lower() in {"1", "true", "yes"}
+        self.openai_max_retries = int(os.getenv("OPENAI_MAX_RETRIES", self.openai_max_retries))
+        self.openai_classify_timeout = float(os.getenv("OPENAI_CLASSIFY_TIMEOUT", self.openai_classify_timeout))
+        self.openai_eligibility_timeout = float(os.getenv("OPENAI_ELIGIBILITY_TIMEOUT", self.openai_eligibility_timeout))
+        self.openai_report_timeout = float(os.getenv("OPENAI_REPORT_TIMEOUT", self.openai_report_timeout))
 
 _settings = Settings()
 
@@ -37,15 +65,93 @@ def get_settings() -> Settings:
     """Get application settings singleton."""
     return _settings
 
+_client: Optional[AsyncOpenAI] = None
+_http_client: Optional[httpx.AsyncClient] = None
+_client_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def _build_http_client(settings: Settings) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive,
+            keepalive_expiry=settings.openai_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.openai_timeout, connect=settings.openai_connect_timeout),
+        http2=settings.openai_http2 and _http2_available(),
+    )
+
+
 def get_chat_client() -> Tuple[AsyncOpenAI, str]:
-    """Get OpenAI chat client and model name"""
+    """Get the shared OpenAI chat client and model name."""
+    global _client, _http_client
     settings = get_settings()
     if not settings.openai_api_key:
         raise ValueError("OPENAI_API_KEY environment variable is not set")
-    
-    client = AsyncOpenAI(
-        api_key=settings.openai_api_key,
-        base_url=settings.openai_base_url if settings.openai_base_url else None
-    )
-    return client, settings.openai_model
 
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _http_client = _build_http_client(settings)
+                _client = AsyncOpenAI(
+                    api_key=settings.openai_api_key,
+                    base_url=settings.openai_base_url if settings.openai_base_url else None,
+                    http_client=_http_client,
+                    timeout=httpx.Timeout(settings.openai_timeout, connect=settings.openai_connect_timeout),
+                    max_retries=settings.openai_max_retries,
+                )
+    return _client, settings.openai_model
+
+
+def chat_timeout(kind: str) -> httpx.Timeout:
+    """
+    Per-call timeout for one kind of chat call ("classify", "eligibility" or "report"),
+    passed as timeout= to chat.completions.create on the shared client.
+    """
+    settings = get_settings()
+    return httpx.Timeout(getattr(settings, f"openai_{kind}_timeout"), connect=settings.openai_connect_timeout)
+
+
+async def close_chat_client() -> None:
+    """Close the shared client and its connection pool (call on application shutdown)."""
+    global _client, _http_client
+    with _client_lock:
+        client, _client = _client, None
+        _http_client = None
+    if client is not None:
+        await client.close()
+
+
+def get_client_stats() -> Dict[str, Any]:
+    """Connection pool statistics of the shared client, for debugging."""
+    settings = get_settings()
+    stats: Dict[str, Any] = {
+        "initialized": _client is not None,
+        "http2": settings.openai_http2 and _http2_available(),
+        "max_connections": settings.openai_max_connections,
+        "max_keepalive": settings.openai_max_keepalive,
+        "keepalive_expiry": settings.openai_keepalive_expiry,
+        "timeout": settings.openai_timeout,
+    }
+    http_client = _http_client
+    if http_client is None:
+        return stats
+    try:
+        # httpx does not expose pool state publicly; read the httpcore pool defensively
+        pool = http_client._transport._pool  # type: ignore[attr-defined]
+        conns = list(getattr(pool, "connections", []))
+        stats["connections"] = len(conns)
+        stats["idle"] = sum(1 for c in conns if c.is_idle())
+        stats["available"] = sum(1 for c in conns if c.is_available())
+        stats["queued_requests"] = len(getattr(pool, "_requests", []))
+    except Exception as e:
+        stats["pool_error"] = str(e)
+    return stats
@@ -40,6 +40,10 @@ except Exception:
     # Fallback for direct execution as module/script
     from case.database import SessionLocal  # type: ignore
     from case import models as case_models  # type: ignore
+try:
+    from .auth import invalidate_user  # type: ignore
+except Exception:
+    from auth import invalidate_user  # type: ignore
 
 
 def create_user(email: str, password: str, role: str = "consumer") -> Optional[int]:
@@ -65,6 +69,8 @@ def create_user(email: str, password: str, role: str = "consumer") -> Optional[i
         user = case_models.AppUser(email=email, password_hash=pw_hash, role=role)
         db.add(user)
         db.commit()
+        # Drop any cached lookup for this email (matters when called inside the API process)
+        invalidate_user(email)
         try:
             db.refresh(user)
         except Exception:
@@ -0,0 +1,164 @@
+"""
+events.py
+
+Per-case event streams for pipeline progress (served as Server-Sent Events).
+Every published event is kept in the case's history so a client that connects late,
+or reconnects with Last-Event-ID, replays what it missed before following live
+events. A stream ends after a terminal event ("result" or "error").
+
+The hub is in-process: each uvicorn worker only has the streams of the jobs it runs.
+The API falls back to polling the shared status store for cases it does not know
+(see main.case_events), which gives status/result events but not the per-page detail.
+Histories only keep small events: data larger than max_event_bytes (typically the
+final result) reaches live subscribers in full but is replayed as a stub
+{"omitted": true, "bytes": n, ...ref}, where ref tells where to fetch it.
+
+Configuration (environment):
+- EVENTS_MAX_CASES: case histories kept in memory, oldest evicted first (default 1000)
+- EVENTS_MAX_HISTORY_BYTES: largest event data kept in a history (default 8192)
+- EVENTS_KEEPALIVE_SECONDS: idle interval between SSE keep-alive comments (default 15)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+TERMINAL_EVENTS = ("result", "error")
+
+
+class _CaseStream:
+    __slots__ = ("history", "subscribers", "closed")
+
+    def __init__(self) -> None:
+        self.history: List[Dict[str, Any]] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.closed = False
+
+
+class EventHub:
+    def __init__(self, max_cases: int = 1000, max_event_bytes: int = 8192) -> None:
+        self.max_cases = max(1, int(max_cases))
+        self.max_event_bytes = int(max_event_bytes)
+        self._streams: "OrderedDict[str, _CaseStream]" = OrderedDict()
+
+    def open(self, case_id: str) -> None:
+        """Start a fresh stream for case_id (replacing a finished one)."""
+        stream = self._streams.get(case_id)
+        if stream is None or stream.closed:
+            self._streams[case_id] = _CaseStream()
+        self._streams.move_to_end(case_id)
+        while len(self._streams) > self.max_cases:
+            _, old = self._streams.popitem(last=False)
+            for q in old.subscribers:
+                q.put_nowait(None)
+
+    def has(self, case_id: str) -> bool:
+        return case_id in self._streams
+
+    def publish(self, case_id: str, event: str, data: Any, ref: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Record an event and fan it out to live subscribers (sync; safe from callbacks).
+        ref is added to the history stub if the data is too large to keep.
+        """
+        stream = self._streams.get(case_id)
+        if stream is None:
+            self.open(case_id)
+            stream = self._streams[case_id]
+        if stream.closed:
+            return
+        item = {"id": len(stream.history) + 1, "event": event, "data": data}
+        size = len(_encode(data).encode("utf-8"))
+        if size > self.max_event_bytes:
+            stream.history.append({**item, "data": {"omitted": True, "bytes": size, **(ref or {})}})
+        else:
+            stream.history.append(item)
+        for q in stream.subscribers:
+            q.put_nowait(item)
+        if event in TERMINAL_EVENTS:
+            stream.closed = True
+            for q in stream.subscribers:
+                q.put_nowait(None)
+            stream.subscribers.clear()
+
+    async def subscribe(self, case_id: str, last_event_id: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """Yield history after last_event_id, then live events until the stream closes."""
+        stream = self._streams.get(case_id)
+        if stream is None:
+            return
+        queue: asyncio.Queue = asyncio.Queue()
+        backlog = [e for e in stream.history if e["id"] > last_event_id]
+        if not stream.closed:
+            stream.subscribers.append(queue)
+        try:
+            for item in backlog:
+                yield item
+            if stream.closed:
+                return
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                if item["id"] > last_event_id:
+                    yield item
+        finally:
+            if queue in stream.subscribers:
+                stream.subscribers.remove(queue)
+
+
+def _encode(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def format_sse(item: Dict[str, Any]) -> str:
+    return f"id: {item['id']}\nevent: {item['event']}\ndata: {_encode(item['data'])}\n\n"
+
+
+def sse_stream(hub: EventHub, case_id: str, last_event_id: int = 0) -> AsyncIterator[str]:
+    """SSE stream of a case's events from the hub."""
+    return sse_events(hub.subscribe(case_id, last_event_id))
+
+
+async def sse_events(source: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """SSE-encoded events with periodic keep-alive comments so proxies keep the connection open."""
+    keepalive = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+    events = source.__aiter__()
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=keepalive)
+            if not done:
+                yield ": keep-alive\n\n"
+                continue
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield format_sse(item)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration, Exception):
+                pass
+        await events.aclose()
+
+
+_HUB: Optional[EventHub] = None
+
+
+def get_event_hub() -> EventHub:
+    global _HUB
+    if _HUB is None:
+        _HUB = EventHub(
+            max_cases=int(os.getenv("EVENTS_MAX_CASES", "1000")),
+            max_event_bytes=int(os.getenv("EVENTS_MAX_HISTORY_BYTES", "8192")),
+        )
+    return _HUB
@@ -0,0 +1,61 @@
+"""
+fanout.py
+
+Helpers for running many independent async calls (e.g. one LLM request per receipt)
+with bounded concurrency and an optional request-rate ceiling. Results keep input
+order; a failing item yields its exception instead of failing the whole batch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar, Union
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class RateLimiter:
+    """Spaces acquisitions at least 1/rate seconds apart (rate <= 0 disables it)."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def chunked(items: Sequence[T], size: int) -> List[List[T]]:
+    size = max(1, int(size))
+    return [list(items[i:i + size]) for i in range(0, len(items), size)]
+
+
+async def map_bounded(
+    fn: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    concurrency: int,
+    limiter: Optional[RateLimiter] = None,
+) -> List[Union[R, BaseException]]:
+    """
+    Await fn(item) for every item with at most `concurrency` in flight.
+    Returns results in input order; exceptions are returned in place of results.
+    """
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+    async def one(item: T) -> R:
+        async with sem:
+            if limiter is not None:
+                await limiter.acquire()
+            return await fn(item)
+
+    return await asyncio.gather(*(one(item) for item in items), return_exceptions=True)
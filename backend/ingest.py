@@ -0,0 +1,255 @@
+"""
+ingest.py
+
+Streaming ingestion of uploaded receipt files. Uploads are read in chunks,
+hashed as they stream to disk, checked against per-file and per-request byte
+limits, and identified by their magic bytes (PDF/PNG/JPEG/WEBP). Bad files are
+rejected before anything reaches the OCR pool.
+
+Those checks run once Starlette has parsed (and spooled) the multipart body, so
+UploadSizeLimit, an ASGI middleware, bounds the raw body first: a Content-Length
+over the limit is answered with 413 before any of the body is read, and a body
+without one (chunked) is cut off with 413 as soon as it crosses the limit.
+
+Configuration (environment):
+- UPLOAD_MAX_FILE_BYTES: per-file limit (default 20 MiB)
+- UPLOAD_MAX_REQUEST_BYTES: limit across all files of one request (default 50 MiB)
+- UPLOAD_MAX_BODY_BYTES: raw request body limit on upload routes
+  (default UPLOAD_MAX_REQUEST_BYTES + 1 MiB for form fields and multipart framing)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+try:
+    from . import metrics
+except Exception:
+    import metrics  # type: ignore
+
+
+CHUNK_SIZE = 1024 * 1024
+# Bytes needed to recognize every supported format
+_SNIFF_BYTES = 1024
+
+_SUFFIXES = {"pdf": ".pdf", "png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+
+@dataclass
+class IngestedFile:
+    filename: str
+    path: str
+    sha256: str
+    size: int
+    kind: str  # "pdf" | "png" | "jpeg" | "webp"
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.kind == "pdf"
+
+
+def sniff_kind(head: bytes) -> Optional[str]:
+    """Identify a supported file type from its first bytes."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    # PDF readers tolerate leading junk before the header within the first KiB
+    if b"%PDF-" in head[:_SNIFF_BYTES]:
+        return "pdf"
+    return None
+
+
+def _limit(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        if os.path.exists(path):
+            os.unlink(path)
+    except Exception:
+        pass
+
+
+def body_limit() -> int:
+    default = _limit("UPLOAD_MAX_REQUEST_BYTES", 50 * 1024 * 1024) + 1024 * 1024
+    return _limit("UPLOAD_MAX_BODY_BYTES", default)
+
+
+class UploadSizeLimit:
+    """ASGI middleware: 413 for request bodies over the limit on the given path prefixes."""
+
+    def __init__(self, app: Any, paths: Sequence[str], max_bytes: Optional[int] = None):
+        self.app = app
+        self.paths = tuple(paths)
+        # None: read the environment per request (.env is loaded after the app is built)
+        self.max_bytes = max_bytes
+
+    async def _reject(self, send: Any, limit: int) -> None:
+        body = ('{"detail":"request body exceeds the upload limit of %d bytes"}' % limit).encode("ascii")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        limit = self.max_bytes if self.max_bytes is not None else body_limit()
+        length = dict(scope.get("headers") or []).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            metrics.incr("ingest.rejected.413")
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        started = False
+        rejected = False
+
+        async def limited_receive() -> Dict[str, Any]:
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > limit and not started:
+                    # Answer now and make the app see a disconnect; its own response is dropped
+                    rejected = True
+                    metrics.incr("ingest.rejected.413")
+                    await self._reject(send, limit)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Dict[str, Any]) -> None:
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # The app failing on the cut-off body is expected once the 413 went out
+            if not rejected:
+                raise
+
+
+async def ingest_upload(upload: UploadFile, max_file_bytes: int, request_budget: int) -> IngestedFile:
+    """
+    Stream one upload to a temp file. Raises HTTPException 400 (empty), 413 (too large)
+    or 415 (unsupported type); the partial file is removed in that case.
+    """
+    fname = upload.filename or "upload"
+    limit = min(max_file_bytes, request_budget)
+    h = hashlib.sha256()
+    size = 0
+    kind: Optional[str] = None
+    head = b""
+    tmp = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        with tmp as f:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    which = "file" if max_file_bytes <= request_budget else "request"
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"{fname}: upload exceeds the per-{which} limit of {limit} bytes",
+                    )
+                if kind is None:
+                    head += chunk[: _SNIFF_BYTES - len(head)]
+                    if len(head) >= _SNIFF_BYTES or len(chunk) < CHUNK_SIZE:
+                        kind = sniff_kind(head)
+                        if kind is None:
+                            raise HTTPException(
+                                status_code=415,
+                                detail=f"{fname}: unsupported file type (expected PDF, PNG, JPEG or WEBP)",
+                            )
+                h.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail=f"{fname}: empty upload")
+        if kind is None:
+            kind = sniff_kind(head)
+            if kind is None:
+                raise HTTPException(
+                    status_code=415,
+                    detail=f"{fname}: unsupported file type (expected PDF, PNG, JPEG or WEBP)",
+                )
+    except BaseException:
+        _unlink_quietly(tmp.name)
+        raise
+
+    # Give the file the extension of its real type (helps debugging and tools keyed on suffix)
+    path = tmp.name + _SUFFIXES[kind]
+    try:
+        os.replace(tmp.name, path)
+    except Exception:
+        path = tmp.name
+    return IngestedFile(filename=fname, path=path, sha256=h.hexdigest(), size=size, kind=kind)
+
+
+async def ingest_uploads(
+    uploads: List[UploadFile],
+    max_file_bytes: Optional[int] = None,
+    max_request_bytes: Optional[int] = None,
+) -> Tuple[List[IngestedFile], Dict[str, Any]]:
+    """
+    Ingest every upload of a request in order. On any rejection all files written so
+    far are removed and the HTTPException propagates. Returns (files, stats) and
+    records ingest throughput metrics.
+    """
+    max_file = max_file_bytes if max_file_bytes is not None else _limit("UPLOAD_MAX_FILE_BYTES", 20 * 1024 * 1024)
+    max_request = max_request_bytes if max_request_bytes is not None else _limit("UPLOAD_MAX_REQUEST_BYTES", 50 * 1024 * 1024)
+    start = time.perf_counter()
+    files: List[IngestedFile] = []
+    total = 0
+    try:
+        for upl in uploads:
+            ingested = await ingest_upload(upl, max_file, max_request - total)
+            total += ingested.size
+            files.append(ingested)
+    except HTTPException as e:
+        for f in files:
+            _unlink_quietly(f.path)
+        metrics.incr(f"ingest.rejected.{e.status_code}")
+        raise
+    except BaseException:
+        for f in files:
+            _unlink_quietly(f.path)
+        raise
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    stats = {
+        "files": len(files),
+        "bytes": total,
+        "seconds": round(elapsed, 6),
+        "mb_per_s": round(total / elapsed / (1024 * 1024), 3),
+    }
+    metrics.incr("ingest.requests")
+    metrics.incr("ingest.files", len(files))
+    metrics.incr("ingest.bytes", total)
+    metrics.incr("ingest.seconds", elapsed)
+    metrics.set_gauge("ingest.last_request_mb_per_s", stats["mb_per_s"])
+    return files, stats
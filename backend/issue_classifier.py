@@ -4,19 +4,26 @@ from typing import Dict, Any
 
 # Prefer package-relative import when running as a module; fall back to top-level for tests/scripts
 try:
-    from .config import get_chat_client
+    from .config import get_chat_client, chat_timeout
+    from .llm_cache import cached_call
 except Exception:
-    from config import get_chat_client
+    from config import get_chat_client, chat_timeout
+    from llm_cache import cached_call
 
-async def classify_issue(issue_description: str) -> Dict[str, Any]:
+# Bump when the way responses are requested or interpreted changes (invalidates cached answers)
+CLASSIFY_PROMPT_VERSION = "1"
+
+async def classify_issue(issue_description: str, use_cache: bool = True) -> Dict[str, Any]:
     """
     Classifies a customer issue description into predefined categories.
     
     Args:
         issue_description: Customer's description of their problem
+        use_cache: Set False to bypass the LLM response cache for this call
         
     Returns:
-        Dict containing category, reason, flags and confidence score
+        Dict containing category, reason, flags and confidence score,
+        plus `cached` telling whether it was served from the response cache
     """
     try:
         client, model = get_chat_client()
@@ -27,24 +34,30 @@ async def classify_issue(issue_description: str) -> Dict[str, Any]:
             system_prompt = f.read()
         
         # Get classification from OpenAI
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": issue_description}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        content = response.choices[0].message.content if response.choices else None
-        if not content:
-            raise ValueError("No response content received from OpenAI")
+        async def _call() -> Dict[str, Any]:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": issue_description}
+                ],
+                response_format={"type": "json_object"},
+                timeout=chat_timeout("classify"),
+            )
             
-        result = json.loads(content)
+            content = response.choices[0].message.content if response.choices else None
+            if not content:
+                raise ValueError("No response content received from OpenAI")
+            return json.loads(content)
+
+        result, cached = await cached_call(
+            "classify", model, CLASSIFY_PROMPT_VERSION, system_prompt, issue_description, _call, use_cache
+        )
         
         # Add metadata
         result["input_length"] = len(issue_description)
         result["model_used"] = model
+        result["cached"] = cached
         
         return result
         
@@ -55,5 +68,6 @@ async def classify_issue(issue_description: str) -> Dict[str, Any]:
             "requires_manual_review": True,
             "confidence_score": 0.0,
             "keywords": [],
-            "error": str(e)
+            "error": str(e),
+            "cached": False
         }
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+jobs.py
+
+In-process background job queue for long-running analyses. Jobs are async callables
+run by a fixed number of worker tasks on the server's event loop (the heavy OCR work
+still goes to the OCR pool), so a request can return immediately and clients poll
+the case status instead of holding the connection open.
+
+Configuration (environment):
+- JOB_WORKERS: concurrent background analyses (default 2)
+- JOB_MAX_QUEUE: queued jobs before submit() refuses (default 100)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    from . import metrics
+except Exception:
+    import metrics  # type: ignore
+
+
+JobFn = Callable[[], Awaitable[Any]]
+CancelFn = Callable[[], Any]
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when the queue is at capacity."""
+
+
+class JobQueue:
+    def __init__(self, workers: int = 2, max_queue: int = 100) -> None:
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._running = 0
+
+    def start(self) -> None:
+        """Spawn the worker tasks on the running loop (idempotent)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker(i), name=f"job-worker-{i}") for i in range(self.workers)]
+
+    def submit(self, job_id: str, fn: JobFn, on_cancel: Optional[CancelFn] = None) -> None:
+        """
+        Enqueue fn() to run in the background. on_cancel is called instead if the
+        queue is shut down before the job starts (e.g. to release its temp files).
+        """
+        self.start()
+        assert self._queue is not None
+        try:
+            self._queue.put_nowait((job_id, fn, on_cancel))
+        except asyncio.QueueFull:
+            metrics.incr("jobs.rejected")
+            raise JobQueueFull(f"job queue full ({self.max_queue} pending)")
+        metrics.incr("jobs.submitted")
+        metrics.set_gauge("jobs.queued", self._queue.qsize())
+
+    async def _worker(self, n: int) -> None:
+        assert self._queue is not None
+        while True:
+            job_id, fn, _ = await self._queue.get()
+            self._running += 1
+            metrics.set_gauge("jobs.queued", self._queue.qsize())
+            metrics.set_gauge("jobs.running", self._running)
+            try:
+                await fn()
+                metrics.incr("jobs.completed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Jobs record their own failure status; this only keeps the worker alive
+                metrics.incr("jobs.failed")
+                print(f"[jobs] {job_id} failed: {e}")
+            finally:
+                self._running -= 1
+                metrics.set_gauge("jobs.running", self._running)
+                self._queue.task_done()
+
+    async def stop(self) -> None:
+        """Cancel the workers (running jobs see CancelledError) and drop anything still queued."""
+        tasks, self._tasks = self._tasks, []
+        for t in tasks:
+            t.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        queue, self._queue = self._queue, None
+        while queue is not None and not queue.empty():
+            job_id, _, on_cancel = queue.get_nowait()
+            if on_cancel is not None:
+                try:
+                    on_cancel()
+                except Exception as e:
+                    print(f"[jobs] cancel hook for {job_id} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "started": bool(self._tasks),
+        }
+
+
+_QUEUE: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _QUEUE
+    if _QUEUE is None:
+        _QUEUE = JobQueue(
+            workers=int(os.getenv("JOB_WORKERS", "2")),
+            max_queue=int(os.getenv("JOB_MAX_QUEUE", "100")),
+        )
+    return _QUEUE
+
+
+async def shutdown_job_queue() -> None:
+    global _QUEUE
+    queue, _QUEUE = _QUEUE, None
+    if queue is not None:
+        await queue.stop()
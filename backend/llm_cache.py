@@ -0,0 +1,143 @@
+"""
+llm_cache.py
+
+Response cache for the LLM stages (classification, eligibility, final report).
+Keys are derived from (namespace, model, prompt version, system prompt, normalized
+user content), so editing a system prompt or bumping its version never serves
+stale answers. Only successful model responses are cached.
+
+Configuration (environment):
+- LLM_CACHE_BACKEND: "memory" (default), "sqlite" (memory + local SQLite file) or "off"
+- LLM_CACHE_TTL: seconds an entry stays valid (default 86400)
+- LLM_CACHE_ENTRIES: in-memory LRU size (default 1024)
+- LLM_CACHE_PATH: SQLite file for the sqlite backend (default backend/.cache/llm_cache.sqlite)
+- LLM_CACHE_MAX_BYTES: size bound for the SQLite file (default 64 MiB)
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    from .cache import LRUCache, SQLiteCache, TieredCache
+except Exception:
+    from cache import LRUCache, SQLiteCache, TieredCache  # type: ignore
+
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_content(text: str) -> str:
+    """Collapse whitespace so trivially different inputs share a cache entry."""
+    return _WS.sub(" ", text or "").strip()
+
+
+def make_key(namespace: str, model: str, prompt_version: str, system_prompt: str, user_content: str) -> str:
+    prompt_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+    raw = json.dumps(
+        [namespace, model, prompt_version, prompt_hash, normalize_content(user_content)],
+        ensure_ascii=False,
+    )
+    return f"llm:{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+_CACHE: Optional[TieredCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_llm_cache() -> Optional[TieredCache]:
+    """Process-wide LLM response cache, or None when LLM_CACHE_BACKEND=off."""
+    global _CACHE
+    backend = os.getenv("LLM_CACHE_BACKEND", "memory").strip().lower()
+    if backend in {"off", "none", "0", "false"}:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                ttl = float(os.getenv("LLM_CACHE_TTL", "86400"))
+                disk = None
+                if backend == "sqlite":
+                    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_cache.sqlite")
+                    try:
+                        disk = SQLiteCache(
+                            os.getenv("LLM_CACHE_PATH", default_path),
+                            max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+                            ttl=ttl,
+                        )
+                    except Exception as e:
+                        print(f"[llm_cache] sqlite backend disabled: {e}")
+                _CACHE = TieredCache(LRUCache(int(os.getenv("LLM_CACHE_ENTRIES", "1024")), ttl=ttl), disk)
+    return _CACHE
+
+
+async def cached_call(
+    namespace: str,
+    model: str,
+    prompt_version: str,
+    system_prompt: str,
+    user_content: str,
+    call: Callable[[], Awaitable[Any]],
+    use_cache: bool = True,
+) -> Tuple[Any, bool]:
+    """
+    Return (value, served_from_cache). On a miss, await call() and store its result.
+    call() should raise on failure so that errors and fallbacks are never cached.
+    """
+    if use_cache:
+        hit = await alookup(namespace, model, prompt_version, system_prompt, user_content)
+        if hit is not None:
+            return hit, True
+    value = await call()
+    if use_cache:
+        await astore(namespace, model, prompt_version, system_prompt, user_content, value)
+    return value, False
+
+
+def lookup(namespace: str, model: str, prompt_version: str, system_prompt: str, user_content: str) -> Any:
+    """Cached value or None (blocking on the disk tier; coroutines use alookup)."""
+    cache = get_llm_cache()
+    if cache is None:
+        return None
+    hit = cache.get(make_key(namespace, model, prompt_version, system_prompt, user_content))
+    # Callers decorate results in place; never hand out the cached object itself
+    return copy.deepcopy(hit) if hit is not None else None
+
+
+def store(namespace: str, model: str, prompt_version: str, system_prompt: str, user_content: str, value: Any) -> None:
+    cache = get_llm_cache()
+    if cache is not None and value not in (None, ""):
+        cache.set(make_key(namespace, model, prompt_version, system_prompt, user_content), copy.deepcopy(value))
+
+
+async def alookup(namespace: str, model: str, prompt_version: str, system_prompt: str, user_content: str) -> Any:
+    """lookup() for coroutines: the SQLite tier is read off the event loop."""
+    cache = get_llm_cache()
+    if cache is None:
+        return None
+    hit = await cache.aget(make_key(namespace, model, prompt_version, system_prompt, user_content))
+    return copy.deepcopy(hit) if hit is not None else None
+
+
+async def astore(namespace: str, model: str, prompt_version: str, system_prompt: str, user_content: str, value: Any) -> None:
+    cache = get_llm_cache()
+    if cache is not None and value not in (None, ""):
+        await cache.aset(make_key(namespace, model, prompt_version, system_prompt, user_content), copy.deepcopy(value))
+
+
+def cache_stats() -> Dict[str, Any]:
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+def close_llm_cache() -> None:
+    global _CACHE
+    with _CACHE_LOCK:
+        cache, _CACHE = _CACHE, None
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,420 @@
+"""
+local_classifier.py
+
+In-process issue classifier that answers before (and often instead of) the LLM.
+Categories are read from prompts/issue_classification.txt so both classifiers always
+agree on the label set. Scoring combines:
+- keyword rules (always available), and
+- an optional softmax linear model over hashed word/bigram features, trained from
+  stored issue.classification rows:  python -m backend.local_classifier train
+
+classify_gated() only calls the LLM when the local confidence is below the threshold.
+A sample of short-circuited requests is still sent to the LLM in the background
+(the "shadow" sample) to measure how often the two agree.
+
+Configuration (environment):
+- LOCAL_CLASSIFIER_ENABLED: default true
+- LOCAL_CLASSIFIER_THRESHOLD: confidence needed to skip the LLM (default 0.85)
+- LOCAL_CLASSIFIER_SHADOW_RATE: fraction of short-circuited requests re-checked by the LLM (default 0.1)
+- LOCAL_CLASSIFIER_MODEL: trained weights (default backend/.cache/issue_classifier.npz)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import re
+import threading
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None  # type: ignore
+
+try:
+    from . import metrics
+except Exception:
+    import metrics  # type: ignore
+
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+PROMPT_PATH = os.path.join(_HERE, "prompts", "issue_classification.txt")
+FEATURE_DIM = 1 << 12
+MODEL_VERSION = 1
+
+_RE_CATEGORY = re.compile(r"^\s*-\s*([a-z_]+)\s*:", re.MULTILINE)
+_RE_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def load_categories(path: str = PROMPT_PATH) -> List[str]:
+    """Category names listed as '- name: description' in the classification prompt."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            found = _RE_CATEGORY.findall(f.read())
+    except OSError:
+        found = []
+    categories = list(dict.fromkeys(found))
+    if "other" not in categories:
+        categories.append("other")
+    return categories
+
+
+CATEGORIES = load_categories()
+
+# Phrases are matched on whole-word boundaries against the lowercased text
+KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "damaged_item": (
+        "broken", "damaged", "damage", "cracked", "crack", "shattered", "dented", "scratched",
+        "smashed", "torn", "leaking", "arrived broken", "in pieces",
+    ),
+    "not_received": (
+        "not received", "never arrived", "never received", "didn't arrive", "did not arrive",
+        "hasn't arrived", "has not arrived", "missing package", "lost package", "not delivered",
+        "never delivered", "tracking", "where is my order",
+    ),
+    "wrong_item_sent": (
+        "wrong item", "wrong size", "wrong color", "wrong colour", "wrong product", "different item",
+        "instead of", "not what i ordered", "received the wrong", "sent the wrong",
+    ),
+    "refund_request": (
+        "refund", "money back", "reimburse", "reimbursement", "chargeback", "return it",
+        "want to return", "cancel my order",
+    ),
+    "warranty_claim": (
+        "warranty", "guarantee", "stopped working", "defective", "faulty", "malfunction",
+        "doesn't turn on", "does not turn on", "died after", "repair",
+    ),
+}
+_KEYWORD_RES: Dict[str, "re.Pattern[str]"] = {
+    cat: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in words) + r")\b")
+    for cat, words in KEYWORDS.items()
+    if cat in CATEGORIES
+}
+
+# Labels written by the older rule-based classifier in case/issue_classifier.py
+LEGACY_LABELS = {
+    "Not delivered": "not_received",
+    "Damaged/Quality issue": "damaged_item",
+    "Return/Refund": "refund_request",
+    "Other": "other",
+}
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, "true" if default else "false").strip().lower() in {"1", "true", "yes"}
+
+
+def enabled() -> bool:
+    return _env_flag("LOCAL_CLASSIFIER_ENABLED", True)
+
+
+def threshold() -> float:
+    return float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85"))
+
+
+def shadow_rate() -> float:
+    return float(os.getenv("LOCAL_CLASSIFIER_SHADOW_RATE", "0.1"))
+
+
+def model_path() -> str:
+    return os.getenv("LOCAL_CLASSIFIER_MODEL", os.path.join(_HERE, ".cache", "issue_classifier.npz"))
+
+
+def tokenize(text: str) -> List[str]:
+    words = _RE_TOKEN.findall((text or "").lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def featurize(text: str, dim: int = FEATURE_DIM):
+    """L2-normalized hashed bag of words + bigrams (crc32 so hashes are stable across processes)."""
+    vec = np.zeros(dim, dtype=np.float32)
+    for tok in tokenize(text):
+        vec[zlib.crc32(tok.encode("utf-8")) % dim] += 1.0
+    norm = float(np.linalg.norm(vec))
+    if norm:
+        vec /= norm
+    return vec
+
+
+def keyword_scores(text: str) -> Dict[str, int]:
+    lower = (text or "").lower()
+    scores: Dict[str, int] = {}
+    for cat, pattern in _KEYWORD_RES.items():
+        hits = len(pattern.findall(lower))
+        if hits:
+            scores[cat] = hits
+    return scores
+
+
+def _keyword_probs(scores: Dict[str, int]) -> Dict[str, float]:
+    # 1 hit -> 0.67, 2 hits -> 0.8, 3 -> 0.86 when unopposed; competing categories dilute it
+    total = sum(scores.values()) + 0.5
+    probs = {cat: hits / total for cat, hits in scores.items()}
+    probs["other"] = probs.get("other", 0.0) + 0.5 / total
+    return probs
+
+
+class LinearModel:
+    """Softmax regression over hashed features; weights live in a small .npz file."""
+
+    def __init__(self, weights, bias, categories: List[str], dim: int = FEATURE_DIM):
+        self.weights = weights
+        self.bias = bias
+        self.categories = list(categories)
+        self.dim = dim
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        logits = self.weights @ featurize(text, self.dim) + self.bias
+        logits -= logits.max()
+        exp = np.exp(logits)
+        probs = exp / exp.sum()
+        return {cat: float(p) for cat, p in zip(self.categories, probs)}
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            categories=np.array(self.categories),
+            dim=np.array(self.dim),
+            version=np.array(MODEL_VERSION),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LinearModel":
+        data = np.load(path, allow_pickle=False)
+        if int(data["version"]) != MODEL_VERSION:
+            raise ValueError(f"model version {int(data['version'])} != {MODEL_VERSION}")
+        return cls(data["weights"], data["bias"], [str(c) for c in data["categories"]], int(data["dim"]))
+
+
+def train(
+    texts: List[str],
+    labels: List[str],
+    categories: Optional[List[str]] = None,
+    epochs: int = 300,
+    lr: float = 0.5,
+    l2: float = 1e-4,
+) -> LinearModel:
+    """Full-batch gradient descent on cross-entropy; small data, so this takes well under a second."""
+    if np is None:
+        raise RuntimeError("numpy is required to train the local classifier")
+    categories = list(categories or CATEGORIES)
+    index = {cat: i for i, cat in enumerate(categories)}
+    X = np.stack([featurize(t) for t in texts])
+    y = np.zeros((len(labels), len(categories)), dtype=np.float32)
+    y[np.arange(len(labels)), [index[label] for label in labels]] = 1.0
+    W = np.zeros((len(categories), X.shape[1]), dtype=np.float32)
+    b = np.zeros(len(categories), dtype=np.float32)
+    n = float(len(texts))
+    for _ in range(epochs):
+        logits = X @ W.T + b
+        logits -= logits.max(axis=1, keepdims=True)
+        p = np.exp(logits)
+        p /= p.sum(axis=1, keepdims=True)
+        grad = p - y
+        W -= lr * ((grad.T @ X) / n + l2 * W)
+        b -= lr * grad.mean(axis=0)
+    return LinearModel(W, b, categories)
+
+
+_MODEL: Optional[LinearModel] = None
+_MODEL_LOADED = False
+_MODEL_LOCK = threading.Lock()
+
+
+def get_model() -> Optional[LinearModel]:
+    """Trained model if one exists at LOCAL_CLASSIFIER_MODEL (loaded once per process)."""
+    global _MODEL, _MODEL_LOADED
+    if not _MODEL_LOADED:
+        with _MODEL_LOCK:
+            if not _MODEL_LOADED:
+                path = model_path()
+                if np is not None and os.path.exists(path):
+                    try:
+                        _MODEL = LinearModel.load(path)
+                    except Exception as e:
+                        print(f"[local_classifier] ignoring model {path}: {e}")
+                _MODEL_LOADED = True
+    return _MODEL
+
+
+def reset_model() -> None:
+    global _MODEL, _MODEL_LOADED
+    with _MODEL_LOCK:
+        _MODEL, _MODEL_LOADED = None, False
+
+
+def classify_local(text: str) -> Dict[str, Any]:
+    """
+    Classify without any I/O. Returns the same shape as issue_classifier.classify_issue
+    plus `source` = "local". Empty text always gets confidence 0 so it falls through.
+    """
+    scores = keyword_scores(text)
+    probs = _keyword_probs(scores) if scores else {}
+    model = get_model() if (text or "").strip() else None
+    model_used = "local-keywords"
+    if model is not None:
+        model_probs = model.predict_proba(text)
+        if probs:
+            probs = {
+                cat: 0.7 * model_probs.get(cat, 0.0) + 0.3 * probs.get(cat, 0.0)
+                for cat in set(model_probs) | set(probs)
+            }
+        else:
+            probs = model_probs
+        model_used = "local-linear"
+    if probs:
+        category, confidence = max(probs.items(), key=lambda kv: kv[1])
+    else:
+        category, confidence = "other", 0.0
+    matched = [w for cat in scores for w in _KEYWORD_RES[cat].findall((text or "").lower())]
+    return {
+        "category": category,
+        "reason": f"Local classifier ({model_used}); keywords: {', '.join(matched) or 'none'}",
+        "requires_manual_review": False,
+        "confidence_score": round(float(confidence), 4),
+        "keywords": list(dict.fromkeys(matched)),
+        "model_used": model_used,
+        "source": "local",
+        "cached": False,
+    }
+
+
+def _update_rates() -> None:
+    counters = metrics.snapshot()["counters"]
+    total = counters.get("classifier.requests", 0)
+    if total:
+        metrics.set_gauge("classifier.short_circuit_rate", counters.get("classifier.local", 0) / total)
+    compared = counters.get("classifier.shadow.compared", 0)
+    if compared:
+        metrics.set_gauge("classifier.shadow.agreement_rate", counters.get("classifier.shadow.agree", 0) / compared)
+
+
+_SHADOW_TASKS: "set[asyncio.Task]" = set()
+
+
+async def _shadow_compare(local: Dict[str, Any], llm_call: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+    try:
+        llm = await llm_call()
+    except Exception:
+        metrics.incr("classifier.shadow.errors")
+        return
+    if not isinstance(llm, dict) or llm.get("error"):
+        metrics.incr("classifier.shadow.errors")
+        return
+    metrics.incr("classifier.shadow.compared")
+    if llm.get("category") == local.get("category"):
+        metrics.incr("classifier.shadow.agree")
+    _update_rates()
+
+
+async def classify_gated(
+    local_text: str,
+    llm_call: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Local answer when it is confident enough, otherwise await llm_call().
+    The LLM result gets `source` = "llm" and the local guess under `local`.
+    """
+    if not enabled():
+        return await llm_call()
+    metrics.incr("classifier.requests")
+    local = classify_local(local_text)
+    if local["confidence_score"] >= threshold():
+        metrics.incr("classifier.local")
+        if random.random() < shadow_rate():
+            metrics.incr("classifier.shadow.sampled")
+            task = asyncio.create_task(_shadow_compare(local, llm_call))
+            _SHADOW_TASKS.add(task)
+            task.add_done_callback(_SHADOW_TASKS.discard)
+        _update_rates()
+        return local
+    metrics.incr("classifier.llm")
+    _update_rates()
+    result = await llm_call()
+    if isinstance(result, dict):
+        result.setdefault("source", "llm")
+        result["local"] = {"category": local["category"], "confidence_score": local["confidence_score"]}
+    return result
+
+
+def _load_training_rows() -> Tuple[List[str], List[str]]:
+    """(description, category) for stored issues labelled by the LLM (or the legacy rules)."""
+    try:
+        from .case.database import SessionLocal
+        from .case import models as case_models
+    except Exception:
+        from case.database import SessionLocal  # type: ignore
+        from case import models as case_models  # type: ignore
+
+    texts: List[str] = []
+    labels: List[str] = []
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(case_models.Issue.description, case_models.Issue.classification, case_models.Issue.ai_annotations)
+            .filter(case_models.Issue.classification.isnot(None))
+            .yield_per(1000)
+        )
+        for description, label, annotations in rows:
+            # Never learn from our own short-circuited answers
+            if isinstance(annotations, dict) and annotations.get("source") == "local":
+                continue
+            label = LEGACY_LABELS.get(label, label)
+            if label in CATEGORIES and description:
+                texts.append(description)
+                labels.append(label)
+    finally:
+        db.close()
+    return texts, labels
+
+
+def main(argv: List[str]) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local issue classifier")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_train = sub.add_parser("train", help="Fit the linear model from issue.classification rows")
+    p_train.add_argument("--out", default=model_path())
+    p_train.add_argument("--epochs", type=int, default=300)
+    p_train.add_argument("--min-rows", type=int, default=20)
+    p_train.add_argument("--holdout", type=float, default=0.2, help="Fraction kept aside to report accuracy")
+    p_pred = sub.add_parser("predict", help="Classify text with the current model")
+    p_pred.add_argument("text")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "predict":
+        print(classify_local(args.text))
+        return 0
+
+    texts, labels = _load_training_rows()
+    if len(texts) < args.min_rows:
+        print(f"only {len(texts)} labelled issues (need {args.min_rows}); not training")
+        return 1
+    order = list(range(len(texts)))
+    random.Random(0).shuffle(order)
+    n_hold = int(len(order) * args.holdout)
+    hold, fit = order[:n_hold], order[n_hold:]
+    model = train([texts[i] for i in fit], [labels[i] for i in fit], epochs=args.epochs)
+    if hold:
+        correct = 0
+        for i in hold:
+            probs = model.predict_proba(texts[i])
+            correct += max(probs, key=probs.get) == labels[i]
+        print(f"holdout accuracy: {correct / len(hold):.3f} ({len(hold)} rows)")
+    # Refit on everything before saving
+    model = train(texts, labels, epochs=args.epochs)
+    model.save(args.out)
+    print(f"trained on {len(texts)} rows -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    raise SystemExit(main(sys.argv[1:]))
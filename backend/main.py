@@ -1,24 +1,35 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field
 import os
 import json
+import asyncio
+import time
 from typing import Optional
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, AsyncIterator
 from dotenv import load_dotenv
 # Use package-relative import so module works when run as `backend.main`
 try:
-    from .config import get_chat_client
+    from .config import get_chat_client, chat_timeout, close_chat_client, get_client_stats
 except Exception:
     # Fallback for direct script execution
-    from config import get_chat_client
+    from config import get_chat_client, chat_timeout, close_chat_client, get_client_stats
 from datetime import datetime
+import re
 import uuid
-import base64
+# Auth: cached user lookups, signed tokens, bounded bcrypt pool
 try:
-    import bcrypt  # password hashing for auth
+    from .auth import (
+        cached_user, remember_user, public_user, issue_token, verify_token, check_password,
+        auth_stats, shutdown_auth, InvalidToken, PasswordCheckBusy,
+    )
 except Exception:
-    bcrypt = None  # type: ignore
+    from auth import (
+        cached_user, remember_user, public_user, issue_token, verify_token, check_password,
+        auth_stats, shutdown_auth, InvalidToken, PasswordCheckBusy,
+    )
 
 # Reuse existing OCR parser to enrich payload when only rawText is provided
 try:
@@ -30,12 +41,86 @@ except Exception:
         parse_receipt_fields = None  # type: ignore
 
 try:
-    from .ocr_utils import extract_receipt_info  # when used as package
+    from .ocr_utils import extract_receipt_info, render_pdf_pages, ocr_config_fingerprint, pdf_text_layer_enabled, PDF_RENDER_DPI  # when used as package
 except Exception:
     try:
-        from ocr_utils import extract_receipt_info  # direct script execution
+        from ocr_utils import extract_receipt_info, render_pdf_pages, ocr_config_fingerprint, pdf_text_layer_enabled, PDF_RENDER_DPI  # direct script execution
     except Exception:
         extract_receipt_info = None  # type: ignore
+        render_pdf_pages = None  # type: ignore
+        ocr_config_fingerprint = None  # type: ignore
+        pdf_text_layer_enabled = None  # type: ignore
+        PDF_RENDER_DPI = 200
+
+# OCR executor (keeps cv2/torch work off the event loop) and metrics
+try:
+    from .ocr_pool import get_pool as get_ocr_pool, shutdown_pool as shutdown_ocr_pool, OcrPoolBusy
+    from . import metrics
+except Exception:
+    from ocr_pool import get_pool as get_ocr_pool, shutdown_pool as shutdown_ocr_pool, OcrPoolBusy
+    import metrics  # type: ignore
+
+# LLM response cache (classification / eligibility / report prompts)
+try:
+    from .llm_cache import cached_call, cache_stats as llm_cache_stats, close_llm_cache
+except Exception:
+    from llm_cache import cached_call, cache_stats as llm_cache_stats, close_llm_cache
+
+# Bounded fan-out for batch LLM calls
+try:
+    from .fanout import RateLimiter, chunked, map_bounded
+except Exception:
+    from fanout import RateLimiter, chunked, map_bounded
+
+# Background analysis jobs and case status/progress
+try:
+    from .jobs import get_job_queue, shutdown_job_queue, JobQueueFull
+    from . import status as case_status
+except Exception:
+    from jobs import get_job_queue, shutdown_job_queue, JobQueueFull
+    import status as case_status  # type: ignore
+
+# Per-case progress events (Server-Sent Events)
+try:
+    from .events import get_event_hub, sse_events, sse_stream
+except Exception:
+    from events import get_event_hub, sse_events, sse_stream
+
+# Async persistence (asyncpg/aiosqlite) for stored analyses
+try:
+    from .persistence import (
+        async_persistence_enabled, persist_analysis, update_case_summary, close_persistence,
+        build_analysis_rows, lookup_user, UnknownUserError,
+    )
+except Exception:
+    from persistence import (
+        async_persistence_enabled, persist_analysis, update_case_summary, close_persistence,
+        build_analysis_rows, lookup_user, UnknownUserError,
+    )
+
+# Write-behind (journaled, batched) persistence
+try:
+    from .write_behind import write_behind_enabled, get_write_behind, shutdown_write_behind
+except Exception:
+    from write_behind import write_behind_enabled, get_write_behind, shutdown_write_behind
+
+# Stage graph for the analysis pipeline
+try:
+    from .pipeline import StageGraph
+except Exception:
+    from pipeline import StageGraph
+
+# Streaming upload ingestion
+try:
+    from .ingest import ingest_uploads, UploadSizeLimit
+except Exception:
+    from ingest import ingest_uploads, UploadSizeLimit
+
+# Content-addressed OCR result cache
+try:
+    from .ocr_cache import get_ocr_cache, close_ocr_cache, cache_stats as ocr_cache_stats, file_key, page_key
+except Exception:
+    from ocr_cache import get_ocr_cache, close_ocr_cache, cache_stats as ocr_cache_stats, file_key, page_key
 # OpenAI-based OCR has been removed; EasyOCR is the only OCR path.
 
 # Issue classification (LLM)
@@ -47,23 +132,21 @@ except Exception:
     except Exception:
         classify_issue = None  # type: ignore
 
+# Local classifier fast path (skips the LLM when confident)
+try:
+    from .local_classifier import classify_gated
+except Exception:
+    from local_classifier import classify_gated
+
 # Final report generator (reuse existing AI agent summarizer)
 try:
-    from .ai_agent import analyze_issue  # when used as package
+    from .ai_agent import analyze_issue, analyze_issue_stream  # when used as package
 except Exception:
     try:
-        from ai_agent import analyze_issue
+        from ai_agent import analyze_issue, analyze_issue_stream
     except Exception:
         analyze_issue = None  # type: ignore
-
-# PDF rendering
-try:
-    import fitz  # PyMuPDF
-except Exception:
-    fitz = None  # type: ignore
-
-import tempfile
-import shutil
+        analyze_issue_stream = None  # type: ignore
 
 try:
     from openai import OpenAI
@@ -84,13 +167,41 @@ class EligibilityResponse(BaseModel):
     eligible: bool
     reason: str
     model: str
+    cached: bool = False
+
 
+class EligibilityBatchRequest(BaseModel):
+    items: List[EligibilityRequest]
+    pack_size: int = Field(1, ge=1, description="Receipts adjudicated per LLM prompt (1 = one call per receipt)")
 
-async def generate_rationale_with_fallback(payload: dict) -> tuple[bool, str, str]:
+
+class EligibilityBatchItem(BaseModel):
+    index: int
+    ok: bool
+    eligible: Optional[bool] = None
+    reason: Optional[str] = None
+    model: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class EligibilityBatchResponse(BaseModel):
+    results: List[EligibilityBatchItem]
+    count: int
+    errors: int
+    duration_ms: float
+
+
+# Bump when the eligibility prompt or its interpretation changes (invalidates cached answers)
+ELIGIBILITY_PROMPT_VERSION = "1"
+
+
+async def generate_rationale_with_fallback(payload: dict, use_cache: bool = True) -> tuple[bool, str, str, bool]:
+    """Returns (eligible, reason, model, cached). Only successful LLM answers are cached."""
     debug_errors = (os.getenv("ELIGIBILITY_DEBUG_ERRORS", "").lower() in {"1", "true", "yes"})
 
     # Simple rule-based fallback
-    def heuristic() -> tuple[bool, str, str]:
+    def heuristic() -> tuple[bool, str, str, bool]:
         item = (payload.get("item") or "").lower()
         price_info = payload.get("price") or {}
         value = price_info.get("value")
@@ -109,7 +220,7 @@ async def generate_rationale_with_fallback(payload: dict) -> tuple[bool, str, st
                 reasons.append("Amount exceeds typical reimbursement limit of 500.")
         if not reasons:
             reasons.append("Applied default policy rules due to limited data.")
-        return eligible, " ".join(reasons), "heuristic"
+        return eligible, " ".join(reasons), "heuristic", False
 
     # Try to obtain an async chat client from config. If unavailable, fall back to heuristic.
     try:
@@ -128,46 +239,43 @@ async def generate_rationale_with_fallback(payload: dict) -> tuple[bool, str, st
             json.dumps(payload, ensure_ascii=False)
         )
 
-        # Use responses API; fallback to chat.completions if needed
-        model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        try:
-            completion = await client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
-                temperature=0.2,
-                response_format={"type": "json_object"},
-            )
-            content = completion.choices[0].message.content or "{}"
-            data = json.loads(content)
-            eligible = bool(data.get("eligible", False))
-            reason = str(data.get("reason", "No rationale provided."))
-            return eligible, reason, model_name
-        except Exception as e1:
-            # Try a safer fallback model once before heuristic
-            try:
-                fallback_model = "gpt-4o-mini"
+        async def ask(model: str) -> tuple[bool, str, str, bool]:
+            async def _call() -> Dict[str, Any]:
                 completion = await client.chat.completions.create(
-                    model=fallback_model,
+                    model=model,
                     messages=[
                         {"role": "system", "content": system},
                         {"role": "user", "content": user},
                     ],
                     temperature=0.2,
                     response_format={"type": "json_object"},
+                    timeout=chat_timeout("eligibility"),
                 )
                 content = completion.choices[0].message.content or "{}"
                 data = json.loads(content)
-                eligible = bool(data.get("eligible", False))
-                reason = str(data.get("reason", "No rationale provided."))
-                return eligible, reason, fallback_model
+                return {
+                    "eligible": bool(data.get("eligible", False)),
+                    "reason": str(data.get("reason", "No rationale provided.")),
+                }
+
+            data, cached = await cached_call(
+                "eligibility", model, ELIGIBILITY_PROMPT_VERSION, system, user, _call, use_cache
+            )
+            return data["eligible"], data["reason"], model, cached
+
+        # Use responses API; fallback to chat.completions if needed
+        model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        try:
+            return await ask(model_name)
+        except Exception as e1:
+            # Try a safer fallback model once before heuristic
+            try:
+                return await ask("gpt-4o-mini")
             except Exception as e2:
                 # If chat api fails, use heuristic
                 if debug_errors:
-                    ok, rsn, mdl = heuristic()
-                    return ok, f"OpenAI error: {str(e1) or ''} | fallback error: {str(e2) or ''} | {rsn}", mdl
+                    ok, rsn, mdl, _ = heuristic()
+                    return ok, f"OpenAI error: {str(e1) or ''} | fallback error: {str(e2) or ''} | {rsn}", mdl, False
                 else:
                     # log minimal error to server console
                     try:
@@ -177,8 +285,8 @@ async def generate_rationale_with_fallback(payload: dict) -> tuple[bool, str, st
                     return heuristic()
     except Exception as e3:
         if debug_errors:
-            ok, rsn, mdl = heuristic()
-            return ok, f"OpenAI client/init error: {str(e3) or ''} | {rsn}", mdl
+            ok, rsn, mdl, _ = heuristic()
+            return ok, f"OpenAI client/init error: {str(e3) or ''} | {rsn}", mdl, False
         else:
             try:
                 print(f"[eligibility] OpenAI client/init error: {e3}")
@@ -187,7 +295,97 @@ async def generate_rationale_with_fallback(payload: dict) -> tuple[bool, str, st
             return heuristic()
 
 
-app = FastAPI(title="Eligibility API")
+async def generate_rationales_packed(
+    payloads: List[dict], use_cache: bool = True
+) -> List[Optional[tuple[bool, str, str, bool]]]:
+    """
+    Adjudicate several receipts with one structured prompt. Entries the model leaves out
+    (or all of them, on error) come back as None so the caller can retry them one by one.
+    """
+    try:
+        client, _ = get_chat_client()
+    except Exception:
+        return [None] * len(payloads)
+
+    model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    system = (
+        "You are an eligibility adjudicator. Decide for each purchase whether it is eligible "
+        "for reimbursement based on general corporate expense policies. Receipts are independent; "
+        "explain each decision briefly and clearly. Output JSON: "
+        '{"results": [{"index": int, "eligible": bool, "reason": string}]} with exactly one entry per receipt.'
+    )
+    user = (
+        "Consider these extracted receipts and determine eligibility for each.\n\n" +
+        json.dumps([{"index": i, **p} for i, p in enumerate(payloads)], ensure_ascii=False)
+    )
+
+    async def _call() -> Dict[str, Any]:
+        completion = await client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            temperature=0.2,
+            response_format={"type": "json_object"},
+            timeout=chat_timeout("eligibility"),
+        )
+        data = json.loads(completion.choices[0].message.content or "{}")
+        out: Dict[str, Any] = {}
+        for entry in data.get("results") or []:
+            try:
+                idx = int(entry.get("index"))
+            except Exception:
+                continue
+            if 0 <= idx < len(payloads) and "eligible" in entry:
+                out[str(idx)] = {
+                    "eligible": bool(entry.get("eligible")),
+                    "reason": str(entry.get("reason") or "No rationale provided."),
+                }
+        if not out:
+            raise ValueError("packed response contained no usable results")
+        return out
+
+    try:
+        data, cached = await cached_call(
+            "eligibility_pack", model_name, ELIGIBILITY_PROMPT_VERSION, system, user, _call, use_cache
+        )
+    except Exception as e:
+        print(f"[eligibility] packed call failed ({len(payloads)} items): {e}")
+        return [None] * len(payloads)
+    results: List[Optional[tuple[bool, str, str, bool]]] = []
+    for i in range(len(payloads)):
+        entry = data.get(str(i))
+        results.append((entry["eligible"], entry["reason"], model_name, cached) if entry else None)
+    return results
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    if os.getenv("OCR_POOL_PREWARM", "true").lower() in {"1", "true", "yes"}:
+        try:
+            get_ocr_pool().prewarm()
+        except Exception as e:
+            print(f"[ocr_pool] prewarm failed: {e}")
+    get_job_queue().start()
+    if write_behind_enabled():
+        get_write_behind().start()
+    try:
+        yield
+    finally:
+        await shutdown_job_queue()
+        # After the job queue so analyses finished during shutdown are flushed too
+        await shutdown_write_behind()
+        shutdown_ocr_pool(wait=False)
+        close_ocr_cache()
+        close_llm_cache()
+        case_status.close_store()
+        await close_persistence()
+        shutdown_auth()
+        await close_chat_client()
+
+
+app = FastAPI(title="Eligibility API", lifespan=_lifespan)
 
 # CORS: support multiple dev origins via CORS_ORIGINS (comma-separated) or fallback defaults
 _cors_env = os.getenv("CORS_ORIGINS") or os.getenv("CORS_ORIGIN") or ""
@@ -203,6 +401,8 @@ else:
         "http://127.0.0.1:5173",
     ]
 
+# Bound upload bodies before Starlette spools them (added first: CORS wraps the 413)
+app.add_middleware(UploadSizeLimit, paths=["/api/receipt/analyze"])
 app.add_middleware(
     CORSMiddleware,
     allow_origins=_origins,
@@ -231,11 +431,8 @@ def root():
     }
 
 
-@app.post("/api/eligibility/check", response_model=EligibilityResponse)
-async def check_eligibility(req: EligibilityRequest):
-    # Start with the incoming request as a mutable dict
-    payload: Dict[str, Any] = req.dict()
-
+def _enrich_eligibility_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill missing item/price/date/confidence from rawText with the local receipt parser (in place)."""
     # Minimal enhancement (no new route): if item/price missing but rawText exists,
     # try to parse receipt fields from rawText using existing OCR parser utilities.
     try:
@@ -285,9 +482,117 @@ async def check_eligibility(req: EligibilityRequest):
     except Exception:
         # Parsing is best-effort; silently continue with original payload on error
         pass
+    return payload
+
+
+@app.post("/api/eligibility/check", response_model=EligibilityResponse)
+async def check_eligibility(req: EligibilityRequest, use_cache: bool = True):
+    # Start with the incoming request as a mutable dict
+    payload: Dict[str, Any] = _enrich_eligibility_payload(req.dict())
+
+    eligible, reason, model_name, cached = await generate_rationale_with_fallback(payload, use_cache=use_cache)
+    return EligibilityResponse(eligible=eligible, reason=reason, model=model_name, cached=cached)
+
+
+@app.post("/api/eligibility/check/batch", response_model=EligibilityBatchResponse)
+async def check_eligibility_batch(req: EligibilityBatchRequest, use_cache: bool = True):
+    """
+    Adjudicate many receipts in one HTTP call. rawText enrichment runs locally (off the
+    event loop); LLM calls fan out with ELIGIBILITY_BATCH_CONCURRENCY in flight, optionally
+    spaced by ELIGIBILITY_BATCH_RPS and packed `pack_size` receipts per prompt.
+    Results are returned in input order; a failed item carries `error` instead of a decision.
+    """
+    max_items = int(os.getenv("ELIGIBILITY_BATCH_MAX_ITEMS", "5000"))
+    if len(req.items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(req.items)} items (max {max_items})")
+    started = time.perf_counter()
+
+    payloads: List[Dict[str, Any]] = await asyncio.to_thread(
+        lambda: [_enrich_eligibility_payload(item.dict()) for item in req.items]
+    )
+
+    pack_size = min(req.pack_size, int(os.getenv("ELIGIBILITY_BATCH_MAX_PACK", "20")))
+    concurrency = int(os.getenv("ELIGIBILITY_BATCH_CONCURRENCY", "8"))
+    limiter = RateLimiter(float(os.getenv("ELIGIBILITY_BATCH_RPS", "0")))
+    groups = chunked(list(range(len(payloads))), pack_size)
+
+    async def adjudicate(indices: List[int]) -> List[Any]:
+        if len(indices) == 1:
+            return [await generate_rationale_with_fallback(payloads[indices[0]], use_cache=use_cache)]
+        metrics.incr("eligibility_batch.packed_calls")
+        return await generate_rationales_packed([payloads[i] for i in indices], use_cache=use_cache)
+
+    async def adjudicate_one(i: int) -> Any:
+        return await generate_rationale_with_fallback(payloads[i], use_cache=use_cache)
+
+    group_results = await map_bounded(adjudicate, groups, concurrency, limiter)
+    outcomes: List[Any] = [None] * len(payloads)
+    for indices, outcome in zip(groups, group_results):
+        for i, r in zip(indices, [outcome] * len(indices) if isinstance(outcome, BaseException) else outcome):
+            outcomes[i] = r
+
+    # Anything a packed answer skipped is retried on its own, under the same
+    # concurrency bound and rate limiter as the packed calls
+    missing = [i for i, r in enumerate(outcomes) if r is None]
+    if missing:
+        metrics.incr("eligibility_batch.unpacked_retries", len(missing))
+        for i, r in zip(missing, await map_bounded(adjudicate_one, missing, concurrency, limiter)):
+            outcomes[i] = r
+
+    results: List[EligibilityBatchItem] = []
+    for i, r in enumerate(outcomes):
+        if isinstance(r, BaseException):
+            results.append(EligibilityBatchItem(index=i, ok=False, error=str(r) or type(r).__name__))
+        else:
+            eligible, reason, model_name, cached = r
+            results.append(EligibilityBatchItem(
+                index=i, ok=True, eligible=eligible, reason=reason, model=model_name, cached=cached,
+            ))
+    errors = sum(1 for r in results if not r.ok)
+    metrics.incr("eligibility_batch.items", len(results))
+    metrics.incr("eligibility_batch.errors", errors)
+    return EligibilityBatchResponse(
+        results=results,
+        count=len(results),
+        errors=errors,
+        duration_ms=round((time.perf_counter() - started) * 1000, 2),
+    )
+
+
+class ReportStreamRequest(BaseModel):
+    issue_description: str
+    use_cache: bool = True
+
+
+@app.post("/api/agent/report/stream")
+async def stream_report(req: ReportStreamRequest):
+    """
+    Token-streamed handling report as NDJSON: a "start" line right away, one line per
+    key point / step as the model completes it, then a "final" line whose "report" is
+    exactly what the non-streaming analyzer returns. A failure after the headers are
+    sent ends the stream with an {"type": "error"} line instead of truncating it.
+    """
+    if analyze_issue_stream is None:
+        raise HTTPException(status_code=500, detail="AI agent not available on server")
+    # Configuration errors (e.g. no API key) still get a proper status code
+    try:
+        get_chat_client()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"AI agent not configured: {e}")
+
+    async def lines():
+        try:
+            async for ev in analyze_issue_stream(req.issue_description, use_cache=req.use_cache):
+                yield json.dumps(ev, ensure_ascii=False) + "\n"
+        except Exception as e:
+            print(f"[report_stream] error: {e}")
+            yield json.dumps({"type": "error", "error": str(e) or type(e).__name__}, ensure_ascii=False) + "\n"
 
-    eligible, reason, model_name = await generate_rationale_with_fallback(payload)
-    return EligibilityResponse(eligible=eligible, reason=reason, model=model_name)
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/api/health")
@@ -295,6 +600,22 @@ def health():
     return {"ok": True}
 
 
+@app.get("/api/metrics")
+def get_metrics():
+    """Process-local counters for debugging throughput and saturation."""
+    return {
+        "ocr_pool": get_ocr_pool().stats(),
+        "ocr_cache": ocr_cache_stats(),
+        "openai_client": get_client_stats(),
+        "llm_cache": llm_cache_stats(),
+        "jobs": get_job_queue().stats(),
+        "status_store": case_status.store_stats(),
+        "auth": auth_stats(),
+        **({"write_behind": get_write_behind().stats()} if write_behind_enabled() else {}),
+        **metrics.snapshot(),
+    }
+
+
 def _ensure_uploads_dir() -> str:
     here = os.path.dirname(os.path.abspath(__file__))
     up = os.path.join(here, "uploads")
@@ -302,29 +623,208 @@ def _ensure_uploads_dir() -> str:
     return up
 
 
-def _save_upload_to_temp(upload: UploadFile) -> str:
-    suffix = os.path.splitext(upload.filename or "")[1] or ""
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    with tmp as f:
-        shutil.copyfileobj(upload.file, f)
-    return tmp.name
+# case_id comes from the client; only ids of this shape name a directory as-is
+_SAFE_CASE_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
 
+def _debug_dir(case_id: str) -> str:
+    """uploads/debug/<case_id> for rendered page PNGs; other case ids get a generated name."""
+    root = os.path.realpath(os.path.join(_ensure_uploads_dir(), "debug"))
+    name = case_id if _SAFE_CASE_ID.fullmatch(case_id) else f"case-{uuid.uuid4().hex}"
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(path) != root:
+        raise HTTPException(status_code=400, detail="invalid case_id for debug artifacts")
+    if name != case_id:
+        print(f"[debug] case {case_id!r}: debug artifacts in {path}")
+    return path
 
-def _render_pdf_pages_to_images(pdf_path: str) -> List[str]:
-    if not fitz:
-        raise HTTPException(status_code=500, detail="pymupdf is not available on server")
-    doc = fitz.open(pdf_path)
-    out_paths: List[str] = []
+
+def _pool_busy_error(e: Exception) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"OCR workers are busy, please retry shortly ({e})",
+        headers={"Retry-After": os.getenv("OCR_POOL_RETRY_AFTER", "5")},
+    )
+
+
+async def _run_ocr_jobs(calls: List[tuple], on_done: Optional[Callable[[int, Any], Any]] = None) -> List[Any]:
+    """Run a batch of (fn, args) jobs concurrently; results (or exceptions) keep input order."""
     try:
-        for page_index in range(len(doc)):
-            page = doc[page_index]
-            pix = page.get_pixmap(dpi=200)
-            img_path = tempfile.NamedTemporaryFile(delete=False, suffix=f"_p{page_index+1}.png").name
-            pix.save(img_path)
-            out_paths.append(img_path)
-    finally:
-        doc.close()
-    return out_paths
+        return await get_ocr_pool().run_many(calls, on_done=on_done)
+    except OcrPoolBusy as e:
+        raise _pool_busy_error(e)
+
+
+def _record_ocr_tier_metrics(parsed: Dict[str, Any]) -> None:
+    """Aggregate per-tier counters from a freshly OCR'd page (workers run in other processes)."""
+    meta = parsed.get("ocr_meta") or {}
+    for tier in meta.get("tiers_run") or []:
+        metrics.incr(f"ocr_tier.{tier}.runs")
+    for esc in meta.get("escalations") or []:
+        metrics.incr(f"ocr_tier.escalations.{esc.get('to')}")
+        for field in esc.get("missing") or []:
+            metrics.incr(f"ocr_tier.escalated_for.{field}")
+    for field, tier in (meta.get("field_tiers") or {}).items():
+        metrics.incr(f"ocr_tier.field.{field}.{tier}")
+
+
+async def _ocr_files(
+    files: List[Dict[str, Any]],
+    debug_dir: Optional[str] = None,
+    on_page: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    OCR saved uploads ({filename, path, sha256, is_pdf}) and return the per-file results.
+    Whole files and individual PDF pages are looked up in the OCR cache by content hash
+    first; everything else is rendered/OCR'd concurrently on the OCR pool and then
+    reassembled per file in the original page order. PDF pages with a usable text
+    layer skip OCR entirely; the rest travel as in-memory arrays, and PNGs are
+    written only when debug_dir is set. Each page reports its "source".
+    on_page (sync) receives {filename, page, source, parsed, cached, done, total} as
+    each page becomes available, cached pages first.
+    """
+    cache = get_ocr_cache()
+    fingerprint = ocr_config_fingerprint()
+    for f in files:
+        f.setdefault("pages", [])
+        f.setdefault("error", None)
+        f["cached_pages"] = None
+    if cache is not None:
+        # Disk-tier lookups run off the event loop, all files at once
+        hits = await asyncio.gather(*(cache.aget(file_key(f["sha256"], fingerprint)) for f in files))
+        for f, hit in zip(files, hits):
+            f["cached_pages"] = hit
+
+    # Expand uncached PDFs concurrently: pages with a usable text layer come back already
+    # parsed, the rest as in-memory arrays for OCR
+    pdf_files = [f for f in files if f["is_pdf"] and f["cached_pages"] is None]
+    if pdf_files:
+        if render_pdf_pages is None:
+            raise HTTPException(status_code=500, detail="pymupdf is not available on server")
+        use_text_layer = pdf_text_layer_enabled()
+        rendered = await _run_ocr_jobs([
+            (render_pdf_pages, (f["path"], PDF_RENDER_DPI, debug_dir, use_text_layer)) for f in pdf_files
+        ])
+        for f, pages_or_err in zip(pdf_files, rendered):
+            if isinstance(pages_or_err, BaseException):
+                f["error"] = str(pages_or_err)
+            else:
+                f["pages"] = pages_or_err
+    for f in files:
+        if not f["is_pdf"] and f["cached_pages"] is None:
+            f["pages"] = [{
+                "page": 1,
+                "source": "ocr",
+                "image": f["path"],
+                "sha256": None,
+                "image_path": f["path"],
+                "parsed": None,
+            }]
+
+    # Per-page cache lookups; rendered PDF pages are keyed by their own raster bytes
+    lookup_pages = [pg for f in files if f["cached_pages"] is None for pg in f["pages"]]
+    for pg in lookup_pages:
+        pg["key"] = page_key(pg["sha256"], fingerprint) if cache is not None and pg["sha256"] else None
+        pg["hit"] = None
+    keyed = [pg for pg in lookup_pages if pg["key"]]
+    if keyed:
+        for pg, hit in zip(keyed, await asyncio.gather(*(cache.aget(pg["key"]) for pg in keyed))):
+            pg["hit"] = hit
+    jobs: List[tuple] = []
+    job_pages: List[tuple] = []
+    ready: List[tuple] = []
+    for f in files:
+        if f["cached_pages"] is not None:
+            for idx, entry in enumerate(f["cached_pages"]):
+                ready.append((f, idx + 1, entry.get("source", "ocr"), entry.get("parsed"), True))
+            continue
+        for pg in f["pages"]:
+            if pg["parsed"] is None and pg["hit"] is None:
+                jobs.append((extract_receipt_info, (pg["image"],)))
+                job_pages.append((f, pg))
+            else:
+                ready.append((f, pg["page"], pg["source"], pg["parsed"] or pg["hit"], pg["hit"] is not None))
+
+    done = 0
+    total = len(ready) + len(jobs)
+
+    def emit(f: Dict[str, Any], page: int, source: str, parsed: Any, cached: bool) -> None:
+        nonlocal done
+        done += 1
+        if on_page is not None:
+            on_page({
+                "filename": f["filename"],
+                "page": page,
+                "source": source,
+                "parsed": parsed,
+                "cached": cached,
+                "done": done,
+                "total": total,
+            })
+
+    for item in ready:
+        emit(*item)
+
+    def page_done(i: int, result: Any) -> None:
+        f, pg = job_pages[i]
+        parsed = {"error": str(result)} if isinstance(result, BaseException) else result
+        emit(f, pg["page"], pg["source"], parsed, False)
+
+    # OCR every remaining page of every file concurrently across the OCR workers (EasyOCR only)
+    parsed_pages = await _run_ocr_jobs(jobs, on_done=page_done if on_page is not None else None)
+
+    cursor = 0
+    per_file_results: List[Dict[str, Any]] = []
+    for f in files:
+        page_results: List[Dict[str, Any]] = []
+        if f["cached_pages"] is not None:
+            for idx, entry in enumerate(f["cached_pages"]):
+                page_results.append({
+                    "page": idx + 1,
+                    "image_path": None if f["is_pdf"] else f["path"],
+                    "source": entry.get("source", "ocr"),
+                    "parsed": entry.get("parsed"),
+                    "cached": True,
+                })
+        else:
+            for pg in f["pages"]:
+                cached = pg["hit"] is not None
+                if pg["parsed"] is not None:
+                    parsed = pg["parsed"]
+                elif cached:
+                    parsed = pg["hit"]
+                else:
+                    parsed = parsed_pages[cursor]
+                    cursor += 1
+                    if isinstance(parsed, BaseException):
+                        parsed = {"error": str(parsed)}
+                    else:
+                        _record_ocr_tier_metrics(parsed)
+                        if pg["key"] is not None and not parsed.get("error"):
+                            await cache.aset(pg["key"], parsed)
+                page_results.append({
+                    "page": pg["page"],
+                    "image_path": pg["image_path"],
+                    "source": pg["source"],
+                    "parsed": parsed,
+                    "cached": cached,
+                })
+            ok = not f["error"] and all(not (pg["parsed"] or {}).get("error") for pg in page_results)
+            if cache is not None and ok:
+                await cache.aset(
+                    file_key(f["sha256"], fingerprint),
+                    [{"source": pg["source"], "parsed": pg["parsed"]} for pg in page_results],
+                )
+        # Drop page arrays as soon as the file is assembled
+        f["pages"] = []
+        file_result: Dict[str, Any] = {
+            "filename": f["filename"],
+            "pages": page_results,
+        }
+        if f["error"]:
+            file_result["error"] = f["error"]
+        per_file_results.append(file_result)
+    return per_file_results
 
 
 # --- Simple DB-backed auth (email/password against app_user) ---
@@ -355,48 +855,548 @@ def _find_user_by_email(db, email: str):
     return db.query(case_models.AppUser).filter(case_models.AppUser.email == email).first()
 
 
+def _load_user_from_db(email: str) -> Optional[Dict[str, Any]]:
+    """Fetch a user by email from the DB and refresh its cache entry."""
+    db = _get_db_session()
+    try:
+        row = _find_user_by_email(db, email)
+        return remember_user(row) if row is not None else None
+    finally:
+        try:
+            db.close()
+        except Exception:
+            pass
+
+
 @app.post("/api/auth/login")
-def auth_login(req: LoginRequest):
-    if bcrypt is None:
-        raise HTTPException(status_code=500, detail="bcrypt not installed on server")
+async def auth_login(req: LoginRequest):
     email = (req.email or "").strip()
     password = (req.password or "").strip()
     if not email or not password:
         raise HTTPException(status_code=400, detail="email and password are required")
 
-    db = _get_db_session()
+    user = cached_user(email)
+    from_cache = user is not None
+    if user is None:
+        user = await asyncio.to_thread(_load_user_from_db, email)
+    if not user:
+        raise HTTPException(status_code=401, detail="invalid credentials")
     try:
-        user = _find_user_by_email(db, email)
-        if not user:
-            raise HTTPException(status_code=401, detail="invalid credentials")
+        ok = await check_password(password, user["password_hash"])
+        if not ok and from_cache:
+            # The password may have changed since the user was cached: retry if the DB hash differs
+            fresh = await asyncio.to_thread(_load_user_from_db, email)
+            if fresh is not None and fresh["password_hash"] != user["password_hash"]:
+                user = fresh
+                ok = await check_password(password, user["password_hash"])
+    except PasswordCheckBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Too many logins in progress, please retry shortly ({e})",
+            headers={"Retry-After": os.getenv("AUTH_RETRY_AFTER", "1")},
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not ok:
+        raise HTTPException(status_code=401, detail="invalid credentials")
+
+    signed = issue_token(user)
+    return {
+        "ok": True,
+        "token": signed["token"],
+        "expires_at": signed["expires_at"],
+        "user": public_user(user),
+    }
+
+
+async def require_token(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """Dependency for authenticated endpoints: verifies the bearer token without a DB round-trip."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return verify_token(token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/api/auth/me")
+async def auth_me(claims: Dict[str, Any] = Depends(require_token)):
+    return {
+        "ok": True,
+        "user": {"id": claims.get("sub"), "email": claims.get("email"), "role": claims.get("role")},
+        "expires_at": claims.get("exp"),
+    }
+
+
+def _consolidate_receipt_summary(per_file_results: List[Dict[str, Any]], issue_description: Optional[str]) -> Dict[str, Any]:
+    """Build a consolidated payload for eligibility from the first successfully parsed page."""
+    consolidated: Dict[str, Any] = {"item": None, "price": None, "date": None}
+    for f in per_file_results:
+        for pg in f.get("pages", []):
+            parsed = pg.get("parsed") or {}
+            if isinstance(parsed, dict) and not parsed.get("error"):
+                # Item
+                item = None
+                items = parsed.get("item_list") or []
+                if isinstance(items, list) and items:
+                    first = items[0] or {}
+                    if isinstance(first, dict):
+                        item = first.get("description")
+                if not item and parsed.get("seller_name"):
+                    item = f"purchase at {parsed.get('seller_name')}"
+                if item and not consolidated.get("item"):
+                    consolidated["item"] = item
+
+                # Price
+                pt = parsed.get("purchase_total") or {}
+                if isinstance(pt, dict) and not consolidated.get("price"):
+                    raw_val = pt.get("value")
+                    val_f = None
+                    try:
+                        if raw_val is not None and str(raw_val) != "":
+                            val_f = float(raw_val)
+                    except Exception:
+                        val_f = None
+                    if val_f is not None:
+                        consolidated["price"] = {
+                            "currency": pt.get("currency", "USD"),
+                            "value": val_f,
+                        }
+
+                # Date
+                pd = parsed.get("purchase_date")
+                if isinstance(pd, str) and pd and not consolidated.get("date"):
+                    consolidated["date"] = {"raw": pd}
+
+    # Fallback to issue_description if item still missing
+    if not consolidated.get("item") and issue_description:
+        consolidated["item"] = issue_description[:80]
+    return consolidated
+
+
+async def _classify_stage(
+    issue_description: Optional[str], consolidated: Dict[str, Any], use_cache: bool = True
+) -> Any:
+    """
+    Issue classification (uses OCR-derived summary + user description).
+    The local classifier sees only the user's description; the LLM is consulted when it is unsure.
+    """
+    classification = None
+    try:
+        if classify_issue is not None:
+            parts = []
+            if issue_description:
+                parts.append(f"Issue: {issue_description}")
+            # Build a compact summary line from consolidated fields
+            itm = consolidated.get("item")
+            pr = consolidated.get("price") or {}
+            dt = (consolidated.get("date") or {}).get("raw")
+            total_txt = None
+            if isinstance(pr, dict) and pr.get("value") is not None:
+                total_txt = f"{pr.get('currency','USD')} {pr.get('value')}"
+            fields: List[str] = []
+            if itm:
+                fields.append(f"item={itm}")
+            if total_txt:
+                fields.append(f"total={total_txt}")
+            if dt:
+                fields.append(f"date={dt}")
+            if not fields:
+                fields.append("(empty)")
+            parts.append("Receipt: " + ", ".join(fields))
+            classification_input = "\n".join([p for p in parts if p])
+            classification = await classify_gated(
+                issue_description or "",
+                lambda: classify_issue(classification_input, use_cache=use_cache),
+            )
+    except Exception as e:
+        classification = {"error": str(e)}
+    return classification
+
+
+async def _eligibility_stage(consolidated: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+    """Eligibility check (reuse existing logic)."""
+    eligible, reason, model_name, cached = await generate_rationale_with_fallback(consolidated, use_cache=use_cache)
+    return {"eligible": eligible, "reason": reason, "model": model_name, "cached": cached}
+
+
+async def _report_stage(
+    issue_description: Optional[str],
+    classification: Any,
+    eligibility: Dict[str, Any],
+    consolidated: Dict[str, Any],
+    use_cache: bool = True,
+    on_report_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Final handling report via AI agent (optional, reuse existing analyzer).
+    With on_report_item the report is token-streamed and each key point/step is passed
+    on as soon as it is complete; the returned report is the same either way.
+    """
+    final_report = None
+    try:
+        if analyze_issue is not None:
+            # Provide a compact string to the agent including OCR summary, classification and eligibility
+            combined = (
+                f"Issue: {issue_description or ''}\n"
+                f"Classification: {json.dumps(classification, ensure_ascii=False)}\n"
+                f"Eligibility: {'eligible' if eligibility['eligible'] else 'not eligible'}; reason={eligibility['reason']}\n"
+                f"Receipt summary: {json.dumps(consolidated, ensure_ascii=False)}"
+            )
+            # Call the analyzer and normalize its return value to a dict with an 'analysis' field
+            try:
+                if on_report_item is not None and analyze_issue_stream is not None:
+                    resp = None
+                    async for ev in analyze_issue_stream(combined, use_cache=use_cache):
+                        if ev["type"] == "final":
+                            resp = ev["report"]
+                        elif ev["type"] != "start":
+                            on_report_item(ev)
+                else:
+                    resp = await analyze_issue(combined, use_cache=use_cache)
+                if isinstance(resp, str):
+                    final_report = {"analysis": resp}
+                elif isinstance(resp, dict):
+                    # Ensure at minimum 'analysis' exists (may be raw text or structured)
+                    if "analysis" not in resp:
+                        # try to synthesize a readable analysis
+                        resp_text = resp.get("analysis") or json.dumps(resp, ensure_ascii=False)
+                        resp["analysis"] = resp_text
+                    final_report = resp
+                else:
+                    final_report = {"analysis": str(resp)}
+            except Exception as e:
+                final_report = {"error": str(e), "analysis": ""}
+        else:
+            final_report = {"analysis": ""}
+    except Exception as e:
+        # Catch any unexpected error when preparing the agent call
+        final_report = {"error": str(e), "analysis": ""}
+    return final_report
+
+
+def _build_analysis_graph(
+    files: List[Dict[str, Any]],
+    issue_description: Optional[str],
+    debug_dir: Optional[str],
+    use_cache: bool = True,
+    on_page: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_report_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+    persist_user_email: Optional[str] = None,
+) -> StageGraph:
+    """
+    Receipt analysis as a stage graph:
+        ocr -> summary -> {classify, eligibility} -> report
+    classify and eligibility only need the consolidated summary, so they run concurrently.
+    With persist_user_email the rows are written asynchronously as soon as classification
+    and eligibility are known (concurrently with the report); persist_summary then fills
+    case.latest_summary from the report.
+    """
+    async def ocr(r: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return await _ocr_files(files, debug_dir=debug_dir, on_page=on_page)
+
+    async def summary(r: Dict[str, Any]) -> Dict[str, Any]:
+        return _consolidate_receipt_summary(r["ocr"], issue_description)
+
+    async def classify(r: Dict[str, Any]) -> Any:
+        return await _classify_stage(issue_description, r["summary"], use_cache)
+
+    async def eligibility(r: Dict[str, Any]) -> Dict[str, Any]:
+        return await _eligibility_stage(r["summary"], use_cache)
+
+    async def report(r: Dict[str, Any]) -> Dict[str, Any]:
+        return await _report_stage(
+            issue_description, r["classify"], r["eligibility"], r["summary"], use_cache, on_report_item
+        )
+
+    graph = (
+        StageGraph()
+        .add("ocr", ocr)
+        .add("summary", summary, ["ocr"])
+        .add("classify", classify, ["summary"])
+        .add("eligibility", eligibility, ["summary"])
+        .add("report", report, ["classify", "eligibility"])
+    )
+    if persist_user_email is None:
+        return graph
+
+    async def persist(r: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            stored = (getattr(user, "password_hash", None) or "").encode("utf-8")
-            if not stored or not bcrypt.checkpw(password.encode("utf-8"), stored):
-                raise HTTPException(status_code=401, detail="invalid credentials")
-        except HTTPException:
-            raise
-        except Exception:
-            # Avoid leaking details
-            raise HTTPException(status_code=401, detail="invalid credentials")
+            return await persist_analysis(
+                user_email=persist_user_email,
+                title=(r["summary"].get("item") or "Receipt Analysis"),
+                issue_description=issue_description,
+                classification=r["classify"],
+                eligibility=r["eligibility"],
+            )
+        except UnknownUserError:
+            raise HTTPException(status_code=400, detail="AppUser not found for given user_email")
+        except Exception as e:
+            # Do not fail the whole request if persistence fails
+            print(f"[persist] error: {e}")
+            return {"error": str(e)}
 
-        # Minimal opaque token (base64). For production use JWT with signing.
-        token = base64.b64encode(f"{email}:{int(datetime.utcnow().timestamp())}".encode("utf-8")).decode("utf-8")
-        return {
-            "ok": True,
-            "token": token,
-            "user": {
-                "id": getattr(user, "id", None),
-                "email": getattr(user, "email", None),
-                "role": getattr(user, "role", None),
-            },
-        }
-    finally:
+    async def persist_summary(r: Dict[str, Any]) -> Dict[str, Any]:
+        ids = r["persist"]
+        if ids.get("case_id") is not None:
+            try:
+                await update_case_summary(ids["case_id"], r["report"])
+            except Exception as e:
+                print(f"[persist] summary update error: {e}")
+                return {**ids, "summary_error": str(e)}
+        return ids
+
+    return (
+        graph
+        .add("persist", persist, ["summary", "classify", "eligibility"])
+        .add("persist_summary", persist_summary, ["persist", "report"])
+    )
+
+
+def _remove_files(paths: List[str]) -> None:
+    for p in paths:
         try:
-            db.close()
+            if os.path.exists(p):
+                os.unlink(p)
         except Exception:
             pass
 
 
+async def _require_user(user_email: str) -> None:
+    """
+    400 for an unknown user before a write-behind analysis starts (the batch insert would
+    only park the entry later). If the lookup itself fails the entry is queued anyway:
+    the queue exists to ride out database outages.
+    """
+    try:
+        user = await lookup_user(user_email)
+    except Exception as e:
+        print(f"[persist] user lookup failed, queueing anyway: {e}")
+        return
+    if user is None:
+        raise HTTPException(status_code=400, detail="AppUser not found for given user_email")
+
+
+async def _run_analysis(
+    case_id: str,
+    files: List[Dict[str, Any]],
+    issue_description: Optional[str],
+    *,
+    store: bool,
+    user_email: Optional[str],
+    debug_dir: Optional[str],
+    include_timings: bool,
+    use_cache: bool,
+    ingest_stats: Dict[str, Any],
+    on_page: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_stage_done: Optional[Callable[[str, Any], Any]] = None,
+    on_report_item: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Run the stage graph over ingested files, optionally persist, and build the response."""
+    write_behind = bool(store) and write_behind_enabled()
+    persist_in_graph = bool(store) and not write_behind and async_persistence_enabled()
+    if write_behind:
+        await _require_user(user_email)
+    graph = _build_analysis_graph(
+        files, issue_description, debug_dir, use_cache,
+        on_page=on_page,
+        on_report_item=on_report_item,
+        persist_user_email=user_email if persist_in_graph else None,
+    )
+    results, timings = await graph.run(on_stage_done=on_stage_done)
+    per_file_results = results["ocr"]
+    consolidated = results["summary"]
+    classification = results["classify"]
+    eligibility = results["eligibility"]
+    final_report = results["report"]
+
+    # Optionally persist to database
+    persisted: Dict[str, Any] | None = None
+    if write_behind:
+        # Journaled now, inserted with the next batch; ids are not known yet
+        persisted = await get_write_behind().enqueue(
+            user_email=user_email,
+            title=(consolidated.get("item") or "Receipt Analysis"),
+            issue_description=issue_description,
+            classification=classification,
+            eligibility=eligibility,
+            final_report=final_report,
+        )
+    elif persist_in_graph:
+        persisted = results["persist_summary"]
+    elif store:
+        # Sync SQLAlchemy fallback (PERSIST_MODE=sync or no async driver), off the event loop
+        try:
+            persisted = await asyncio.to_thread(
+                _persist_analysis_to_db,
+                user_email=user_email,
+                title=(consolidated.get("item") or "Receipt Analysis"),
+                issue_description=issue_description,
+                classification=classification,
+                eligibility=eligibility,
+                final_report=final_report,
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            # Do not fail the whole request if persistence fails
+            try:
+                print(f"[persist] error: {e}")
+            except Exception:
+                pass
+            persisted = {"error": str(e)}
+
+    response: Dict[str, Any] = {
+        "ok": True,
+        "case_id": case_id,
+        "issue_description": issue_description,
+        "classification": classification,
+        "eligibility": {
+            **eligibility,
+            "summary": consolidated,
+        },
+        "final_report": final_report,
+        "receipts": per_file_results,
+        **({"db": persisted} if persisted is not None else {}),
+    }
+    if include_timings:
+        # Stage times are milliseconds relative to the start of the graph (after ingest)
+        response["timings"] = {"ingest": ingest_stats, "stages": timings}
+    return response
+
+
+# Progress reported once each stage finishes (OCR pages fill the 10..60 range as they complete)
+_STAGE_PROGRESS = {"ocr": 60, "summary": 65, "classify": 75, "eligibility": 85, "persist": 90, "report": 95, "persist_summary": 98}
+
+
+# SSE event name per finished stage, and the parsed fields sent with each OCR page
+_STAGE_EVENTS = {
+    "ocr": "ocr",
+    "summary": "summary",
+    "classify": "classification",
+    "eligibility": "eligibility",
+    "report": "report",
+    "persist": "db",
+    "persist_summary": "db_summary",
+}
+_PAGE_EVENT_FIELDS = ("seller_name", "purchase_date", "purchase_total", "field_confidence", "error")
+
+
+class _ProgressWriter:
+    """
+    Records a background job's progress in the status store off the event loop (a
+    SQLite store write can wait on other processes). Updates are merged: while one
+    write is in flight only the latest (percent, stage) is kept for the next one.
+    """
+
+    def __init__(self, case_id: str):
+        self.case_id = case_id
+        self._pending: Optional[tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def set(self, pct: int, stage: str) -> None:
+        self._pending = (pct, stage)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while self._pending is not None:
+            (pct, stage), self._pending = self._pending, None
+            try:
+                await asyncio.to_thread(case_status.set_progress, self.case_id, pct, stage)
+            except Exception as e:
+                print(f"[status] progress update for {self.case_id} failed: {e}")
+
+    async def flush(self) -> None:
+        """Wait until every recorded update is written (call before the final status write)."""
+        if self._task is not None:
+            await self._task
+
+    def discard(self) -> None:
+        self._pending = None
+
+
+def _progress_hooks(case_id: str, status_writer: Optional[_ProgressWriter] = None) -> Dict[str, Callable]:
+    """
+    on_page / on_stage_done / on_report_item callbacks (as _run_analysis kwargs) that
+    publish SSE events for case_id and, for background jobs, also record progress
+    in the status store through status_writer.
+    """
+    hub = get_event_hub()
+    high = {"pct": 0}
+
+    def progress(pct: int, stage: str) -> None:
+        high["pct"] = max(high["pct"], pct)
+        if status_writer is not None:
+            status_writer.set(pct, stage)
+        hub.publish(case_id, "status", {"stage": stage, "progress_percent": high["pct"]})
+
+    def on_page(ev: Dict[str, Any]) -> None:
+        parsed = ev.get("parsed") or {}
+        hub.publish(case_id, "ocr_page", {
+            "filename": ev["filename"],
+            "page": ev["page"],
+            "source": ev["source"],
+            "cached": ev["cached"],
+            "fields": {k: parsed.get(k) for k in _PAGE_EVENT_FIELDS if parsed.get(k) is not None},
+        })
+        progress(10 + int(50 * ev["done"] / max(1, ev["total"])), f"ocr:{ev['filename']}#{ev['page']}")
+
+    def on_stage_done(name: str, result: Any) -> None:
+        data = result
+        if name == "ocr":
+            data = {"files": len(result), "pages": sum(len(f.get("pages") or []) for f in result)}
+        hub.publish(case_id, _STAGE_EVENTS.get(name, name), data)
+        progress(_STAGE_PROGRESS.get(name, 0), name)
+
+    def on_report_item(ev: Dict[str, Any]) -> None:
+        # report_key_point / report_step, each as soon as the model has finished it
+        hub.publish(case_id, f"report_{ev['type']}", {"index": ev["index"], "text": ev["text"]})
+
+    return {"on_page": on_page, "on_stage_done": on_stage_done, "on_report_item": on_report_item}
+
+
+async def _analysis_job(case_id: str, saved_paths: List[str], **kwargs: Any) -> None:
+    """Background body of an async analysis: runs the pipeline and records progress/result in status."""
+    hub = get_event_hub()
+    writer = _ProgressWriter(case_id)
+    hooks = _progress_hooks(case_id, writer)
+
+    async def fail(detail: str) -> None:
+        await writer.flush()
+        await asyncio.to_thread(case_status.set_error, case_id, detail)
+        hub.publish(case_id, "error", {"detail": detail})
+
+    try:
+        await asyncio.to_thread(case_status.start_analysis, case_id)
+        writer.set(10, "ocr")
+        result = await _run_analysis(case_id, **hooks, **kwargs)
+        # Progress writes still in flight must not land after the final entry
+        await writer.flush()
+        await asyncio.to_thread(case_status.set_result, case_id, result)
+        # Late subscribers replay a stub pointing at /result instead of the full payload
+        hub.publish(case_id, "result", result, ref={"result_url": f"/api/cases/{case_id}/result"})
+    except asyncio.CancelledError:
+        # Shutting down: record the error directly instead of awaiting more work
+        writer.discard()
+        case_status.set_error(case_id, "cancelled: server shutting down")
+        hub.publish(case_id, "error", {"detail": "cancelled: server shutting down"})
+        raise
+    except HTTPException as e:
+        await fail(str(e.detail))
+    except Exception as e:
+        await fail(str(e) or type(e).__name__)
+        raise
+    finally:
+        _remove_files(saved_paths)
+
+
+def _queue_case(case_id: str) -> None:
+    case_status.init_case(case_id)
+    case_status.set_progress(case_id, 5, "queued")
+
+
 @app.post("/api/receipt/analyze")
 async def analyze_receipt(
     receipt_files: List[UploadFile] = File(..., description="Receipt images or PDFs"),
@@ -407,6 +1407,15 @@ async def analyze_receipt(
     ),
     store: Optional[bool] = Form(False, description="If true, persist results into DB"),
     user_email: Optional[str] = Form(None, description="When store=true, email of AppUser to own the case"),
+    debug_artifacts: Optional[bool] = Form(False, description="If true, keep rendered PDF page PNGs under uploads/debug"),
+    include_timings: Optional[bool] = Form(False, description="If true, return per-stage start/end timings"),
+    llm_cache: Optional[bool] = Form(True, description="If false, bypass the LLM response cache for this request"),
+    async_mode: Optional[bool] = Form(
+        False,
+        alias="async",
+        description="If true, return the case_id immediately and analyze in the background; "
+                    "poll /api/cases/{case_id}/status and fetch /api/cases/{case_id}/result",
+    ),
 ):
     """
     Accept receipt images/PDFs, run OCR + basic parsing using existing utilities,
@@ -414,209 +1423,173 @@ async def analyze_receipt(
     """
     if not extract_receipt_info:
         raise HTTPException(status_code=500, detail="OCR utilities not available on server")
+    if store and not user_email:
+        raise HTTPException(status_code=400, detail="user_email is required when store=true")
 
     saved_paths: List[str] = []
-    page_image_paths: List[str] = []
-    per_file_results: List[Dict[str, Any]] = []
     # Normalize/auto-generate case id if not provided
     case_id_normalized = (case_id or "").strip()
     if not case_id_normalized:
         ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
         rand = uuid.uuid4().hex[:6].upper()
         case_id_normalized = f"CASE-{ts}-{rand}"
+    if async_mode and case_status.case_exists(case_id_normalized) and (
+        case_status.get_case_status(case_id_normalized).get("status")
+        not in (case_status.ANALYSIS_COMPLETED, case_status.ANALYSIS_FAILED)
+    ):
+        raise HTTPException(status_code=409, detail=f"Case {case_id_normalized} is already being analyzed")
 
+    handed_off = False
     try:
-        # Save uploads to temp and expand PDFs into page images
-        for upl in receipt_files:
-            tmp_path = _save_upload_to_temp(upl)
-            saved_paths.append(tmp_path)
-            fname = upl.filename or os.path.basename(tmp_path)
-            lower = fname.lower()
-            pages: List[str] = []
-            if lower.endswith(".pdf") or upl.content_type == "application/pdf":
-                pages = _render_pdf_pages_to_images(tmp_path)
-            else:
-                pages = [tmp_path]
-            page_image_paths.extend(pages)
-
-            # OCR each page/image and collect parsed fields using EasyOCR only
-            page_results: List[Dict[str, Any]] = []
-            for p in pages:
-                try:
-                    parsed = extract_receipt_info(p)  # EasyOCR path only
-                except Exception as e:
-                    parsed = {"error": str(e)}
-                page_results.append({
-                    "image_path": p,
-                    "parsed": parsed,
-                })
-            per_file_results.append({
-                "filename": fname,
-                "pages": page_results,
-            })
-
-        # Build a consolidated payload for eligibility from the first successfully parsed page
-        consolidated: Dict[str, Any] = {"item": None, "price": None, "date": None}
-        for f in per_file_results:
-            for pg in f.get("pages", []):
-                parsed = pg.get("parsed") or {}
-                if isinstance(parsed, dict) and not parsed.get("error"):
-                    # Item
-                    item = None
-                    items = parsed.get("item_list") or []
-                    if isinstance(items, list) and items:
-                        first = items[0] or {}
-                        if isinstance(first, dict):
-                            item = first.get("description")
-                    if not item and parsed.get("seller_name"):
-                        item = f"purchase at {parsed.get('seller_name')}"
-                    if item and not consolidated.get("item"):
-                        consolidated["item"] = item
-
-                    # Price
-                    pt = parsed.get("purchase_total") or {}
-                    if isinstance(pt, dict) and not consolidated.get("price"):
-                        raw_val = pt.get("value")
-                        val_f = None
-                        try:
-                            if raw_val is not None and str(raw_val) != "":
-                                val_f = float(raw_val)
-                        except Exception:
-                            val_f = None
-                        if val_f is not None:
-                            consolidated["price"] = {
-                                "currency": pt.get("currency", "USD"),
-                                "value": val_f,
-                            }
-
-                    # Date
-                    pd = parsed.get("purchase_date")
-                    if isinstance(pd, str) and pd and not consolidated.get("date"):
-                        consolidated["date"] = {"raw": pd}
-
-        # Fallback to issue_description if item still missing
-        if not consolidated.get("item") and issue_description:
-            consolidated["item"] = issue_description[:80]
-
-        # 1) Issue classification first (uses OCR-derived summary + user description)
-        classification = None
-        try:
-            if classify_issue is not None:
-                parts = []
-                if issue_description:
-                    parts.append(f"Issue: {issue_description}")
-                # Build a compact summary line from consolidated fields
-                itm = consolidated.get("item")
-                pr = consolidated.get("price") or {}
-                dt = (consolidated.get("date") or {}).get("raw")
-                total_txt = None
-                if isinstance(pr, dict) and pr.get("value") is not None:
-                    total_txt = f"{pr.get('currency','USD')} {pr.get('value')}"
-                fields: List[str] = []
-                if itm:
-                    fields.append(f"item={itm}")
-                if total_txt:
-                    fields.append(f"total={total_txt}")
-                if dt:
-                    fields.append(f"date={dt}")
-                if not fields:
-                    fields.append("(empty)")
-                parts.append("Receipt: " + ", ".join(fields))
-                classification_input = "\n".join([p for p in parts if p])
-                classification = await classify_issue(classification_input)
-        except Exception as e:
-            classification = {"error": str(e)}
-
-        # 2) Eligibility check second (reuse existing logic)
-        eligible, reason, model_name = await generate_rationale_with_fallback(consolidated)
-
-        # 3) Final handling report via AI agent (optional, reuse existing analyzer)
-        final_report = None
-        try:
-            if analyze_issue is not None:
-                # Build a comprehensive context for the agent including OCR summary, classification and eligibility
-                agent_payload = {
-                    "issue_description": issue_description,
-                    "classification": classification,
-                    "eligibility": {"eligible": eligible, "reason": reason, "model": model_name},
-                    "receipt_summary": consolidated,
-                }
-                # Provide a compact string to the agent
-                combined = (
-                    f"Issue: {issue_description or ''}\n"
-                    f"Classification: {json.dumps(classification, ensure_ascii=False)}\n"
-                    f"Eligibility: {'eligible' if eligible else 'not eligible'}; reason={reason}\n"
-                    f"Receipt summary: {json.dumps(consolidated, ensure_ascii=False)}"
-                )
-                # Call the analyzer and normalize its return value to a dict with an 'analysis' field
-                try:
-                    resp = await analyze_issue(combined)
-                    if isinstance(resp, str):
-                        final_report = {"analysis": resp}
-                    elif isinstance(resp, dict):
-                        # Ensure at minimum 'analysis' exists (may be raw text or structured)
-                        if "analysis" not in resp:
-                            # try to synthesize a readable analysis
-                            resp_text = resp.get("analysis") or json.dumps(resp, ensure_ascii=False)
-                            resp["analysis"] = resp_text
-                        final_report = resp
-                    else:
-                        final_report = {"analysis": str(resp)}
-                except Exception as e:
-                    final_report = {"error": str(e), "analysis": ""}
-            else:
-                final_report = {"analysis": ""}
-        except Exception as e:
-            # Catch any unexpected error when preparing the agent call
-            final_report = {"error": str(e), "analysis": ""}
-
-        # Optionally persist to database
-        persisted: Dict[str, Any] | None = None
-        if store:
-            if not user_email:
-                raise HTTPException(status_code=400, detail="user_email is required when store=true")
+        # Stream uploads to temp files: hashed on the way, size-limited, typed by magic bytes
+        ingested, ingest_stats = await ingest_uploads(receipt_files)
+        saved_paths.extend(f.path for f in ingested)
+        files: List[Dict[str, Any]] = [
+            {"filename": f.filename, "path": f.path, "sha256": f.sha256, "is_pdf": f.is_pdf}
+            for f in ingested
+        ]
+
+        debug_dir = None
+        if debug_artifacts or os.getenv("OCR_DEBUG_ARTIFACTS", "").lower() in {"1", "true", "yes"}:
+            debug_dir = _debug_dir(case_id_normalized)
+
+        run_kwargs: Dict[str, Any] = dict(
+            files=files,
+            issue_description=issue_description,
+            store=bool(store),
+            user_email=user_email,
+            debug_dir=debug_dir,
+            include_timings=bool(include_timings),
+            use_cache=bool(llm_cache),
+            ingest_stats=ingest_stats,
+        )
+        hub = get_event_hub()
+        hub.open(case_id_normalized)
+        if not async_mode:
+            # Same events as a background job, so a client can follow /api/cases/{id}/events meanwhile
+            hooks = _progress_hooks(case_id_normalized)
             try:
-                persisted = _persist_analysis_to_db(
-                    user_email=user_email,
-                    title=(consolidated.get("item") or "Receipt Analysis"),
-                    issue_description=issue_description,
-                    classification=classification,
-                    eligibility={"eligible": eligible, "reason": reason, "model": model_name},
-                    final_report=final_report,
-                )
-            except HTTPException:
+                result = await _run_analysis(case_id_normalized, **hooks, **run_kwargs)
+            except HTTPException as e:
+                hub.publish(case_id_normalized, "error", {"detail": str(e.detail)})
                 raise
             except Exception as e:
-                # Do not fail the whole request if persistence fails
-                try:
-                    print(f"[persist] error: {e}")
-                except Exception:
-                    pass
-                persisted = {"error": str(e)}
+                hub.publish(case_id_normalized, "error", {"detail": str(e) or type(e).__name__})
+                raise
+            hub.publish(case_id_normalized, "result", result)
+            return result
 
-        return {
+        await asyncio.to_thread(_queue_case, case_id_normalized)
+        hub.publish(case_id_normalized, "status", {"stage": "queued", "progress_percent": 5})
+        paths = list(saved_paths)
+
+        def on_cancel() -> None:
+            case_status.set_error(case_id_normalized, "cancelled: server shutting down")
+            hub.publish(case_id_normalized, "error", {"detail": "cancelled: server shutting down"})
+            _remove_files(paths)
+
+        try:
+            get_job_queue().submit(
+                case_id_normalized,
+                lambda: _analysis_job(case_id_normalized, paths, **run_kwargs),
+                on_cancel=on_cancel,
+            )
+        except JobQueueFull as e:
+            await asyncio.to_thread(case_status.set_error, case_id_normalized, str(e))
+            hub.publish(case_id_normalized, "error", {"detail": str(e)})
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": os.getenv("JOB_RETRY_AFTER", "5")},
+            )
+        # The background job now owns the temp files
+        handed_off = True
+        return JSONResponse(status_code=202, content={
             "ok": True,
             "case_id": case_id_normalized,
-            "issue_description": issue_description,
-            "classification": classification,
-            "eligibility": {
-                "eligible": eligible,
-                "reason": reason,
-                "model": model_name,
-                "summary": consolidated,
-            },
-            "final_report": final_report,
-            "receipts": per_file_results,
-            **({"db": persisted} if persisted is not None else {}),
-        }
+            "async": True,
+            "status_url": f"/api/cases/{case_id_normalized}/status",
+            "result_url": f"/api/cases/{case_id_normalized}/result",
+            "events_url": f"/api/cases/{case_id_normalized}/events",
+            **case_status.to_response(case_id_normalized),
+        })
     finally:
-        # Clean up only the temp PDFs; keep page images if they are the same temp path
-        for p in saved_paths:
-            try:
-                if os.path.exists(p):
-                    os.unlink(p)
-            except Exception:
-                pass
+        # Clean up the temp uploads; PDF pages never touch disk unless debug artifacts were requested
+        if not handed_off:
+            _remove_files(saved_paths)
+
+
+@app.get("/api/cases/{case_id}/status")
+def get_case_status(case_id: str):
+    """Status and progress of an (async) analysis."""
+    if not case_status.case_exists(case_id):
+        raise HTTPException(status_code=404, detail="Unknown case_id")
+    return {"case_id": case_id, **case_status.to_response(case_id)}
+
+
+@app.get("/api/cases/{case_id}/result")
+def get_case_result(case_id: str):
+    """Analysis result once ready; 202 with the current status while it is still running."""
+    if not case_status.case_exists(case_id):
+        raise HTTPException(status_code=404, detail="Unknown case_id")
+    st = case_status.to_response(case_id)
+    if st["status"] == case_status.ANALYSIS_COMPLETED:
+        return case_status.get_result(case_id)
+    if st["status"] == case_status.ANALYSIS_FAILED:
+        raise HTTPException(status_code=500, detail=st.get("error") or "analysis failed")
+    return JSONResponse(status_code=202, content={"case_id": case_id, **st})
+
+
+@app.get("/api/cases/{case_id}/events")
+async def case_events(case_id: str, request: Request):
+    """
+    Server-Sent Events for an analysis: status, ocr_page (parsed fields per page), ocr,
+    summary, classification, eligibility, report, then a final result (or error) event.
+    Late or reconnecting clients get the history replayed (honours Last-Event-ID).
+    Cases this worker does not have a stream for (run by another worker, or evicted)
+    are followed through the shared status store instead: status events, then result/error.
+    """
+    hub = get_event_hub()
+    if hub.has(case_id):
+        try:
+            last_event_id = int(request.headers.get("last-event-id") or 0)
+        except ValueError:
+            last_event_id = 0
+        events = sse_stream(hub, case_id, last_event_id)
+    elif await asyncio.to_thread(case_status.case_exists, case_id):
+        events = sse_events(_polled_events(case_id))
+    else:
+        raise HTTPException(status_code=404, detail="Unknown case_id")
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _polled_events(case_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """Events for a case followed through the status store (EVENTS_POLL_SECONDS apart, default 1)."""
+    interval = float(os.getenv("EVENTS_POLL_SECONDS", "1"))
+    last: Any = None
+    n = 0
+    while True:
+        st = await asyncio.to_thread(case_status.to_response, case_id)
+        n += 1
+        if st["status"] == case_status.ANALYSIS_COMPLETED:
+            yield {"id": n, "event": "result", "data": await asyncio.to_thread(case_status.get_result, case_id)}
+            return
+        if st["status"] == case_status.ANALYSIS_FAILED:
+            yield {"id": n, "event": "error", "data": {"detail": st.get("error") or "analysis failed"}}
+            return
+        if st["status"] is None:
+            # Dropped from the status store (expired) while we were following it
+            yield {"id": n, "event": "error", "data": {"detail": "Unknown case_id"}}
+            return
+        snapshot = {"stage": st.get("stage"), "progress_percent": st.get("progress_percent")}
+        if snapshot != last:
+            yield {"id": n, "event": "status", "data": snapshot}
+            last = snapshot
+        await asyncio.sleep(interval)
 
 
 def _persist_analysis_to_db(
@@ -639,65 +1612,26 @@ def _persist_analysis_to_db(
         except Exception:
             from case import models as case_models  # type: ignore
 
-        # Find user
-        user = db.query(case_models.AppUser).filter(case_models.AppUser.email == user_email).first()
+        # Find user (in-process cache first)
+        user = cached_user(user_email)
+        if user is None:
+            row = db.query(case_models.AppUser).filter(case_models.AppUser.email == user_email).first()
+            user = remember_user(row) if row is not None else None
         if not user:
             raise HTTPException(status_code=400, detail="AppUser not found for given user_email")
 
-        # Prepare fields
-        from datetime import datetime as _dt
-        now = _dt.utcnow()
-        case = case_models.Case(
-            user_id=getattr(user, "id"),
-            status="analysis_completed",
-            title=(title or "Receipt Analysis"),
-            latest_summary=(
-                (final_report or {}).get("analysis")
-                if isinstance(final_report, dict)
-                else (str(final_report) if final_report is not None else None)
-            ),
-            needs_review=False,
-            created_at=now,
-            updated_at=now,
-        )
+        # Prepare fields (shared with the async persistence path)
+        rows = build_analysis_rows(title, issue_description, classification, eligibility, final_report)
+        case = case_models.Case(user_id=user["id"], **rows["case"])
         db.add(case)
         db.flush()  # get case.id
 
         # Issue row
-        clf_category = None
-        clf_conf = None
-        annotations = None
-        if isinstance(classification, dict):
-            annotations = classification
-            clf_category = classification.get("category") or classification.get("type")
-            try:
-                cval = classification.get("confidence")
-                if cval is not None:
-                    clf_conf = float(cval)
-            except Exception:
-                clf_conf = None
-
-        issue = case_models.Issue(
-            case_id=getattr(case, "id"),
-            description=(issue_description or (title or "")) or "",
-            classification=(clf_category or None),
-            clf_confidence=clf_conf,
-            ai_annotations=annotations,
-            created_at=now,
-        )
+        issue = case_models.Issue(case_id=getattr(case, "id"), **rows["issue"])
         db.add(issue)
 
         # EligibilityDecision row
-        status_txt = "eligible" if bool(eligibility.get("eligible")) else "ineligible"
-        rationale_txt = str(eligibility.get("reason") or "")
-        decision = case_models.EligibilityDecision(
-            case_id=getattr(case, "id"),
-            policy_snapshot_id=None,
-            status=status_txt,
-            rationale=rationale_txt,
-            lenient_flag=False,
-            decided_at=now,
-        )
+        decision = case_models.EligibilityDecision(case_id=getattr(case, "id"), **rows["decision"])
         db.add(decision)
 
         db.commit()
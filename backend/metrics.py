@@ -0,0 +1,37 @@
+"""
+metrics.py
+
+Minimal process-local counters and gauges, surfaced by GET /api/metrics.
+Values are plain numbers keyed by dotted names (e.g. "ocr_pool.rejected").
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict
+
+
+_LOCK = threading.Lock()
+_COUNTERS: Dict[str, float] = {}
+_GAUGES: Dict[str, float] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _LOCK:
+        _GAUGES[name] = value
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    with _LOCK:
+        return {"counters": dict(_COUNTERS), "gauges": dict(_GAUGES)}
+
+
+def reset() -> None:
+    with _LOCK:
+        _COUNTERS.clear()
+        _GAUGES.clear()
@@ -0,0 +1,68 @@
+"""
+ocr_cache.py
+
+Content-addressed cache of parsed OCR results. Keys combine the SHA-256 of the
+uploaded file (or of a rendered PDF page) with the OCR configuration fingerprint,
+so the same bytes processed with the same settings are only OCR'd once.
+
+Configuration (environment):
+- OCR_CACHE_ENABLED: default true
+- OCR_CACHE_ENTRIES: in-memory LRU size (default 512)
+- OCR_CACHE_PATH: SQLite file for the optional on-disk tier (disabled when unset)
+- OCR_CACHE_MAX_BYTES: size bound for the disk tier (default 256 MiB)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    from .cache import LRUCache, SQLiteCache, TieredCache
+except Exception:
+    from cache import LRUCache, SQLiteCache, TieredCache  # type: ignore
+
+
+def file_key(sha256: str, fingerprint: str) -> str:
+    return f"file:{sha256}:{fingerprint}"
+
+
+def page_key(sha256: str, fingerprint: str) -> str:
+    return f"page:{sha256}:{fingerprint}"
+
+
+_CACHE: Optional[TieredCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[TieredCache]:
+    """Process-wide OCR result cache, or None when disabled."""
+    global _CACHE
+    if os.getenv("OCR_CACHE_ENABLED", "true").lower() not in {"1", "true", "yes"}:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                disk = None
+                path = os.getenv("OCR_CACHE_PATH")
+                if path:
+                    try:
+                        disk = SQLiteCache(path, max_bytes=int(os.getenv("OCR_CACHE_MAX_BYTES", str(256 * 1024 * 1024))))
+                    except Exception as e:
+                        print(f"[ocr_cache] disk tier disabled: {e}")
+                _CACHE = TieredCache(LRUCache(int(os.getenv("OCR_CACHE_ENTRIES", "512"))), disk)
+    return _CACHE
+
+
+def cache_stats() -> Dict[str, Any]:
+    cache = get_ocr_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+def close_ocr_cache() -> None:
+    global _CACHE
+    with _CACHE_LOCK:
+        cache, _CACHE = _CACHE, None
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,242 @@
+"""
+ocr_pool.py
+
+Bounded executor for CPU-heavy OCR work (cv2 preprocessing, EasyOCR inference,
+PDF rasterization) so it never runs on the asyncio event loop.
+
+Configuration (environment):
+- OCR_POOL_MODE: "process" (default) or "thread"
+- OCR_POOL_WORKERS: number of workers (default: min(2, cpu_count))
+- OCR_POOL_MAX_QUEUE: jobs allowed to wait beyond the running ones (default: 8)
+- OCR_POOL_START_METHOD: multiprocessing start method for process mode (default: spawn)
+- OCR_WORKER_THREADS: optional torch/cv2 thread count per worker process
+
+When workers + queue are all taken, submissions fail fast with OcrPoolBusy
+instead of piling up behind the running jobs. A batch (run_many) holds at most one
+slot per worker however many pages it has, and feeds its jobs through those slots,
+so one large upload cannot push the pool past its bound or take the queue slots.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from . import metrics
+except Exception:
+    import metrics  # type: ignore
+
+
+class OcrPoolBusy(Exception):
+    """Raised when the OCR pool has no free worker or queue slot."""
+
+
+def _init_worker() -> None:
+    """Process initializer: cap per-worker threads and load the reader once."""
+    threads = os.getenv("OCR_WORKER_THREADS")
+    if threads and threads.isdigit():
+        try:
+            import torch  # type: ignore
+            torch.set_num_threads(int(threads))
+        except Exception:
+            pass
+        try:
+            import cv2  # type: ignore
+            cv2.setNumThreads(int(threads))
+        except Exception:
+            pass
+    try:
+        try:
+            from . import ocr_utils
+        except Exception:
+            import ocr_utils  # type: ignore
+        ocr_utils.warm_reader()
+    except Exception as e:
+        # The first job will retry building the reader and surface the error then
+        print(f"[ocr_pool] worker warm-up failed: {e}")
+
+
+def _noop() -> None:
+    return None
+
+
+class OcrPool:
+    def __init__(self, workers: int, max_queue: int, mode: str = "process", start_method: str = "spawn"):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.mode = mode if mode in {"process", "thread"} else "process"
+        self.start_method = start_method
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # Jobs submitted and not yet finished (running + queued); only touched on the event loop
+        self._pending = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def _ensure_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "thread":
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="ocr",
+                        initializer=_init_worker,
+                    )
+                else:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker,
+                    )
+            return self._executor
+
+    def _reset_executor(self, broken: Executor) -> None:
+        """Drop a broken executor, unless another job has already replaced it."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def prewarm(self) -> None:
+        """Start every worker now so the first request does not pay for model loading."""
+        ex = self._ensure_executor()
+        for _ in range(self.workers):
+            ex.submit(_noop)
+
+    def admit(self, n: int = 1) -> None:
+        """Reserve n job slots or raise OcrPoolBusy."""
+        if self._pending + n > self.capacity:
+            metrics.incr("ocr_pool.rejected")
+            raise OcrPoolBusy(f"OCR pool saturated ({self._pending}/{self.capacity} jobs in flight)")
+        self._pending += n
+        metrics.set_gauge("ocr_pool.pending", self._pending)
+
+    def release(self, n: int = 1) -> None:
+        self._pending = max(0, self._pending - n)
+        metrics.set_gauge("ocr_pool.pending", self._pending)
+
+    async def call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) on the pool; the caller must already hold a slot from admit()."""
+        loop = asyncio.get_running_loop()
+        executor = self._ensure_executor()
+        try:
+            try:
+                result = await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); rebuild the pool and retry this job once.
+                # Every job on that pool fails the same way: only the first one rebuilds it.
+                metrics.incr("ocr_pool.restarts")
+                self._reset_executor(executor)
+                result = await loop.run_in_executor(self._ensure_executor(), fn, *args)
+        except Exception:
+            metrics.incr("ocr_pool.failed")
+            raise
+        metrics.incr("ocr_pool.completed")
+        return result
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Admit and run a single job."""
+        self.admit(1)
+        try:
+            return await self.call(fn, *args)
+        finally:
+            self.release(1)
+
+    async def run_many(
+        self,
+        calls: Sequence[Tuple[Callable[..., Any], Tuple[Any, ...]]],
+        on_done: Optional[Callable[[int, Any], Any]] = None,
+    ) -> List[Any]:
+        """
+        Run a batch of jobs concurrently across the workers. The batch is admitted with
+        min(len(calls), workers) slots (OcrPoolBusy if those do not fit) and its jobs take
+        turns on them; slots go back to the pool as the last jobs finish.
+        Results come back in input order; a failed job yields its exception instead of
+        cancelling the others. on_done(index, result_or_exception) fires as each job
+        finishes (may be sync or async), e.g. to report per-page progress.
+        """
+        if not calls:
+            return []
+        slots = min(len(calls), self.workers)
+        self.admit(slots)
+        turns = asyncio.Semaphore(slots)
+        unfinished = len(calls)
+
+        async def _one(i: int, fn: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+            nonlocal unfinished
+            try:
+                async with turns:
+                    result = await self.call(fn, *args)
+            except Exception as e:
+                result = e
+            finally:
+                # The batch needs min(unfinished, slots) slots from here on
+                unfinished -= 1
+                if unfinished < slots:
+                    self.release(1)
+            if on_done is not None:
+                try:
+                    ret = on_done(i, result)
+                    if inspect.isawaitable(ret):
+                        await ret
+                except Exception as e:
+                    # Progress reporting must never lose an OCR result
+                    print(f"[ocr_pool] on_done callback failed: {e}")
+            if isinstance(result, BaseException):
+                raise result
+            return result
+
+        return await asyncio.gather(*(_one(i, fn, args) for i, (fn, args) in enumerate(calls)), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "started": self._executor is not None,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            ex, self._executor = self._executor, None
+        if ex is not None:
+            ex.shutdown(wait=wait, cancel_futures=True)
+
+
+_POOL: Optional[OcrPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> OcrPool:
+    """Process-wide OCR pool configured from the environment."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                default_workers = min(2, os.cpu_count() or 1)
+                _POOL = OcrPool(
+                    workers=int(os.getenv("OCR_POOL_WORKERS", str(default_workers))),
+                    max_queue=int(os.getenv("OCR_POOL_MAX_QUEUE", "8")),
+                    mode=os.getenv("OCR_POOL_MODE", "process").strip().lower(),
+                    start_method=os.getenv("OCR_POOL_START_METHOD", "spawn"),
+                )
+    return _POOL
+
+
+def shutdown_pool(wait: bool = True) -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
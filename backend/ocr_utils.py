@@ -2,25 +2,328 @@ import easyocr
 import re
 import sys
 import os
+import hashlib
+import threading
 import cv2
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
 
-def preprocess_image(image_path: str) -> np.ndarray:
-    img = cv2.imread(image_path)
+# PDF rendering
+try:
+    import fitz  # PyMuPDF
+except Exception:
+    fitz = None  # type: ignore
+
+
+# --- EasyOCR reader registry ---
+# Building an easyocr.Reader loads the detection + recognition weights from disk,
+# which costs seconds and hundreds of MB. Readers are therefore built lazily, once
+# per (languages, model_dir, gpu) combination, and reused for the life of the process.
+# _REGISTRY_LOCK only guards the dicts; a build holds the lock of its own key, so
+# loading one model never blocks lookups of the others.
+_ReaderKey = Tuple[Tuple[str, ...], Optional[str], bool]
+_READERS: Dict[_ReaderKey, Any] = {}
+_READER_LOCKS: Dict[_ReaderKey, threading.Lock] = {}
+_BUILD_LOCKS: Dict[_ReaderKey, threading.Lock] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    val = os.getenv(name)
+    if val is None:
+        return default
+    return val.strip().lower() in {"1", "true", "yes"}
+
+
+def _default_reader_key(
+    languages: Optional[Sequence[str]] = None,
+    model_dir: Optional[str] = None,
+    gpu: Optional[bool] = None,
+) -> _ReaderKey:
+    if languages is None:
+        raw = os.getenv("OCR_LANGUAGES", "en")
+        languages = [l.strip() for l in raw.split(",") if l.strip()] or ["en"]
+    if model_dir is None:
+        model_dir = os.getenv("OCR_MODEL_DIR") or None
+    if gpu is None:
+        gpu = _env_flag("OCR_GPU", False)
+    return tuple(languages), model_dir, bool(gpu)
+
+
+def get_reader(
+    languages: Optional[Sequence[str]] = None,
+    model_dir: Optional[str] = None,
+    gpu: Optional[bool] = None,
+):
+    """
+    Return the shared easyocr.Reader for this configuration, building it on first use.
+    Defaults come from OCR_LANGUAGES (comma-separated, default "en"), OCR_MODEL_DIR and OCR_GPU.
+    """
+    key = _default_reader_key(languages, model_dir, gpu)
+    reader = _READERS.get(key)
+    if reader is not None:
+        return reader
+    with _build_lock(key):
+        with _REGISTRY_LOCK:
+            reader = _READERS.get(key)
+        if reader is None:
+            langs, mdir, use_gpu = key
+            kwargs: Dict[str, Any] = {"gpu": use_gpu}
+            if mdir:
+                kwargs["model_storage_directory"] = mdir
+                # Never try to download weights at request time when a model dir is pinned
+                kwargs["download_enabled"] = _env_flag("OCR_MODEL_DOWNLOAD", False)
+            reader = easyocr.Reader(list(langs), **kwargs)
+            with _REGISTRY_LOCK:
+                _READERS[key] = reader
+    return reader
+
+
+def _reader_lock(key: _ReaderKey) -> threading.Lock:
+    # Locks outlive clear_readers(), so a call still holding one keeps excluding new callers
+    with _REGISTRY_LOCK:
+        return _READER_LOCKS.setdefault(key, threading.Lock())
+
+
+def _build_lock(key: _ReaderKey) -> threading.Lock:
+    # Separate from _reader_lock: readtext() holds that one while calling get_reader()
+    with _REGISTRY_LOCK:
+        return _BUILD_LOCKS.setdefault(key, threading.Lock())
+
+
+def readtext(img, languages: Optional[Sequence[str]] = None, **kwargs) -> List[Any]:
+    """
+    Thread-safe wrapper around reader.readtext. A reader is not safe to drive from
+    several threads at once, so calls on the same reader are serialized.
+    """
+    key = _default_reader_key(languages)
+    with _reader_lock(key):
+        # Looked up under the lock: a concurrent clear_readers() just means a rebuild here
+        return get_reader(*key).readtext(img, **kwargs)
+
+
+def warm_reader() -> None:
+    """Build the default reader ahead of the first request (e.g. at worker start)."""
+    get_reader()
+
+
+def clear_readers() -> None:
+    """Drop all cached readers so their weights can be garbage collected."""
+    with _REGISTRY_LOCK:
+        _READERS.clear()
+
+
+# Bump whenever preprocessing, rendering or parsing changes in a way that alters
+# results; it is part of every OCR cache key so stale entries are never served.
+OCR_PIPELINE_VERSION = "5"
+PDF_RENDER_DPI = 200
+
+
+def pdf_text_layer_enabled() -> bool:
+    return _env_flag("PDF_TEXT_LAYER", True)
+
+
+def target_text_height() -> float:
+    """Working glyph height in pixels for OCR input; 0 disables resolution normalization."""
+    return float(os.getenv("OCR_TARGET_TEXT_HEIGHT", "20"))
+
+
+def max_long_side() -> int:
+    """Upper bound on the long side of the OCR working image, in pixels."""
+    return int(os.getenv("OCR_MAX_LONG_SIDE", "2000"))
+
+
+def fast_text_height() -> float:
+    """Working glyph height for the cheap first OCR tier."""
+    return float(os.getenv("OCR_FAST_TEXT_HEIGHT", "16"))
+
+
+# Tier names: "fast" = small grayscale, no filtering; "full" = normalized + bilateral +
+# adaptive threshold; "raw" = the untouched input image.
+OCR_TIER_MODES = ("fast", "full", "raw")
+# Fields whose absence after a tier triggers the next tier
+KEY_FIELDS = ("purchase_total", "purchase_date", "seller_name")
+
+
+def ocr_tiers() -> List[str]:
+    """
+    Ordered OCR tiers from OCR_TIERS (default "fast,full"). A single tier disables
+    escalation; "full" alone is the original one-pass pipeline.
+    """
+    raw = os.getenv("OCR_TIERS", "fast,full")
+    tiers = [t.strip().lower() for t in raw.split(",") if t.strip().lower() in OCR_TIER_MODES]
+    return tiers or ["full"]
+
+
+def ocr_config_fingerprint() -> str:
+    """Identifies the OCR/preprocessing configuration results were produced with."""
+    langs, _, _ = _default_reader_key()
+    return (
+        f"v{OCR_PIPELINE_VERSION}|langs={','.join(langs)}|dpi={PDF_RENDER_DPI}"
+        f"|text_layer={int(pdf_text_layer_enabled())}"
+        f"|text_h={target_text_height():g}|max_side={max_long_side()}"
+        f"|tiers={','.join(ocr_tiers())}|fast_h={fast_text_height():g}"
+    )
+
+
+ImageInput = Union[str, np.ndarray]
+
+
+def load_grayscale(image: ImageInput) -> np.ndarray:
+    """Return a grayscale uint8 image from a file path or an in-memory array."""
+    if isinstance(image, np.ndarray):
+        if image.ndim == 2:
+            return image
+        if image.shape[2] == 4:
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    img = cv2.imread(image)
     if img is None:
-        raise ValueError(f"Could not read image from {image_path}")
-    # Convert to grayscale
-    gray = cv2.cvtColor(np.array(img), cv2.COLOR_BGR2GRAY)
+        raise ValueError(f"Could not read image from {image}")
+    return cv2.cvtColor(np.array(img), cv2.COLOR_BGR2GRAY)
+
+
+def estimate_text_height(gray: np.ndarray, proxy_long_side: int = 1000) -> Optional[float]:
+    """
+    Estimate the typical glyph height (pixels, at the input resolution) as the median
+    height of character-sized connected components of an Otsu-binarized proxy image.
+    Returns None when too few glyph-like components are found.
+    """
+    h, w = gray.shape[:2]
+    proxy_scale = min(1.0, proxy_long_side / float(max(h, w)))
+    small = gray
+    if proxy_scale < 1.0:
+        small = cv2.resize(gray, None, fx=proxy_scale, fy=proxy_scale, interpolation=cv2.INTER_AREA)
+    _, bw = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    glyph = (heights >= 2) & (heights <= small.shape[0] * 0.1) & (widths <= heights * 3)
+    if int(glyph.sum()) < 10:
+        return None
+    return float(np.median(heights[glyph])) / proxy_scale
+
+
+def normalize_resolution(
+    gray: np.ndarray,
+    target_height: Optional[float] = None,
+    long_side_limit: Optional[int] = None,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Resample so glyphs are about target_height pixels tall: large phone photos are
+    downsampled, tiny scans upsampled. The long side never exceeds long_side_limit.
+    Returns (image, meta) where meta reports the chosen scale.
+    """
+    target = target_text_height() if target_height is None else float(target_height)
+    limit = max_long_side() if long_side_limit is None else int(long_side_limit)
+    h, w = gray.shape[:2]
+    meta: Dict[str, Any] = {"scale": 1.0, "text_height_px": None, "input_size": [w, h], "working_size": [w, h]}
+    if target <= 0:
+        return gray, meta
+    est = estimate_text_height(gray)
+    meta["text_height_px"] = round(est, 1) if est else None
+    scale = (target / est) if est else 1.0
+    if limit > 0 and max(h, w) * scale > limit:
+        scale = limit / float(max(h, w))
+    scale = min(max(scale, 0.2), 4.0)
+    if abs(scale - 1.0) < 0.1:
+        return gray, meta
+    interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+    out = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interp)
+    meta["scale"] = round(scale, 3)
+    meta["working_size"] = [int(out.shape[1]), int(out.shape[0])]
+    return out, meta
+
+
+def preprocess_with_meta(
+    image: ImageInput,
+    target_height: Optional[float] = None,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    # Convert to grayscale and bring text to the working resolution before filtering
+    gray = load_grayscale(image)
+    gray, meta = normalize_resolution(gray, target_height)
     denoised = cv2.bilateralFilter(gray, 9, 75, 75)
     thresh = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-    return thresh
+    return thresh, meta
+
+
+def preprocess_image(image: ImageInput) -> np.ndarray:
+    return preprocess_with_meta(image)[0]
+
+
+def preprocess_fast(image: ImageInput, target_height: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Cheap first-tier input: grayscale at a smaller working resolution, no filtering."""
+    gray = load_grayscale(image)
+    return normalize_resolution(gray, fast_text_height() if target_height is None else target_height)
+
+
+def _ocr_text_with_meta(
+    image: ImageInput,
+    mode: str = "full",
+    target_height: Optional[float] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    OCR one image with the given tier's preprocessing. target_height only applies to the
+    "full" tier: "fast" always works at OCR_FAST_TEXT_HEIGHT, since a cheap first pass at
+    the full working resolution would defeat the tiering, and "raw" is never resampled.
+    """
+    meta: Dict[str, Any] = {}
+    img = image
+    if mode == "full":
+        img, meta = preprocess_with_meta(image, target_height)
+    elif mode == "fast":
+        img, meta = preprocess_fast(image)
+    results = readtext(img, detail=0, paragraph=False)
+    return '\n'.join(str(line) for line in results), meta
+
+
+def extract_text_from_image(image_path: ImageInput, use_preprocessing: bool = True) -> str:
+    return _ocr_text_with_meta(image_path, "full" if use_preprocessing else "raw")[0]
+
+
+# --- Receipt text parser ---
+# Patterns are compiled once at import; parse_receipt_fields is on the hot path for
+# cached OCR results and PDF text layers.
+_RE_DOLLAR_AMOUNT = re.compile(r'\$ *([0-9]+\. *[0-9]{2})')
+_RE_HASH_AMOUNT = re.compile(r'# *([0-9]+\. *[0-9]{2})')
+_RE_SPLIT_DECIMAL = re.compile(r'([0-9]+)\.\s*([0-9]{2})')
+_RE_WHITESPACE = re.compile(r'\s+')
+_RE_SELLER = re.compile(r'[A-Z]{3,}')
+_RE_RECEIPT_IDS = (
+    re.compile(r'(TC[#:\s]*([0-9]+))'),
+    re.compile(r'(TR[#:\s]*([0-9]+))'),
+    re.compile(r'(REF[#:\s]*([A-Z0-9]+))'),
+)
+_RE_DATE = re.compile(r'(\d{1,2}/\d{1,2}/\d{4})')
+_RE_PAYMENT = re.compile(r'(VISA|MASTERCARD|AMEX|PAYPAL|CASH|CARD)')
+_RE_AMOUNT = re.compile(r'([0-9]+\.[0-9]{2})')
+_RE_PRICE_LINE = re.compile(r'^\$?([0-9]+\.[0-9]{2})$')
 
-def extract_text_from_image(image_path: str, use_preprocessing: bool = True) -> str:
-    reader = easyocr.Reader(['en'], gpu=False)
-    img = preprocess_image(image_path) if use_preprocessing else image_path
-    results = reader.readtext(img, detail=0, paragraph=False)
-    return '\n'.join(str(line) for line in results)
+# Lines containing any of these are never item descriptions
+_ITEM_EXCLUDE_WORDS = [
+    "WALMART", "SAVE MONEY", "LIVE BETTER", "TOTAL", "SUBTOTAL", "TAX", "TEND", "BALANCE",
+    "APPROVAL", "ACCOUNT", "VISA", "MASTERCARD", "AMEX", "PAYPAL", "CASH", "CARD",
+    "ST#", "OP#", "TE#", "TR#", "REF", "TRANS", "VALIDATION", "PAYMENT", "TERMINAL", "ITEMS SOLD",
+    "TC#", "TC #", "CAMINO", "DURANGO", "MAR ", "JIM", "JAMES", "LOW PRICE", "EVERY DAY", "THANK YOU"
+]
+_RE_ITEM_EXCLUDE = re.compile("|".join(re.escape(w) for w in _ITEM_EXCLUDE_WORDS))
+
+
+def _strip_amount_spaces(m: "re.Match[str]") -> str:
+    return m.group(1).replace(' ', '')
+
+
+def _dollar_amount(m: "re.Match[str]") -> str:
+    return f"${m.group(1).replace(' ', '')}"
+
+
+def _normalize_line(line: str) -> str:
+    # Normalize OCR errors
+    line = line.replace(',', '.')
+    line = _RE_DOLLAR_AMOUNT.sub(_dollar_amount, line)
+    line = _RE_HASH_AMOUNT.sub(_strip_amount_spaces, line)
+    line = _RE_SPLIT_DECIMAL.sub(r'\1.\2', line)
+    return _RE_WHITESPACE.sub(' ', line)
 
 
 def parse_receipt_fields(ocr_text: str, debug: bool = False) -> Dict[str, Any]:
@@ -40,98 +343,201 @@ def parse_receipt_fields(ocr_text: str, debug: bool = False) -> Dict[str, Any]:
             "payment_method": 0.0
         }
     }
-    text = ocr_text.upper()
-    lines = [l.strip() for l in text.split('\n') if l.strip()]
-    norm_lines = []
-    for line in lines:
-        # Normalize OCR errors
-        line = line.replace(',', '.')
-        line = re.sub(r'\$ *([0-9]+\. *[0-9]{2})', lambda m: f"${m.group(1).replace(' ', '')}", line)
-        line = re.sub(r'# *([0-9]+\. *[0-9]{2})', lambda m: f"{m.group(1).replace(' ', '')}", line)
-        line = re.sub(r'([0-9]+)\.\s*([0-9]{2})', r'\1.\2', line)
-        line = re.sub(r'\s+', ' ', line)
-        norm_lines.append(line)
-    lines = norm_lines
-
-    # Extract Seller Name (First line with many capitals, usually)
-    for line in lines:
-        if re.search(r'[A-Z]{3,}', line):
-            result["seller_name"] = line.title()
-            result["field_confidence"]["seller_name"] = 1.0
-            break
+    lines = [_normalize_line(l) for l in (l.strip() for l in ocr_text.upper().split('\n')) if l]
+    # Receipt ids, dates and payment methods may be matched across line breaks,
+    # so they are searched on the joined text (built once)
+    joined = " ".join(lines)
 
-    # Extract Receipt/Order Number
-    # Try TC#/TR#/REF#
-    rec_match = (re.search(r'(TC[#:\s]*([0-9]+))', " ".join(lines))
-                or re.search(r'(TR[#:\s]*([0-9]+))', " ".join(lines))
-                or re.search(r'(REF[#:\s]*([A-Z0-9]+))', " ".join(lines)))
-    if rec_match:
-        result["receipt_id"] = rec_match.group(2)
-        result["field_confidence"]["receipt_id"] = 0.95
+    # Extract Receipt/Order Number (TC#, then TR#, then REF#)
+    for pattern in _RE_RECEIPT_IDS:
+        rec_match = pattern.search(joined)
+        if rec_match:
+            result["receipt_id"] = rec_match.group(2)
+            result["field_confidence"]["receipt_id"] = 0.95
+            break
 
     # Extract Purchase Date
-    date_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', " ".join(lines))
+    date_match = _RE_DATE.search(joined)
     if date_match:
         result["purchase_date"] = date_match.group(1)
         result["field_confidence"]["purchase_date"] = 0.95
 
-    # Extract Payment Method
-    for line in lines:
-        pmatch = re.search(r'(VISA|MASTERCARD|AMEX|PAYPAL|CASH|CARD)', line)
-        if pmatch:
-            result["payment_method"] = pmatch.group(1).title()
-            result["field_confidence"]["payment_method"] = 1.0
-            break
+    # Extract Payment Method (first match in line order; keywords never span a line break)
+    pmatch = _RE_PAYMENT.search(joined)
+    if pmatch:
+        result["payment_method"] = pmatch.group(1).title()
+        result["field_confidence"]["payment_method"] = 1.0
 
-    # Extract Purchase Total
-    total_value, total_conf = None, 0.0
+    # Single pass over lines for seller name, purchase total and the item list
+    seller_found = False
+    total_value, total_conf, total_done = None, 0.0, False
+    items = result["item_list"]
+    n = len(lines)
+    next_price = _RE_PRICE_LINE.match(lines[0]) if n else None
     for i, line in enumerate(lines):
-        if 'TOTAL' in line and 'SUBTOTAL' not in line:
-            if i+1 < len(lines):
-                raw = lines[i+1]
-                pmatch = re.search(r'([0-9]+\.[0-9]{2})', raw)
-                if pmatch:
-                    total_value = float(pmatch.group(1))
-                    total_conf = 0.95
-                    break
-            pmatch = re.search(r'([0-9]+\.[0-9]{2})', line)
-            if pmatch:
-                total_value = float(pmatch.group(1))
-                total_conf = 0.9
-                break
+        price_here = next_price
+        next_line = lines[i+1] if i+1 < n else None
+        next_price = _RE_PRICE_LINE.match(next_line) if next_line is not None else None
+
+        # Seller Name (first line with many capitals, usually)
+        if not seller_found and _RE_SELLER.search(line):
+            result["seller_name"] = line.title()
+            result["field_confidence"]["seller_name"] = 1.0
+            seller_found = True
+
+        # Purchase Total: amount on the line after TOTAL, else on the TOTAL line itself
+        if not total_done and 'TOTAL' in line and 'SUBTOTAL' not in line:
+            amount = _RE_AMOUNT.search(next_line) if next_line is not None else None
+            if amount:
+                total_value, total_conf, total_done = float(amount.group(1)), 0.95, True
+            else:
+                amount = _RE_AMOUNT.search(line)
+                if amount:
+                    total_value, total_conf, total_done = float(amount.group(1)), 0.9, True
+
+        # Item List (description + price, two-line format)
+        if next_price and price_here is None and len(line) >= 5 and not _RE_ITEM_EXCLUDE.search(line):
+            items.append({
+                "description": line.strip().title(),
+                "price": float(next_price.group(1))
+            })
+
     if total_value:
         result["purchase_total"]["value"] = total_value
         result["field_confidence"]["purchase_total"] = total_conf
-
-    # Extract Item List (description + price, two-line format)
-    exclude_words = [
-        "WALMART", "SAVE MONEY", "LIVE BETTER", "TOTAL", "SUBTOTAL", "TAX", "TEND", "BALANCE",
-        "APPROVAL", "ACCOUNT", "VISA", "MASTERCARD", "AMEX", "PAYPAL", "CASH", "CARD",
-        "ST#", "OP#", "TE#", "TR#", "REF", "TRANS", "VALIDATION", "PAYMENT", "TERMINAL", "ITEMS SOLD",
-        "TC#", "TC #", "CAMINO", "DURANGO", "MAR ", "JIM", "JAMES", "LOW PRICE", "EVERY DAY", "THANK YOU"
-    ]
-    for i, line in enumerate(lines):
-        if any(w in line for w in exclude_words):
-            continue
-        if i+1 < len(lines):
-            next_line = lines[i+1]
-            pmatch = re.match(r'^\$?([0-9]+\.[0-9]{2})$', next_line)
-            if not re.match(r'^\$?([0-9]+\.[0-9]{2})$', line) and pmatch and len(line) >= 5:
-                desc = line.strip().title()
-                price = float(pmatch.group(1))
-                # Factual clarity of line association
-                result["item_list"].append({
-                    "description": desc,
-                    "price": price
-                })
-    if result["item_list"]:
+    if items:
         result["field_confidence"]["item_list"] = 0.85
 
     return result
 
-def extract_receipt_info(image_path: str, debug: bool = False) -> Dict[str, Any]:
-    text = extract_text_from_image(image_path, use_preprocessing=True)
-    parsed_data = parse_receipt_fields(text, debug=debug)
+def _pixmap_to_gray(pix) -> np.ndarray:
+    """
+    View a single-channel fitz.Pixmap as a (height, width) uint8 array. The view over
+    pix.samples_mv is zero-copy; one copy is made so the array outlives the pixmap.
+    """
+    buf = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    view = np.frombuffer(buf, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    return np.array(view, copy=True)
+
+
+def is_usable_text_layer(text: str) -> bool:
+    """
+    Decide whether embedded PDF text is good enough to skip OCR: enough characters
+    (PDF_TEXT_MIN_CHARS, default 40) and mostly printable (PDF_TEXT_MIN_PRINTABLE,
+    default 0.9). Scanned PDFs have no text; broken font encodings produce garbage.
+    """
+    chars = [c for c in (text or "") if not c.isspace()]
+    if len(chars) < int(os.getenv("PDF_TEXT_MIN_CHARS", "40")):
+        return False
+    printable = sum(1 for c in chars if c.isprintable() and c != "\ufffd")
+    return printable / len(chars) >= float(os.getenv("PDF_TEXT_MIN_PRINTABLE", "0.9"))
+
+
+def render_pdf_pages(
+    pdf_path: str,
+    dpi: int = PDF_RENDER_DPI,
+    debug_dir: Optional[str] = None,
+    use_text_layer: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Turn every page of a PDF into OCR input without temp files.
+    Returns [{page, source, image, sha256, image_path, parsed}]:
+    - source="text_layer": the embedded text was usable; it is parsed here directly
+      and image/sha256 are None.
+    - source="ocr": the page was rasterized straight to a grayscale array; sha256
+      hashes the raster bytes. PNGs are only written when debug_dir is given.
+    """
+    if not fitz:
+        raise RuntimeError("pymupdf is not available on server")
+    doc = fitz.open(pdf_path)
+    pages: List[Dict[str, Any]] = []
+    try:
+        for page_index in range(len(doc)):
+            page = doc[page_index]
+            if use_text_layer:
+                text = page.get_text("text") or ""
+                if is_usable_text_layer(text):
+                    pages.append({
+                        "page": page_index + 1,
+                        "source": "text_layer",
+                        "image": None,
+                        "sha256": None,
+                        "image_path": None,
+                        "parsed": parse_receipt_fields(text),
+                    })
+                    continue
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            gray = _pixmap_to_gray(pix)
+            digest = hashlib.sha256(f"{gray.shape[1]}x{gray.shape[0]}:".encode("ascii"))
+            digest.update(gray.data)
+            img_path = None
+            if debug_dir:
+                os.makedirs(debug_dir, exist_ok=True)
+                base = os.path.splitext(os.path.basename(pdf_path))[0]
+                img_path = os.path.join(debug_dir, f"{base}_p{page_index+1}.png")
+                pix.save(img_path)
+            pages.append({
+                "page": page_index + 1,
+                "source": "ocr",
+                "image": gray,
+                "sha256": digest.hexdigest(),
+                "image_path": img_path,
+                "parsed": None,
+            })
+    finally:
+        doc.close()
+    return pages
+
+def _missing_key_fields(parsed: Dict[str, Any]) -> List[str]:
+    conf = parsed.get("field_confidence") or {}
+    return [k for k in KEY_FIELDS if not conf.get(k)]
+
+
+def extract_receipt_info(
+    image_path: ImageInput,
+    debug: bool = False,
+    target_height: Optional[float] = None,
+    tiers: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    OCR + parse one image, escalating through the configured tiers (see ocr_tiers()).
+    Each tier only runs when the fields gathered so far still miss a KEY_FIELDS entry;
+    a later tier fills in fields the earlier ones missed but never overrides them.
+    parsed["ocr_meta"] reports the tiers that ran, why they escalated, and which tier
+    produced each field (field_tiers). target_height overrides OCR_TARGET_TEXT_HEIGHT
+    for the "full" tier only.
+    """
+    tiers = list(tiers or ocr_tiers())
+    parsed_data: Optional[Dict[str, Any]] = None
+    field_tiers: Dict[str, str] = {}
+    tier_meta: Dict[str, Any] = {}
+    escalations: List[Dict[str, Any]] = []
+    for tier in tiers:
+        if parsed_data is not None:
+            missing = _missing_key_fields(parsed_data)
+            if not missing:
+                break
+            escalations.append({"to": tier, "missing": missing})
+        text, meta = _ocr_text_with_meta(image_path, tier, target_height=target_height)
+        tier_meta[tier] = meta
+        candidate = parse_receipt_fields(text, debug=debug)
+        if parsed_data is None:
+            parsed_data = candidate
+            field_tiers = {k: tier for k, v in candidate["field_confidence"].items() if v}
+            continue
+        for field, conf in candidate["field_confidence"].items():
+            if conf and not parsed_data["field_confidence"].get(field):
+                parsed_data[field] = candidate[field]
+                parsed_data["field_confidence"][field] = conf
+                field_tiers[field] = tier
+    parsed_data["ocr_meta"] = {
+        # scale/size of the tier that ran last, for compatibility with single-pass results
+        **tier_meta[list(tier_meta)[-1]],
+        "tiers_run": list(tier_meta),
+        "escalations": escalations,
+        "field_tiers": field_tiers,
+        "tier_meta": tier_meta,
+    }
     return parsed_data
 
 if __name__ == "__main__":
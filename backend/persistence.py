@@ -0,0 +1,268 @@
+"""
+persistence.py
+
+Async persistence of analysis results (Case, Issue, EligibilityDecision) on the
+SQLAlchemy asyncio engine from case/async_database.py (asyncpg for PostgreSQL,
+aiosqlite for local SQLite). Inserts use RETURNING, so ids come back from the
+INSERT itself and no post-commit refresh round-trips are needed.
+
+The work is split so it can overlap report generation:
+- persist_analysis(): user lookup + three inserts in one transaction, as soon as
+  classification and eligibility are known. Without a final report the case is
+  inserted as "analyzing_issue" with latest_summary empty
+- update_case_summary(): one UPDATE once the final report is ready, which fills
+  latest_summary and marks the case "analysis_completed". If the report fails the
+  case is left "analyzing_issue" rather than completed without a summary
+
+persist_batch() writes many analyses at once for the write-behind queue
+(write_behind.py): one multi-row INSERT ... RETURNING per table in one transaction.
+
+Configuration (environment):
+- PERSIST_MODE: "async" (default when an async driver is installed) or "sync"
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    from .auth import cached_user, remember_user
+except Exception:
+    from auth import cached_user, remember_user
+
+
+ANALYZING_ISSUE = "analyzing_issue"
+ANALYSIS_COMPLETED = "analysis_completed"
+
+
+class UnknownUserError(LookupError):
+    """No AppUser exists for the given email."""
+
+
+def report_summary(final_report: Any) -> Optional[str]:
+    """Text stored in case.latest_summary for a final report."""
+    if isinstance(final_report, dict):
+        return final_report.get("analysis")
+    return str(final_report) if final_report is not None else None
+
+
+def build_analysis_rows(
+    title: Optional[str],
+    issue_description: Optional[str],
+    classification: Any,
+    eligibility: Dict[str, Any],
+    final_report: Any = None,
+    now: Optional[datetime] = None,
+    completed: bool = True,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Column values for the case / issue / eligibility_decision rows of one analysis (without FKs).
+    completed=False marks the case "analyzing_issue" while the report is still being generated.
+    """
+    now = now or datetime.utcnow()
+    clf_category = None
+    clf_conf = None
+    annotations = None
+    if isinstance(classification, dict):
+        annotations = classification
+        clf_category = classification.get("category") or classification.get("type")
+        try:
+            cval = classification.get("confidence")
+            if cval is not None:
+                clf_conf = float(cval)
+        except Exception:
+            clf_conf = None
+    return {
+        "case": {
+            "status": ANALYSIS_COMPLETED if completed else ANALYZING_ISSUE,
+            "title": title or "Receipt Analysis",
+            "latest_summary": report_summary(final_report),
+            "needs_review": False,
+            "created_at": now,
+            "updated_at": now,
+        },
+        "issue": {
+            "description": (issue_description or (title or "")) or "",
+            "classification": clf_category or None,
+            "clf_confidence": clf_conf,
+            "ai_annotations": annotations,
+            "created_at": now,
+        },
+        "decision": {
+            "policy_snapshot_id": None,
+            "status": "eligible" if bool(eligibility.get("eligible")) else "ineligible",
+            "rationale": str(eligibility.get("reason") or ""),
+            "lenient_flag": False,
+            "decided_at": now,
+        },
+    }
+
+
+def _models():
+    try:
+        from .case import models as case_models  # type: ignore
+        from .case.async_database import get_async_sessionmaker, dispose_async_engine  # type: ignore
+    except Exception:
+        from case import models as case_models  # type: ignore
+        from case.async_database import get_async_sessionmaker, dispose_async_engine  # type: ignore
+    return case_models, get_async_sessionmaker, dispose_async_engine
+
+
+_ASYNC_AVAILABLE: Optional[bool] = None
+
+
+def async_persistence_enabled() -> bool:
+    """True unless PERSIST_MODE=sync or the async driver for the configured database is missing."""
+    global _ASYNC_AVAILABLE
+    if os.getenv("PERSIST_MODE", "").strip().lower() == "sync":
+        return False
+    if _ASYNC_AVAILABLE is None:
+        try:
+            import importlib.util
+
+            try:
+                from .case.async_database import ASYNC_DB_URL  # type: ignore
+            except Exception:
+                from case.async_database import ASYNC_DB_URL  # type: ignore
+            driver = "aiosqlite" if ASYNC_DB_URL.startswith("sqlite") else "asyncpg"
+            _ASYNC_AVAILABLE = importlib.util.find_spec(driver) is not None
+            if not _ASYNC_AVAILABLE:
+                print(f"[persist] {driver} not installed; using sync persistence")
+        except Exception as e:
+            print(f"[persist] async persistence unavailable: {e}")
+            _ASYNC_AVAILABLE = False
+    return _ASYNC_AVAILABLE
+
+
+async def lookup_user(user_email: str) -> Optional[Dict[str, Any]]:
+    """Cached AppUser dict for an email (one SELECT on a cache miss), or None if there is none."""
+    from sqlalchemy import select
+
+    user = cached_user(user_email)
+    if user is not None:
+        return user
+    case_models, get_async_sessionmaker, _ = _models()
+    async with get_async_sessionmaker()() as session:
+        row = await session.scalar(select(case_models.AppUser).where(case_models.AppUser.email == user_email))
+    return remember_user(row) if row is not None else None
+
+
+async def persist_analysis(
+    user_email: str,
+    title: Optional[str],
+    issue_description: Optional[str],
+    classification: Any,
+    eligibility: Dict[str, Any],
+    final_report: Any = None,
+) -> Dict[str, Any]:
+    """
+    Insert the analysis rows in one transaction; returns their ids. Without a final_report
+    the case stays "analyzing_issue" until update_case_summary().
+    """
+    from sqlalchemy import insert, select
+
+    case_models, get_async_sessionmaker, _ = _models()
+    rows = build_analysis_rows(
+        title, issue_description, classification, eligibility, final_report, completed=final_report is not None
+    )
+    async with get_async_sessionmaker()() as session:
+        async with session.begin():
+            user = cached_user(user_email)
+            if user is None:
+                row = await session.scalar(select(case_models.AppUser).where(case_models.AppUser.email == user_email))
+                if row is None:
+                    raise UnknownUserError(user_email)
+                user = remember_user(row)
+            user_id = user["id"]
+            case_id = await session.scalar(
+                insert(case_models.Case).values(user_id=user_id, **rows["case"]).returning(case_models.Case.id)
+            )
+            issue_id = await session.scalar(
+                insert(case_models.Issue).values(case_id=case_id, **rows["issue"]).returning(case_models.Issue.id)
+            )
+            decision_id = await session.scalar(
+                insert(case_models.EligibilityDecision)
+                .values(case_id=case_id, **rows["decision"])
+                .returning(case_models.EligibilityDecision.id)
+            )
+    return {"case_id": case_id, "issue_id": issue_id, "eligibility_decision_id": decision_id}
+
+
+async def update_case_summary(case_id: int, final_report: Any) -> None:
+    """Fill latest_summary from the final report and mark the case completed."""
+    from sqlalchemy import update
+
+    case_models, get_async_sessionmaker, _ = _models()
+    async with get_async_sessionmaker()() as session:
+        async with session.begin():
+            await session.execute(
+                update(case_models.Case)
+                .where(case_models.Case.id == case_id)
+                .values(
+                    status=ANALYSIS_COMPLETED,
+                    latest_summary=report_summary(final_report),
+                    updated_at=datetime.utcnow(),
+                )
+            )
+
+
+async def persist_batch(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Persist queued analyses ({user_email, title, issue_description, classification,
+    eligibility, summary, at}) in one transaction. Returns one dict per item, in order:
+    the new ids, or {"error": ...} for items whose user does not exist (those are skipped).
+    """
+    from sqlalchemy import insert, select
+
+    case_models, get_async_sessionmaker, _ = _models()
+    out: List[Dict[str, Any]] = [{} for _ in items]
+    async with get_async_sessionmaker()() as session:
+        async with session.begin():
+            emails = {it["user_email"] for it in items}
+            user_ids = dict(
+                (await session.execute(
+                    select(case_models.AppUser.email, case_models.AppUser.id).where(case_models.AppUser.email.in_(emails))
+                )).all()
+            )
+            todo = []
+            for i, it in enumerate(items):
+                if it["user_email"] not in user_ids:
+                    out[i] = {"error": "AppUser not found for given user_email"}
+                    continue
+                rows = build_analysis_rows(
+                    it.get("title"), it.get("issue_description"), it.get("classification"),
+                    it.get("eligibility") or {}, it.get("summary"),
+                    now=datetime.fromisoformat(it["at"]) if it.get("at") else None,
+                )
+                todo.append((i, user_ids[it["user_email"]], rows))
+            if not todo:
+                return out
+            # executemany with RETURNING is sent as multi-row INSERTs ("insertmanyvalues");
+            # sort_by_parameter_order guarantees ids come back in parameter order
+            case_ids = (await session.scalars(
+                insert(case_models.Case).returning(case_models.Case.id, sort_by_parameter_order=True),
+                [{"user_id": uid, **rows["case"]} for _, uid, rows in todo],
+            )).all()
+            issue_ids = (await session.scalars(
+                insert(case_models.Issue).returning(case_models.Issue.id, sort_by_parameter_order=True),
+                [{"case_id": cid, **rows["issue"]} for cid, (_, _, rows) in zip(case_ids, todo)],
+            )).all()
+            decision_ids = (await session.scalars(
+                insert(case_models.EligibilityDecision).returning(
+                    case_models.EligibilityDecision.id, sort_by_parameter_order=True
+                ),
+                [{"case_id": cid, **rows["decision"]} for cid, (_, _, rows) in zip(case_ids, todo)],
+            )).all()
+    for (i, _, _), cid, iid, did in zip(todo, case_ids, issue_ids, decision_ids):
+        out[i] = {"case_id": cid, "issue_id": iid, "eligibility_decision_id": did}
+    return out
+
+
+async def close_persistence() -> None:
+    try:
+        _, _, dispose_async_engine = _models()
+    except Exception:
+        return
+    await dispose_async_engine()
@@ -0,0 +1,81 @@
+"""
+pipeline.py
+
+A tiny dependency graph of async stages. Each stage starts as soon as all of its
+dependencies have finished, so independent stages (e.g. two LLM calls that only
+need the OCR summary) run concurrently. Stage results are collected by name and
+per-stage start/end timings are recorded relative to the start of the run.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+# A stage receives the results of all stages finished so far (keyed by stage name)
+StageFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+# Called after each stage with (stage_name, result); may be sync or async
+StageCallback = Callable[[str, Any], Any]
+
+
+class StageGraph:
+    def __init__(self) -> None:
+        self._stages: Dict[str, Tuple[StageFn, Tuple[str, ...]]] = {}
+
+    def add(self, name: str, fn: StageFn, deps: Sequence[str] = ()) -> "StageGraph":
+        """Register a stage; dependencies must already be registered (keeps the graph acyclic)."""
+        if name in self._stages:
+            raise ValueError(f"duplicate stage {name!r}")
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"unknown dependency {dep!r} for stage {name!r}")
+        self._stages[name] = (fn, tuple(deps))
+        return self
+
+    async def run(
+        self,
+        results: Optional[Dict[str, Any]] = None,
+        on_stage_done: Optional[StageCallback] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Run every stage and return (results, timings). Pass a results dict to see partial
+        results if a stage raises; the first failure cancels the remaining stages and
+        propagates.
+        """
+        results = {} if results is None else results
+        timings: Dict[str, Any] = {}
+        t0 = time.perf_counter()
+        tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+        def _ms(t: float) -> float:
+            return round((t - t0) * 1000, 1)
+
+        async def _run_stage(name: str, fn: StageFn, deps: Tuple[str, ...]) -> Any:
+            if deps:
+                await asyncio.gather(*(tasks[d] for d in deps))
+            start = time.perf_counter()
+            value = await fn(results)
+            end = time.perf_counter()
+            results[name] = value
+            timings[name] = {"start_ms": _ms(start), "end_ms": _ms(end), "duration_ms": round((end - start) * 1000, 1)}
+            if on_stage_done is not None:
+                ret = on_stage_done(name, value)
+                if inspect.isawaitable(ret):
+                    await ret
+            return value
+
+        # Registration order is a topological order, so dependency tasks always exist first
+        for name, (fn, deps) in self._stages.items():
+            tasks[name] = asyncio.ensure_future(_run_stage(name, fn, deps))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            timings["total_ms"] = _ms(time.perf_counter())
+        return results, timings
@@ -1,14 +1,21 @@
 """
 status.py
 
-Minimal in-memory status store and helpers for case lifecycle and analysis progress.
-This is intended for demo purposes and can be replaced with a DB-backed store later.
+Status helpers for case lifecycle and analysis progress. Entries live in a pluggable
+store (see status_store.py): an in-process LRU+TTL store by default, or a shared
+SQLite file (STATUS_STORE=sqlite) so every uvicorn worker sees the same progress.
+Every helper is a single atomic read-modify-write of one case entry.
 """
 
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+try:
+    from .status_store import get_status_store, close_status_store
+except Exception:
+    from status_store import get_status_store, close_status_store  # type: ignore
 
 # Suggested status values
 CASE_CREATED = "case_created"
@@ -21,75 +28,123 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-# In-memory store: { case_id: { status, timestamps: {}, progress_percent } }
-_STORE: Dict[str, Dict[str, Any]] = {}
-
-
-def init_case(case_id: str) -> Dict[str, Any]:
-    entry = {
+def _new_entry() -> Dict[str, Any]:
+    return {
         "status": CASE_CREATED,
         "timestamps": {
             "created_at": _now_iso(),
         },
         "progress_percent": 0,
     }
-    _STORE[case_id] = entry
-    return entry
+
+
+def _update(case_id: str, fn) -> Dict[str, Any]:
+    """Apply fn to the case entry (created if missing) and store the result."""
+    def apply(entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        entry = entry if entry is not None else _new_entry()
+        fn(entry)
+        return entry
+    return get_status_store().update(case_id, apply)
+
+
+def init_case(case_id: str) -> Dict[str, Any]:
+    return get_status_store().update(case_id, lambda _: _new_entry())
 
 
 def start_analysis(case_id: str) -> Dict[str, Any]:
-    entry = _STORE.get(case_id) or init_case(case_id)
-    entry["status"] = ANALYZING_ISSUE
-    ts = entry.setdefault("timestamps", {})
-    ts["analysis_started_at"] = _now_iso()
-    # Optional: set a baseline progress when analysis starts
-    entry["progress_percent"] = max(10, int(entry.get("progress_percent") or 0))
-    return entry
+    def fn(entry: Dict[str, Any]) -> None:
+        entry["status"] = ANALYZING_ISSUE
+        ts = entry.setdefault("timestamps", {})
+        ts["analysis_started_at"] = _now_iso()
+        # Optional: set a baseline progress when analysis starts
+        entry["progress_percent"] = max(10, int(entry.get("progress_percent") or 0))
+    return _update(case_id, fn)
 
 
-def finish_analysis(case_id: str, success: bool = True) -> Dict[str, Any]:
-    entry = _STORE.get(case_id) or init_case(case_id)
+def _finish(entry: Dict[str, Any], success: bool) -> None:
     entry["status"] = ANALYSIS_COMPLETED if success else ANALYSIS_FAILED
     ts = entry.setdefault("timestamps", {})
     ts["analysis_completed_at"] = _now_iso()
     entry["progress_percent"] = 100 if success else int(entry.get("progress_percent") or 0)
-    return entry
+
+
+def finish_analysis(case_id: str, success: bool = True) -> Dict[str, Any]:
+    return _update(case_id, lambda entry: _finish(entry, success))
+
+
+def set_progress(case_id: str, percent: int, stage: Optional[str] = None) -> Dict[str, Any]:
+    """Record pipeline progress; the percentage never moves backwards."""
+    def fn(entry: Dict[str, Any]) -> None:
+        entry["progress_percent"] = max(int(entry.get("progress_percent") or 0), min(100, int(percent)))
+        if stage is not None:
+            entry["stage"] = stage
+    return _update(case_id, fn)
+
+
+def set_result(case_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Store the finished analysis and mark the case completed."""
+    def fn(entry: Dict[str, Any]) -> None:
+        _finish(entry, True)
+        entry["stage"] = "done"
+        entry["result"] = result
+    return _update(case_id, fn)
+
+
+def set_error(case_id: str, error: str) -> Dict[str, Any]:
+    def fn(entry: Dict[str, Any]) -> None:
+        _finish(entry, False)
+        entry["error"] = error
+    return _update(case_id, fn)
+
+
+def get_result(case_id: str) -> Optional[Dict[str, Any]]:
+    return (get_status_store().get(case_id) or {}).get("result")
 
 
 def set_status(case_id: str, status: str, **extras) -> Dict[str, Any]:
-    entry = _STORE.get(case_id) or init_case(case_id)
-    entry["status"] = status
-    if extras:
-        entry.update(extras)
-    return entry
+    def fn(entry: Dict[str, Any]) -> None:
+        entry["status"] = status
+        if extras:
+            entry.update(extras)
+    return _update(case_id, fn)
 
 
 def get_case_status(case_id: str) -> Dict[str, Any]:
-    return _STORE.get(case_id, {
+    return get_status_store().get(case_id) or {
         "status": None,
         "timestamps": {},
         "progress_percent": None,
-    })
+    }
 
 
 def to_response(case_id: str) -> Dict[str, Any]:
     s = get_case_status(case_id)
     # Return a shallow copy to avoid accidental external mutation
-    return {
+    resp = {
         "status": s.get("status"),
         "timestamps": s.get("timestamps", {}),
         "progress_percent": s.get("progress_percent"),
+        "stage": s.get("stage"),
     }
+    if s.get("error"):
+        resp["error"] = s["error"]
+    return resp
 
 def case_exists(case_id: str) -> bool:
     """Check if a case exists in the store."""
-    return case_id in _STORE
+    return get_status_store().get(case_id) is not None
 
 def update_case(case_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
     """Update case data with new fields."""
     if not case_exists(case_id):
         raise KeyError(f"Case {case_id} not found")
     
-    entry = _STORE[case_id]
-    entry.update(update_data)
-    return entry
+    return _update(case_id, lambda entry: entry.update(update_data))
+
+
+def store_stats() -> Dict[str, Any]:
+    return get_status_store().stats()
+
+
+def close_store() -> None:
+    close_status_store()
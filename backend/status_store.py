@@ -0,0 +1,237 @@
+"""
+status_store.py
+
+Backends for the case status store used by status.py. Both keep whole entries
+({status, timestamps, progress_percent, stage, result, ...}) per case id and expose:
+- get(case_id): entry or None; never blocks on writers
+- update(case_id, fn): atomic read-modify-write; fn(entry or None) returns the new entry
+- delete / stats / close
+
+MemoryStatusStore is per process (LRU by last update + TTL). SQLiteStatusStore keeps
+entries in a WAL-mode SQLite file so every uvicorn worker on the host sees the same
+progress; its readers (in any process) never wait for a writer.
+
+Configuration (environment):
+- STATUS_STORE: "memory" (default) or "sqlite"
+- STATUS_STORE_PATH: SQLite file (default backend/.cache/status.sqlite)
+- STATUS_TTL: seconds since last update before an entry expires (default 86400; 0 = never)
+- STATUS_MAX_ENTRIES: entries kept before the least recently updated are evicted (default 10000)
+- STATUS_SWEEP_INTERVAL: seconds between deletes of expired rows in the sqlite backend (default 60)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+Entry = Dict[str, Any]
+UpdateFn = Callable[[Optional[Entry]], Entry]
+
+
+class MemoryStatusStore:
+    """
+    Entries are replaced, never mutated in place, so get() is a plain dict lookup
+    without a lock; update() serializes writers and keeps the dict ordered by last
+    update, which makes both LRU eviction and TTL expiry O(1) per write.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl or None
+        # case_id -> (updated_at, entry)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, updated_at: float, now: float) -> bool:
+        return self.ttl is not None and updated_at + self.ttl <= now
+
+    def get(self, case_id: str) -> Optional[Entry]:
+        item = self._data.get(case_id)
+        if item is None or self._expired(item[0], time.time()):
+            return None
+        return _copy(item[1])
+
+    def update(self, case_id: str, fn: UpdateFn) -> Entry:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(case_id)
+            current = item[1] if item is not None and not self._expired(item[0], now) else None
+            entry = fn(_copy(current) if current is not None else None)
+            self._data[case_id] = (now, entry)
+            self._data.move_to_end(case_id)
+            # Oldest updates sit at the front: drop expired ones, then trim to size
+            while self._data:
+                updated_at = next(iter(self._data.values()))[0]
+                if len(self._data) > self.max_entries or self._expired(updated_at, now):
+                    self._data.popitem(last=False)
+                else:
+                    break
+        return _copy(entry)
+
+    def delete(self, case_id: str) -> None:
+        with self._lock:
+            self._data.pop(case_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._data), "max_entries": self.max_entries, "ttl": self.ttl}
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteStatusStore:
+    """
+    Status entries as JSON rows in a WAL SQLite file, shared by all worker processes on
+    the host. Writes go through one connection guarded by a lock; reads use a connection
+    per thread and take no lock, so a status poll never waits behind a writer (WAL
+    readers see the last committed entry). Reads already skip expired rows, so deleting
+    them is a periodic sweep.
+    """
+
+    # Check the size bound once every this many writes (COUNT(*) is not free)
+    TRIM_EVERY = 256
+
+    def __init__(
+        self, path: str, max_entries: int = 10000, ttl: Optional[float] = None, sweep_interval: float = 60.0
+    ):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl or None
+        self.sweep_interval = max(0.0, float(sweep_interval))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Every reader connection handed out, so close() can close them all
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._writes = 0
+        self._next_sweep = 0.0
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        conn = self._conn
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS case_status ("
+            " case_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL, expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_case_status_updated ON case_status (updated_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_case_status_expires ON case_status (expires_at)")
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            with self._readers_lock:
+                self._readers.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def get(self, case_id: str) -> Optional[Entry]:
+        row = self._reader().execute(
+            "SELECT data FROM case_status WHERE case_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (case_id, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def update(self, case_id: str, fn: UpdateFn) -> Entry:
+        with self._lock:
+            return self._update(self._conn, case_id, fn)
+
+    def _update(self, conn: sqlite3.Connection, case_id: str, fn: UpdateFn) -> Entry:
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent read-modify-writes
+        # from other processes cannot interleave
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM case_status WHERE case_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (case_id, now),
+            ).fetchone()
+            entry = fn(json.loads(row[0]) if row is not None else None)
+            conn.execute(
+                "INSERT INTO case_status (case_id, data, updated_at, expires_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(case_id) DO UPDATE SET"
+                " data = excluded.data, updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+                (case_id, json.dumps(entry, ensure_ascii=False, default=str), now, now + self.ttl if self.ttl else None),
+            )
+            if self.ttl and now >= self._next_sweep:
+                conn.execute("DELETE FROM case_status WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+                self._next_sweep = now + self.sweep_interval
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM case_status WHERE case_id IN ("
+                    " SELECT case_id FROM case_status ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return entry
+
+    def delete(self, case_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM case_status WHERE case_id = ?", (case_id,))
+
+    def stats(self) -> Dict[str, Any]:
+        count = self._reader().execute("SELECT COUNT(*) FROM case_status").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "entries": count, "max_entries": self.max_entries, "ttl": self.ttl}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+
+
+def _copy(entry: Entry) -> Entry:
+    # Writers build a new entry instead of touching the one lock-free readers may hold
+    out = dict(entry)
+    if isinstance(out.get("timestamps"), dict):
+        out["timestamps"] = dict(out["timestamps"])
+    return out
+
+
+_STORE: Optional[Any] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_status_store():
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                ttl = float(os.getenv("STATUS_TTL", "86400"))
+                max_entries = int(os.getenv("STATUS_MAX_ENTRIES", "10000"))
+                backend = os.getenv("STATUS_STORE", "memory").strip().lower()
+                if backend == "sqlite":
+                    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "status.sqlite")
+                    _STORE = SQLiteStatusStore(
+                        os.getenv("STATUS_STORE_PATH", default_path),
+                        max_entries,
+                        ttl,
+                        sweep_interval=float(os.getenv("STATUS_SWEEP_INTERVAL", "60")),
+                    )
+                else:
+                    _STORE = MemoryStatusStore(max_entries, ttl)
+    return _STORE
+
+
+def close_status_store() -> None:
+    global _STORE
+    with _STORE_LOCK:
+        store, _STORE = _STORE, None
+    if store is not None:
+        store.close()
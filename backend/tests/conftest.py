@@ -0,0 +1,6 @@
+# Unit tests for backend modules; run with `python -m pytest backend/tests`.
+# Modules fall back to script-style imports, so the backend directory goes on sys.path.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
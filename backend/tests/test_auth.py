@@ -0,0 +1,64 @@
+import json
+import time
+
+import pytest
+
+import auth
+from auth import InvalidToken, issue_token, verify_token
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(auth, "_SECRET", b"test-secret")
+
+
+def _signed(claims):
+    """A correctly signed token with arbitrary claims."""
+    body = auth._b64(json.dumps(claims).encode("utf-8"))
+    return f"{body}.{auth._sign(body.encode('ascii')).decode('ascii')}"
+
+
+def test_round_trip():
+    token = issue_token({"id": 7, "email": "a@example.com", "role": "customer"}, ttl=60)["token"]
+    claims = verify_token(token)
+    assert claims["sub"] == 7 and claims["email"] == "a@example.com"
+
+
+def test_expired_token():
+    token = issue_token({"id": 7}, ttl=-1)["token"]
+    with pytest.raises(InvalidToken, match="expired"):
+        verify_token(token)
+
+
+def test_tampered_signature():
+    body, sig = issue_token({"id": 7}, ttl=60)["token"].split(".")
+    with pytest.raises(InvalidToken, match="signature"):
+        verify_token(f"{body}.{sig[:-1]}{'A' if sig[-1] != 'A' else 'B'}")
+
+
+@pytest.mark.parametrize(
+    "token",
+    [None, 42, b"abc.def", "", "no-dot", "a.b.c", "é.é", "abc.ÿþ", "\ud800.x", "Zm9v.٣"],
+)
+def test_malformed_input_raises_invalid_token(token):
+    with pytest.raises(InvalidToken):
+        verify_token(token)
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [{"sub": 1}, {"exp": "soon"}, {"exp": None}, {"exp": True}, {"exp": [1]}, [1, 2], "text", 3],
+)
+def test_signed_but_bad_claims_raise_invalid_token(claims):
+    with pytest.raises(InvalidToken):
+        verify_token(_signed(claims))
+
+
+def test_signed_garbage_body_raises_invalid_token():
+    body = b"!!not-base64-json!!"
+    with pytest.raises(InvalidToken):
+        verify_token(f"{body.decode()}.{auth._sign(body).decode()}")
+
+
+def test_float_exp_is_accepted():
+    assert verify_token(_signed({"exp": time.time() + 60}))["exp"] > time.time()
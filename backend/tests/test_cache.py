@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from cache import LRUCache, SQLiteCache, TieredCache
+
+
+def _size(value):
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    value = "x" * 100
+    cache = SQLiteCache(str(tmp_path / "c.sqlite"), max_bytes=_size(value) * 3)
+    for key in ("a", "b", "c"):
+        cache.set(key, value)
+    assert cache.get("a") == value  # a is now more recent than b
+    cache.set("d", value)
+    assert cache.get("b") is None
+    assert {k for k in "acd" if cache.get(k) is not None} == set("acd")
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    cache.close()
+
+
+def test_sqlite_cache_running_total_tracks_replace_and_delete(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "c.sqlite"), max_bytes=10_000)
+    cache.set("a", "x" * 10)
+    cache.set("a", "x" * 50)  # replace: the old size must not be double counted
+    cache.set("b", "y" * 20)
+    cache.delete("b")
+    assert cache._bytes == cache.stats()["bytes"] == _size("x" * 50)
+    cache.clear()
+    assert cache._bytes == 0
+    cache.close()
+
+
+def test_sqlite_cache_total_survives_reopen(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    first = SQLiteCache(path, max_bytes=10_000)
+    first.set("a", "x" * 100)
+    first.close()
+    second = SQLiteCache(path, max_bytes=10_000)
+    assert second._bytes == _size("x" * 100)
+    second.close()
+
+
+def test_sqlite_cache_ttl_expires(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "c.sqlite"), ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_lru_cache_bound_and_contains():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+
+
+def test_tiered_cache_async_promotes_disk_hits(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "c.sqlite"))
+    cache = TieredCache(LRUCache(8), disk)
+
+    async def run():
+        await cache.aset("k", {"v": 1})
+        cache.memory.clear()
+        assert await cache.aget("k") == {"v": 1}  # disk tier, off the loop
+        assert await cache.aget("k") == {"v": 1}  # promoted to memory
+        assert await cache.aget("missing") is None
+
+    asyncio.run(run())
+    assert cache.stats()["hits"] == {"memory": 1, "disk": 1}
+    assert cache.stats()["misses"] == 1
+    cache.close()
@@ -0,0 +1,80 @@
+import asyncio
+
+import main
+from events import EventHub, sse_events
+
+
+def _collect(hub, case_id, last_event_id=0):
+    async def run():
+        return [e async for e in hub.subscribe(case_id, last_event_id)]
+
+    return asyncio.run(run())
+
+
+def test_history_keeps_a_stub_for_large_events():
+    hub = EventHub(max_event_bytes=100)
+    result = {"report": "x" * 500}
+    live = []
+
+    async def run():
+        hub.open("c1")
+
+        async def follow():
+            async for item in hub.subscribe("c1"):
+                live.append(item)
+
+        task = asyncio.ensure_future(follow())
+        await asyncio.sleep(0)
+        hub.publish("c1", "status", {"stage": "ocr"})
+        hub.publish("c1", "result", result, ref={"result_url": "/api/cases/c1/result"})
+        await task
+
+    asyncio.run(run())
+    assert [e["data"] for e in live] == [{"stage": "ocr"}, result]
+    replay = _collect(hub, "c1")
+    assert replay[0]["data"] == {"stage": "ocr"}
+    stub = replay[1]["data"]
+    assert stub["omitted"] and stub["bytes"] > 500 and stub["result_url"] == "/api/cases/c1/result"
+    assert replay[1]["id"] == live[1]["id"] == 2
+
+
+def test_history_is_bounded_by_case_count():
+    hub = EventHub(max_cases=2)
+    for case_id in ("a", "b", "c"):
+        hub.publish(case_id, "status", {})
+    assert not hub.has("a") and hub.has("b") and hub.has("c")
+
+
+def test_unknown_case_is_followed_through_the_status_store(monkeypatch):
+    states = iter([
+        {"status": "analyzing_issue", "stage": "ocr", "progress_percent": 10},
+        {"status": "analyzing_issue", "stage": "ocr", "progress_percent": 10},
+        {"status": "analyzing_issue", "stage": "report", "progress_percent": 95},
+        {"status": "analysis_completed", "stage": "done", "progress_percent": 100},
+    ])
+    monkeypatch.setenv("EVENTS_POLL_SECONDS", "0")
+    monkeypatch.setattr(main.case_status, "to_response", lambda case_id: next(states))
+    monkeypatch.setattr(main.case_status, "get_result", lambda case_id: {"ok": True})
+
+    async def run():
+        return [e async for e in main._polled_events("c1")]
+
+    events = asyncio.run(run())
+    assert [(e["event"], e["data"]) for e in events] == [
+        ("status", {"stage": "ocr", "progress_percent": 10}),
+        ("status", {"stage": "report", "progress_percent": 95}),
+        ("result", {"ok": True}),
+    ]
+    ids = [e["id"] for e in events]
+    assert ids == sorted(set(ids))
+
+
+def test_polled_stream_ends_on_failure(monkeypatch):
+    monkeypatch.setattr(
+        main.case_status, "to_response", lambda case_id: {"status": "analysis_failed", "error": "ocr crashed"}
+    )
+
+    async def run():
+        return [chunk async for chunk in sse_events(main._polled_events("c1"))]
+
+    assert asyncio.run(run()) == ['id: 1\nevent: error\ndata: {"detail": "ocr crashed"}\n\n']
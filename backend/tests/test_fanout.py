@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from fanout import RateLimiter, chunked, map_bounded
+
+
+def test_map_bounded_keeps_order_and_bound():
+    in_flight = 0
+    peak = 0
+
+    async def work(x):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01 * (x % 3))
+        in_flight -= 1
+        if x == 4:
+            raise ValueError("bad item")
+        return x * 10
+
+    results = asyncio.run(map_bounded(work, list(range(10)), concurrency=3))
+    assert peak <= 3
+    assert isinstance(results[4], ValueError)
+    assert [r for i, r in enumerate(results) if i != 4] == [i * 10 for i in range(10) if i != 4]
+
+
+def test_rate_limiter_spaces_calls():
+    async def run():
+        limiter = RateLimiter(50)  # 20 ms apart
+        start = time.monotonic()
+        await map_bounded(lambda x: asyncio.sleep(0), list(range(5)), concurrency=5, limiter=limiter)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.07
+
+
+def test_chunked():
+    assert chunked([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from ingest import UploadSizeLimit, ingest_uploads, sniff_kind
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+WEBP = b"RIFF\x00\x00\x00\x00WEBPVP8 " + b"\x00" * 100
+PDF = b"%PDF-1.7\n" + b"0" * 100
+
+
+def _upload(data, name="f"):
+    return UploadFile(file=io.BytesIO(data), filename=name)
+
+
+def _ingest(*uploads, **limits):
+    return asyncio.run(ingest_uploads(list(uploads), **limits))
+
+
+@pytest.mark.parametrize(
+    "head,kind",
+    [(PNG, "png"), (JPEG, "jpeg"), (WEBP, "webp"), (PDF, "pdf"), (b"junk\n" + PDF, "pdf"),
+     (b"GIF89a" + b"\x00" * 10, None), (b"RIFF\x00\x00\x00\x00WAVE", None), (b"", None)],
+)
+def test_sniff_kind(head, kind):
+    assert sniff_kind(head) == kind
+
+
+def test_ingest_hashes_and_types_by_content():
+    files, stats = _ingest(_upload(PNG, "scan.pdf"), _upload(PDF, "r.bin"))
+    try:
+        assert [(f.kind, f.size) for f in files] == [("png", len(PNG)), ("pdf", len(PDF))]
+        assert files[0].sha256 == hashlib.sha256(PNG).hexdigest()
+        assert files[0].path.endswith(".png") and files[1].is_pdf
+        with open(files[1].path, "rb") as fh:
+            assert fh.read() == PDF
+        assert stats["files"] == 2 and stats["bytes"] == len(PNG) + len(PDF)
+    finally:
+        for f in files:
+            os.unlink(f.path)
+
+
+@pytest.mark.parametrize(
+    "uploads,limits,status",
+    [
+        ([b"GIF89a" + b"\x00" * 10], {}, 415),
+        ([b""], {}, 400),
+        ([PNG], {"max_file_bytes": 50}, 413),
+        ([PNG, PNG], {"max_file_bytes": 1000, "max_request_bytes": len(PNG) + 10}, 413),
+    ],
+)
+def test_ingest_rejections(uploads, limits, status, monkeypatch, tmp_path):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    with pytest.raises(HTTPException) as e:
+        _ingest(*(_upload(d) for d in uploads), **limits)
+    assert e.value.status_code == status
+    assert os.listdir(tmp_path) == []  # partial and earlier files are removed
+
+
+def _app(limit):
+    app = FastAPI()
+    calls = []
+
+    @app.post("/upload")
+    async def upload(f: UploadFile = File(...)):
+        calls.append(f.filename)
+        return {"ok": True}
+
+    app.add_middleware(UploadSizeLimit, paths=["/upload"], max_bytes=limit)
+    return TestClient(app), calls
+
+
+def test_size_limit_rejects_by_content_length_before_parsing():
+    client, calls = _app(1000)
+    r = client.post("/upload", files={"f": ("a.png", b"x" * 5000)})
+    assert r.status_code == 413 and calls == []
+
+
+def test_size_limit_cuts_off_chunked_bodies():
+    client, calls = _app(1000)
+    body = (b"x" * 512 for _ in range(20))  # no Content-Length: streamed in chunks
+    r = client.post("/upload", content=body, headers={"content-type": "multipart/form-data; boundary=b"})
+    assert r.status_code == 413 and calls == []
+
+
+def test_size_limit_passes_small_uploads():
+    client, calls = _app(10_000)
+    assert client.post("/upload", files={"f": ("a.png", PNG)}).status_code == 200
+    assert calls == ["a.png"]
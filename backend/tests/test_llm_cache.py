@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+import llm_cache
+
+
+@pytest.fixture
+def sqlite_llm_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_BACKEND", "sqlite")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.sqlite"))
+    llm_cache.close_llm_cache()
+    yield llm_cache.get_llm_cache()
+    llm_cache.close_llm_cache()
+
+
+def test_cached_call_hits_after_first_call(sqlite_llm_cache):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return {"answer": 42}
+
+    async def run():
+        first = await llm_cache.cached_call("ns", "m", "1", "sys", "hello  world", call)
+        # Whitespace-only differences share the entry
+        second = await llm_cache.cached_call("ns", "m", "1", "sys", "hello world", call)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == ({"answer": 42}, False)
+    assert second == ({"answer": 42}, True)
+    assert len(calls) == 1
+
+
+def test_cached_call_does_not_cache_failures(sqlite_llm_cache):
+    async def boom():
+        raise RuntimeError("upstream down")
+
+    async def ok():
+        return "fine"
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await llm_cache.cached_call("ns", "m", "1", "sys", "q", boom)
+        return await llm_cache.cached_call("ns", "m", "1", "sys", "q", ok)
+
+    assert asyncio.run(run()) == ("fine", False)
+
+
+def test_hits_are_copies(sqlite_llm_cache):
+    async def run():
+        await llm_cache.astore("ns", "m", "1", "sys", "q", {"list": [1]})
+        hit = await llm_cache.alookup("ns", "m", "1", "sys", "q")
+        hit["list"].append(2)
+        return await llm_cache.alookup("ns", "m", "1", "sys", "q")
+
+    assert asyncio.run(run()) == {"list": [1]}
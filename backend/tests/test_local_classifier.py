@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+import local_classifier as lc
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean(monkeypatch, tmp_path):
+    monkeypatch.setenv("LOCAL_CLASSIFIER_MODEL", str(tmp_path / "none.npz"))
+    monkeypatch.setenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85")
+    monkeypatch.setenv("LOCAL_CLASSIFIER_SHADOW_RATE", "0")
+    lc.reset_model()
+    metrics.reset()
+    yield
+    lc.reset_model()
+
+
+def _fixed_local(monkeypatch, confidence, category="damaged_item"):
+    monkeypatch.setattr(
+        lc, "classify_local", lambda text: {"category": category, "confidence_score": confidence, "source": "local"}
+    )
+
+
+def _llm(calls, category="damaged_item", fail=False):
+    async def call():
+        calls.append(1)
+        if fail:
+            raise RuntimeError("llm down")
+        return {"category": category}
+
+    return call
+
+
+@pytest.mark.parametrize("confidence,source", [(0.85, "local"), (0.99, "local"), (0.8499, "llm"), (0.0, "llm")])
+def test_gate_threshold(monkeypatch, confidence, source):
+    _fixed_local(monkeypatch, confidence)
+    calls = []
+    result = asyncio.run(lc.classify_gated("text", _llm(calls)))
+    assert result["source"] == source
+    assert len(calls) == (1 if source == "llm" else 0)
+    if source == "llm":
+        assert result["local"] == {"category": "damaged_item", "confidence_score": confidence}
+
+
+def test_disabled_always_asks_the_llm(monkeypatch):
+    monkeypatch.setenv("LOCAL_CLASSIFIER_ENABLED", "false")
+    _fixed_local(monkeypatch, 1.0)
+    calls = []
+    assert asyncio.run(lc.classify_gated("text", _llm(calls))) == {"category": "damaged_item"}
+    assert calls == [1]
+
+
+def test_empty_text_falls_through_to_the_llm():
+    assert lc.classify_local("")["confidence_score"] == 0.0
+    calls = []
+    assert asyncio.run(lc.classify_gated("", _llm(calls)))["source"] == "llm"
+
+
+@pytest.mark.parametrize("fail,agree", [(False, True), (False, False), (True, False)])
+def test_shadow_sample_runs_in_background_and_does_not_leak(monkeypatch, fail, agree):
+    monkeypatch.setenv("LOCAL_CLASSIFIER_SHADOW_RATE", "1")
+    _fixed_local(monkeypatch, 0.95)
+    calls = []
+
+    async def run():
+        result = await lc.classify_gated("text", _llm(calls, "damaged_item" if agree else "other", fail))
+        assert result["source"] == "local"
+        assert len(lc._SHADOW_TASKS) == 1  # still running when the request returns
+        await asyncio.gather(*lc._SHADOW_TASKS)
+        await asyncio.sleep(0)  # done callbacks run on the next loop iteration
+
+    asyncio.run(run())
+    assert lc._SHADOW_TASKS == set()
+    assert calls == [1]
+    counters = metrics.snapshot()["counters"]
+    assert counters["classifier.shadow.sampled"] == 1
+    if fail:
+        assert counters["classifier.shadow.errors"] == 1
+    else:
+        assert counters["classifier.shadow.compared"] == 1
+        assert counters.get("classifier.shadow.agree", 0) == (1 if agree else 0)
+
+
+def test_no_shadow_sample_at_rate_zero(monkeypatch):
+    _fixed_local(monkeypatch, 0.95)
+    calls = []
+    asyncio.run(lc.classify_gated("text", _llm(calls)))
+    assert calls == [] and lc._SHADOW_TASKS == set()
+
+
+TRAINING = [
+    ("the screen arrived cracked and broken", "damaged_item"),
+    ("box was crushed, item smashed", "damaged_item"),
+    ("parcel never showed up at my door", "not_received"),
+    ("tracking says delivered but nothing came", "not_received"),
+    ("they sent me a blue one instead of red", "wrong_item_sent"),
+    ("I want my money back please", "refund_request"),
+]
+
+
+def test_trained_model_round_trips_and_is_used(monkeypatch, tmp_path):
+    texts, labels = zip(*TRAINING)
+    model = lc.train(list(texts), list(labels))
+    for text, label in TRAINING:
+        probs = model.predict_proba(text)
+        assert max(probs, key=probs.get) == label
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    monkeypatch.setenv("LOCAL_CLASSIFIER_MODEL", path)
+    lc.reset_model()
+    result = lc.classify_local("parcel never showed up")
+    assert result["model_used"] == "local-linear" and result["category"] == "not_received"
+
+
+def test_model_with_another_version_is_ignored(monkeypatch, tmp_path):
+    model = lc.train(["broken"], ["damaged_item"])
+    path = str(tmp_path / "model.npz")
+    with monkeypatch.context() as m:
+        m.setattr(lc, "MODEL_VERSION", lc.MODEL_VERSION + 1)
+        model.save(path)
+    monkeypatch.setenv("LOCAL_CLASSIFIER_MODEL", path)
+    lc.reset_model()
+    assert lc.get_model() is None
+    assert lc.classify_local("broken")["model_used"] == "local-keywords"
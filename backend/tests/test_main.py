@@ -0,0 +1,66 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "_ensure_uploads_dir", lambda: str(tmp_path))
+    return os.path.realpath(tmp_path / "debug")
+
+
+def test_debug_dir_uses_safe_case_id(uploads):
+    assert main._debug_dir("CASE-20250101-ABC_1") == os.path.join(uploads, "CASE-20250101-ABC_1")
+
+
+@pytest.mark.parametrize("case_id", ["../../x", "/etc", "a/b", "..", "x" * 65, "a\n", "C:\\tmp", "ca se"])
+def test_debug_dir_never_leaves_uploads_debug(uploads, case_id):
+    path = main._debug_dir(case_id)
+    assert os.path.dirname(path) == uploads
+    assert os.path.basename(path).startswith("case-")
+
+
+def test_progress_writer_merges_updates_off_the_loop(monkeypatch):
+    writes = []
+
+    def slow_set_progress(case_id, pct, stage):
+        time.sleep(0.05)
+        writes.append((case_id, pct, stage, threading.current_thread() is threading.main_thread()))
+
+    monkeypatch.setattr(main.case_status, "set_progress", slow_set_progress)
+
+    async def run():
+        writer = main._ProgressWriter("c1")
+        for pct in range(10, 60, 5):
+            writer.set(pct, f"ocr:{pct}")
+            await asyncio.sleep(0)
+        await writer.flush()
+
+    asyncio.run(run())
+    # First update written right away, the rest merged into the latest one
+    assert [w[:3] for w in writes] == [("c1", 10, "ocr:10"), ("c1", 55, "ocr:55")]
+    assert not any(w[3] for w in writes)
+
+
+def test_write_behind_requires_a_known_user(monkeypatch):
+    async def lookup(email):
+        return {"id": 1, "email": email} if email == "a@example.com" else None
+
+    monkeypatch.setattr(main, "lookup_user", lookup)
+    asyncio.run(main._require_user("a@example.com"))
+    with pytest.raises(main.HTTPException) as e:
+        asyncio.run(main._require_user("nobody@example.com"))
+    assert e.value.status_code == 400
+
+
+def test_write_behind_queues_when_the_user_lookup_fails(monkeypatch):
+    async def lookup(email):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(main, "lookup_user", lookup)
+    asyncio.run(main._require_user("a@example.com"))  # no 400: the queue rides out the outage
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+import metrics
+import ocr_pool
+from ocr_pool import OcrPool, OcrPoolBusy
+
+
+@pytest.fixture(autouse=True)
+def no_warmup(monkeypatch):
+    # Thread-mode workers would otherwise load the EasyOCR model on start
+    monkeypatch.setattr(ocr_pool, "_init_worker", lambda: None)
+    metrics.reset()
+
+
+def _square(x):
+    time.sleep(0.01)
+    return x * x
+
+
+def _boom(x):
+    raise ValueError(x)
+
+
+def test_admit_enforces_capacity_even_when_idle():
+    pool = OcrPool(workers=2, max_queue=1, mode="thread")
+    with pytest.raises(OcrPoolBusy):
+        pool.admit(4)
+    pool.admit(3)
+    with pytest.raises(OcrPoolBusy):
+        pool.admit(1)
+
+
+def test_large_batch_runs_through_worker_slots():
+    pool = OcrPool(workers=2, max_queue=1, mode="thread")
+    seen = []
+
+    async def run():
+        return await pool.run_many([(_square, (i,)) for i in range(10)], on_done=lambda i, r: seen.append(pool._pending))
+
+    try:
+        assert asyncio.run(run()) == [i * i for i in range(10)]
+    finally:
+        pool.shutdown()
+    assert max(seen) <= 2
+    assert pool._pending == 0
+
+
+def test_batch_leaves_queue_slots_for_others():
+    pool = OcrPool(workers=2, max_queue=2, mode="thread")
+
+    async def run():
+        batch = asyncio.ensure_future(pool.run_many([(_square, (i,)) for i in range(20)]))
+        await asyncio.sleep(0.02)
+        single = await pool.run(_square, 3)  # admitted while the batch is running
+        return single, await batch
+
+    try:
+        single, results = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert single == 9 and len(results) == 20
+
+
+def test_metrics_count_completed_and_failed_separately():
+    pool = OcrPool(workers=1, max_queue=4, mode="thread")
+
+    async def run():
+        return await pool.run_many([(_square, (2,)), (_boom, (1,)), (_square, (3,))])
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert results[0] == 4 and isinstance(results[1], ValueError) and results[2] == 9
+    counters = metrics.snapshot()["counters"]
+    assert counters["ocr_pool.completed"] == 2
+    assert counters["ocr_pool.failed"] == 1
+
+
+class _FakeExecutor:
+    def __init__(self):
+        self.shut = False
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut = True
+
+
+def test_reset_only_drops_the_broken_executor():
+    pool = OcrPool(workers=1, max_queue=0, mode="thread")
+    broken, rebuilt = _FakeExecutor(), _FakeExecutor()
+    pool._executor = broken
+    pool._reset_executor(broken)  # first failed job: drops the broken pool
+    assert broken.shut and pool._executor is None
+    pool._executor = rebuilt  # ... and rebuilds it
+    pool._reset_executor(broken)  # a second job failing on the same broken pool
+    assert pool._executor is rebuilt and not rebuilt.shut
@@ -0,0 +1,54 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("easyocr")
+import ocr_utils
+
+
+@pytest.fixture
+def slow_reader(monkeypatch):
+    """easyocr.Reader replaced by a fake whose "en" model takes a while to load."""
+    built = []
+
+    class FakeReader:
+        def __init__(self, langs, **kwargs):
+            if langs == ["en"]:
+                time.sleep(0.3)
+            built.append(tuple(langs))
+
+    monkeypatch.setattr(ocr_utils.easyocr, "Reader", FakeReader)
+    ocr_utils.clear_readers()
+    yield built
+    ocr_utils.clear_readers()
+
+
+def test_building_one_reader_does_not_block_other_keys(slow_reader):
+    threads = [threading.Thread(target=ocr_utils.get_reader, args=(["en"], None, False)) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)  # "en" is now loading
+    start = time.perf_counter()
+    ocr_utils.get_reader(["de"], None, False)
+    assert time.perf_counter() - start < 0.2
+    for t in threads:
+        t.join()
+    # Concurrent callers for the same key share one build
+    assert sorted(slow_reader) == [("de",), ("en",)]
+    assert ocr_utils.get_reader(["en"], None, False) is ocr_utils.get_reader(["en"], None, False)
+
+
+def test_target_height_only_applies_to_the_full_tier(monkeypatch):
+    monkeypatch.setenv("OCR_FAST_TEXT_HEIGHT", "16")
+    heights = []
+    real = ocr_utils.normalize_resolution
+    monkeypatch.setattr(
+        ocr_utils, "normalize_resolution", lambda gray, target_height=None: heights.append(target_height) or real(gray, 0)
+    )
+    monkeypatch.setattr(ocr_utils, "readtext", lambda img, **kw: [])
+    img = np.full((40, 60), 255, dtype=np.uint8)
+    for tier in ("fast", "full", "raw"):
+        ocr_utils._ocr_text_with_meta(img, tier, target_height=30)
+    assert heights == [16.0, 30]
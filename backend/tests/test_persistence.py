@@ -0,0 +1,89 @@
+import asyncio
+import importlib
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """persistence.py on sqlite+aiosqlite, with the case tables created and one AppUser."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'sync.db'}")
+    url = f"sqlite+aiosqlite:///{tmp_path / 'case.db'}"
+    async_database = importlib.import_module("case.async_database")
+    models = importlib.import_module("case.models")
+    monkeypatch.setattr(async_database, "ASYNC_DB_URL", url)
+    monkeypatch.setattr(async_database, "_engine", None)
+    monkeypatch.setattr(async_database, "_sessionmaker", None)
+    import persistence
+
+    async def setup():
+        async with async_database.get_async_engine().begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        async with async_database.get_async_sessionmaker()() as session:
+            async with session.begin():
+                session.add(models.AppUser(email="a@example.com", password_hash="x", role="customer"))
+
+    asyncio.run(setup())
+    yield persistence, models
+    asyncio.run(async_database.dispose_async_engine())
+
+
+def _item(email, title):
+    return {
+        "user_email": email,
+        "title": title,
+        "issue_description": "broken",
+        "classification": {"category": "defect", "confidence": 0.9},
+        "eligibility": {"eligible": True, "reason": "within warranty"},
+        "summary": {"analysis": title},
+        "at": "2025-01-02T03:04:05",
+    }
+
+
+def _fetch(models, stmt):
+    from sqlalchemy import select
+    from case.async_database import get_async_sessionmaker
+
+    async def run():
+        async with get_async_sessionmaker()() as session:
+            return (await session.execute(select(*stmt))).all()
+
+    return asyncio.run(run())
+
+
+def test_persist_analysis_on_sqlite(sqlite_db):
+    persistence, models = sqlite_db
+    ids = asyncio.run(persistence.persist_analysis(
+        "a@example.com", "TV", "no picture", {"category": "defect"}, {"eligible": False, "reason": "expired"}
+    ))
+    assert all(isinstance(v, int) for v in ids.values())
+    # Inserted before the report exists: in progress, no summary yet
+    cols = (models.Case.id, models.Case.title, models.Case.status, models.Case.latest_summary)
+    assert _fetch(models, cols) == [(ids["case_id"], "TV", "analyzing_issue", None)]
+    asyncio.run(persistence.update_case_summary(ids["case_id"], {"analysis": "dead panel"}))
+    assert _fetch(models, cols) == [(ids["case_id"], "TV", "analysis_completed", "dead panel")]
+    with pytest.raises(persistence.UnknownUserError):
+        asyncio.run(persistence.persist_analysis("nobody@example.com", "x", "", None, {}))
+
+
+def test_persist_batch_on_sqlite_keeps_item_order(sqlite_db):
+    persistence, models = sqlite_db
+    items = [_item("a@example.com", "one"), _item("nobody@example.com", "skipped"), _item("a@example.com", "two")]
+    out = asyncio.run(persistence.persist_batch(items))
+    assert "error" in out[1]
+    assert out[0]["case_id"] < out[2]["case_id"]
+    titles = dict(_fetch(models, (models.Case.id, models.Case.title)))
+    assert titles == {out[0]["case_id"]: "one", out[2]["case_id"]: "two"}
+    assert {s for (s,) in _fetch(models, (models.Case.status,))} == {"analysis_completed"}
+    issues = dict(_fetch(models, (models.Issue.id, models.Issue.case_id)))
+    assert issues == {out[0]["issue_id"]: out[0]["case_id"], out[2]["issue_id"]: out[2]["case_id"]}
+    decisions = dict(_fetch(models, (models.EligibilityDecision.id, models.EligibilityDecision.case_id)))
+    assert decisions[out[2]["eligibility_decision_id"]] == out[2]["case_id"]
+
+
+def test_lookup_user(sqlite_db):
+    persistence, _ = sqlite_db
+    assert asyncio.run(persistence.lookup_user("a@example.com"))["email"] == "a@example.com"
+    assert asyncio.run(persistence.lookup_user("nobody@example.com")) is None
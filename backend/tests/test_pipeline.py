@@ -0,0 +1,184 @@
+import asyncio
+
+import pytest
+
+import main
+from pipeline import StageGraph
+
+
+def _stage(name, log, delay=0.0, value=None, fail=False):
+    async def fn(r):
+        log.append(("start", name, sorted(r)))
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError(name)
+        log.append(("end", name))
+        return name if value is None else value
+
+    return fn
+
+
+def test_add_rejects_duplicates_and_unknown_deps():
+    graph = StageGraph().add("a", _stage("a", []))
+    with pytest.raises(ValueError):
+        graph.add("a", _stage("a", []))
+    with pytest.raises(ValueError):
+        graph.add("b", _stage("b", []), ["missing"])
+
+
+def test_stages_start_after_their_deps_and_siblings_overlap():
+    log = []
+    graph = (
+        StageGraph()
+        .add("a", _stage("a", log))
+        .add("b", _stage("b", log, delay=0.05), ["a"])
+        .add("c", _stage("c", log, delay=0.05), ["a"])
+        .add("d", _stage("d", log), ["b", "c"])
+    )
+    done = []
+    results, timings = asyncio.run(graph.run(on_stage_done=lambda name, value: done.append(name)))
+    assert results == {"a": "a", "b": "b", "c": "c", "d": "d"}
+    starts = {e[1]: e[2] for e in log if e[0] == "start"}
+    assert starts["b"] == starts["c"] == ["a"]
+    assert starts["d"] == ["a", "b", "c"]
+    # b and c both start before either ends
+    order = [e[:2] for e in log]
+    assert order.index(("start", "c")) < order.index(("end", "b"))
+    assert timings["d"]["start_ms"] >= max(timings["b"]["end_ms"], timings["c"]["end_ms"])
+    assert done[0] == "a" and done[-1] == "d"
+    assert "total_ms" in timings
+
+
+def test_failure_cancels_the_rest_and_keeps_partial_results():
+    log = []
+    cancelled = []
+
+    async def slow(r):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    graph = (
+        StageGraph()
+        .add("a", _stage("a", log))
+        .add("bad", _stage("bad", log, delay=0.01, fail=True), ["a"])
+        .add("slow", slow, ["a"])
+        .add("after", _stage("after", log), ["bad"])
+    )
+    results = {}
+    with pytest.raises(RuntimeError, match="bad"):
+        asyncio.run(graph.run(results))
+    assert results == {"a": "a"}
+    assert cancelled == ["slow"]
+    assert not any(e[1] == "after" for e in log)
+
+
+def test_async_stage_callback_is_awaited():
+    seen = []
+
+    async def on_done(name, value):
+        await asyncio.sleep(0)
+        seen.append((name, value))
+
+    graph = StageGraph().add("a", _stage("a", [], value=1)).add("b", _stage("b", [], value=2), ["a"])
+    asyncio.run(graph.run(on_stage_done=on_done))
+    assert seen == [("a", 1), ("b", 2)]
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Replace the analysis stages in main with recording fakes."""
+    calls = []
+
+    async def ocr_files(files, debug_dir=None, on_page=None):
+        calls.append("ocr")
+        return [{"text": "receipt"}]
+
+    def consolidate(ocr, issue):
+        calls.append("summary")
+        return {"item": "TV", "ocr": ocr}
+
+    async def classify(issue, summary, use_cache):
+        calls.append("classify")
+        return {"category": "defect"}
+
+    async def eligibility(summary, use_cache):
+        calls.append("eligibility")
+        return {"eligible": True}
+
+    async def report(issue, classification, elig, summary, use_cache, on_item):
+        calls.append("report")
+        return {"analysis": "done"}
+
+    monkeypatch.setattr(main, "_ocr_files", ocr_files)
+    monkeypatch.setattr(main, "_consolidate_receipt_summary", consolidate)
+    monkeypatch.setattr(main, "_classify_stage", classify)
+    monkeypatch.setattr(main, "_eligibility_stage", eligibility)
+    monkeypatch.setattr(main, "_report_stage", report)
+    return calls
+
+
+def test_analysis_graph_without_persist(stages):
+    results, _ = asyncio.run(main._build_analysis_graph([], "broken", None).run())
+    assert set(results) == {"ocr", "summary", "classify", "eligibility", "report"}
+    assert stages[:2] == ["ocr", "summary"] and stages[-1] == "report"
+    assert set(stages[2:4]) == {"classify", "eligibility"}
+
+
+def test_analysis_graph_persists_then_fills_the_summary(stages, monkeypatch):
+    async def persist_analysis(**kw):
+        stages.append("persist")
+        assert kw["title"] == "TV" and kw["classification"] == {"category": "defect"}
+        return {"case_id": 7}
+
+    async def update_case_summary(case_id, report):
+        stages.append(("persist_summary", case_id, report["analysis"]))
+
+    monkeypatch.setattr(main, "persist_analysis", persist_analysis)
+    monkeypatch.setattr(main, "update_case_summary", update_case_summary)
+    results, _ = asyncio.run(main._build_analysis_graph([], "broken", None, persist_user_email="a@example.com").run())
+    assert results["persist_summary"] == {"case_id": 7}
+    assert stages.index("persist") > stages.index("eligibility")
+    assert stages[-1] == ("persist_summary", 7, "done")
+
+
+def test_analysis_graph_persist_errors(stages, monkeypatch):
+    async def unknown_user(**kw):
+        raise main.UnknownUserError(kw["user_email"])
+
+    async def db_down(**kw):
+        raise ConnectionError("db down")
+
+    def graph():
+        return main._build_analysis_graph([], "broken", None, persist_user_email="nobody@example.com")
+
+    monkeypatch.setattr(main, "persist_analysis", unknown_user)
+    with pytest.raises(main.HTTPException) as e:
+        asyncio.run(graph().run())
+    assert e.value.status_code == 400
+
+    # Any other persistence error is reported in the result, not raised
+    monkeypatch.setattr(main, "persist_analysis", db_down)
+    results, _ = asyncio.run(graph().run())
+    assert results["persist_summary"] == {"error": "db down"} and "report" in results
+
+
+def test_analysis_graph_stage_failure_propagates(stages, monkeypatch):
+    async def eligibility(summary, use_cache):
+        raise TimeoutError("llm timeout")
+
+    persisted = []
+
+    async def persist_analysis(**kw):
+        persisted.append(kw)
+        return {"case_id": 1}
+
+    monkeypatch.setattr(main, "_eligibility_stage", eligibility)
+    monkeypatch.setattr(main, "persist_analysis", persist_analysis)
+    results = {}
+    graph = main._build_analysis_graph([], "broken", None, persist_user_email="a@example.com")
+    with pytest.raises(TimeoutError):
+        asyncio.run(graph.run(results))
+    assert "report" not in results and persisted == []
@@ -0,0 +1,75 @@
+import json
+import random
+
+import pytest
+
+from ai_agent import ReportStreamParser, normalize_report
+
+
+def _stream(content, chunks):
+    """Feed content split into pieces of the given sizes (cycled); return the items as lists."""
+    parser = ReportStreamParser()
+    got = {"key_points": [], "steps": []}
+    pos, i = 0, 0
+    while pos < len(content):
+        size = chunks[i % len(chunks)]
+        for field, index, text in parser.feed(content[pos:pos + size]):
+            assert index == len(got[field])
+            got[field].append(text)
+        pos, i = pos + size, i + 1
+    return got
+
+
+def _splits(content):
+    """Whole, one char at a time, every two-way split, and a few random chunkings."""
+    yield [len(content) or 1]
+    yield [1]
+    for cut in range(1, len(content)):
+        yield [cut, len(content)]
+    rng = random.Random(5620)
+    for _ in range(20):
+        yield [rng.randint(1, 7) for _ in range(10)]
+
+
+CASES = [
+    # escapes and \u sequences, including surrogate pairs
+    json.dumps({"key_points": ['say "hi"\\n', "tab\there", "café ☃ \U0001F600"], "steps": ["a/b"]}),
+    r'{"key_points": ["éè", "quote \" and backslash \\"], "steps": []}',
+    # nested objects and arrays inside the lists are skipped, like normalize_report does
+    '{"key_points": [{"text": "nested", "steps": ["no"]}, "kept", ["inner"], "also kept"], "steps": ["s1"]}',
+    # numbers, booleans and null
+    '{"steps": [1, 2.5, -3e2, true, null, "x"], "key_points": [0]}',
+    # other keys, including ones whose values look like the list fields
+    '{"analysis": "key_points: [\\"not this\\"]", "meta": {"key_points": ["deep"]}, "key_points": ["real"]}',
+    # whitespace everywhere
+    '{ "key_points" :\n [ "a" ,\n "b" ] ,\n "steps" : [ 10 , "c" ] }',
+]
+
+
+@pytest.mark.parametrize("content", CASES)
+def test_streamed_items_match_normalize_report(content):
+    report = normalize_report("m", "issue", content, False)
+    want = {"key_points": report["key_points"], "steps": report["steps"]}
+    for chunks in _splits(content):
+        assert _stream(content, chunks) == want, chunks
+
+
+@pytest.mark.parametrize(
+    "prefix,suffix",
+    [("Here is the report:\n```json\n", "\n```"), ("", "\nHope this helps! {not: json}"), ("ok ", " [1, 2]")],
+)
+def test_text_around_the_object_is_ignored(prefix, suffix):
+    body = '{"key_points": ["a", "b"], "steps": ["c"]}'
+    content = prefix + body + suffix
+    report = normalize_report("m", "issue", content, False)
+    assert report["key_points"] == ["a", "b"] and report["steps"] == ["c"]
+    for chunks in ([1], [3], [len(content)]):
+        assert _stream(content, chunks) == {"key_points": ["a", "b"], "steps": ["c"]}
+
+
+def test_incomplete_stream_reports_only_finished_items():
+    parser = ReportStreamParser()
+    assert parser.feed('{"key_points": ["done", "half') == [("key_points", 0, "done")]
+    assert parser.feed('way"') == [("key_points", 1, "halfway")]
+    assert parser.feed(", 4") == []  # a number is only complete at its delimiter
+    assert parser.feed("2]") == [("key_points", 2, "42")]
@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from status_store import MemoryStatusStore, SQLiteStatusStore
+
+
+def _bump(entry):
+    entry = entry or {"n": 0}
+    entry["n"] += 1
+    return entry
+
+
+def test_memory_store_evicts_least_recently_updated():
+    store = MemoryStatusStore(max_entries=2)
+    store.update("a", _bump)
+    store.update("b", _bump)
+    store.update("a", _bump)  # a is now more recent than b
+    store.update("c", _bump)
+    assert store.get("b") is None
+    assert store.get("a") == {"n": 2}
+
+
+def test_sqlite_store_read_modify_write_is_serialized(tmp_path):
+    store = SQLiteStatusStore(str(tmp_path / "s.sqlite"))
+
+    def worker():
+        for _ in range(50):
+            store.update("case", _bump)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.get("case") == {"n": 200}
+    store.close()
+
+
+def test_sqlite_store_sweeps_expired_rows_on_interval(tmp_path):
+    store = SQLiteStatusStore(str(tmp_path / "s.sqlite"), ttl=0.05, sweep_interval=3600)
+    store.update("old", _bump)  # first write sweeps and schedules the next sweep an hour out
+    time.sleep(0.1)
+    assert store.get("old") is None  # expired rows are hidden from reads right away
+    store.update("new", _bump)
+    assert store.stats()["entries"] == 2  # ... but only deleted by the next sweep
+    store._next_sweep = 0.0
+    store.update("new", _bump)
+    assert store.stats()["entries"] == 1
+    store.close()
+
+
+def test_sqlite_store_close_is_idempotent(tmp_path):
+    store = SQLiteStatusStore(str(tmp_path / "s.sqlite"))
+    store.update("a", _bump)
+    store.close()
+    store.close()
+    reopened = SQLiteStatusStore(store.path)
+    assert reopened.get("a") == {"n": 1}
+    reopened.close()
+
+
+def test_sqlite_store_reads_do_not_wait_for_writers(tmp_path):
+    store = SQLiteStatusStore(str(tmp_path / "s.sqlite"))
+    store.update("a", _bump)
+    with store._lock:  # a writer holding the lock (e.g. waiting on BEGIN IMMEDIATE)
+        assert store.get("a") == {"n": 1}
+        assert store.stats()["entries"] == 1
+    store.close()
+
+
+def test_sqlite_store_close_closes_reader_connections_of_all_threads(tmp_path):
+    store = SQLiteStatusStore(str(tmp_path / "s.sqlite"))
+    store.update("a", _bump)
+    threads = [threading.Thread(target=store.get, args=("a",)) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    readers = list(store._readers)
+    assert len(readers) == 3
+    store.close()
+    assert store._readers == []
+    for conn in readers:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
@@ -0,0 +1,146 @@
+import asyncio
+
+import write_behind
+from write_behind import Journal, WriteBehindQueue
+
+
+def _queue(tmp_path, monkeypatch, persist, **kwargs):
+    calls = []
+
+    async def fake_persist(items):
+        calls.append(len(items))
+        return persist(items)
+
+    monkeypatch.setattr(write_behind, "persist_batch", fake_persist)
+    journal = Journal(str(tmp_path / "wb.sqlite"), max_attempts=5)
+    return WriteBehindQueue(journal, **kwargs), calls
+
+
+def _down(items):
+    raise ConnectionError("database is down")
+
+
+def _attempts(journal):
+    return [row[0] for row in journal._conn.execute("SELECT attempts FROM pending ORDER BY id")]
+
+
+def test_failed_flush_returns_zero_and_backs_off(tmp_path, monkeypatch):
+    queue, _ = _queue(tmp_path, monkeypatch, _down, batch_size=2, interval=0.5, max_backoff=3)
+
+    async def run():
+        for n in range(3):
+            await queue.enqueue("a@example.com", f"t{n}", "", None, {})
+        return [await queue.flush() for _ in range(4)]
+
+    assert asyncio.run(run()) == [0, 0, 0, 0]
+    assert queue.backoff() == 3  # 0.5, 1, 2, then capped
+    assert queue.journal.counts() == {"pending": 3, "failed": 0}
+    queue.journal.close()
+
+
+def test_success_resets_backoff(tmp_path, monkeypatch):
+    results = {"fail": True}
+
+    def persist(items):
+        if results["fail"]:
+            raise ConnectionError("down")
+        return [{"case_id": i} for i, _ in enumerate(items)]
+
+    queue, _ = _queue(tmp_path, monkeypatch, persist, batch_size=10, interval=0.1)
+
+    async def run():
+        await queue.enqueue("a@example.com", "t", "", None, {})
+        assert await queue.flush() == 0
+        results["fail"] = False
+        return await queue.flush()
+
+    assert asyncio.run(run()) == 1
+    assert queue.backoff() == 0
+    assert queue.journal.counts() == {"pending": 0, "failed": 0}
+    queue.journal.close()
+
+
+def test_flusher_does_not_spin_while_database_fails(tmp_path, monkeypatch):
+    queue, calls = _queue(tmp_path, monkeypatch, _down, batch_size=1, interval=0.01, max_backoff=10)
+
+    async def run():
+        for n in range(5):
+            await queue.enqueue("a@example.com", f"t{n}", "", None, {})
+        queue.start()
+        await asyncio.sleep(0.3)
+        task, queue._task = queue._task, None
+        task.cancel()
+
+    asyncio.run(run())
+    # 0.01 + 0.02 + 0.04 + 0.08 + 0.16 > 0.3: at most a handful of attempts, not one per tick
+    assert 1 <= len(calls) <= 6
+    queue.journal.close()
+
+
+def test_stop_gives_up_on_first_failed_flush(tmp_path, monkeypatch):
+    queue, calls = _queue(tmp_path, monkeypatch, _down, batch_size=2, interval=1)
+
+    async def run():
+        for n in range(6):
+            await queue.enqueue("a@example.com", f"t{n}", "", None, {})
+        await queue.stop(drain_timeout=5)
+
+    asyncio.run(run())
+    assert calls == [2]
+    assert _attempts(queue.journal) == [1, 1, 0, 0, 0, 0]
+    queue.journal.close()
+
+
+def test_journal_close_releases_connection_used_by_threads(tmp_path):
+    journal = Journal(str(tmp_path / "wb.sqlite"))
+
+    async def run():
+        await asyncio.gather(*(asyncio.to_thread(journal.append, {"n": n}) for n in range(8)))
+
+    asyncio.run(run())
+    journal.close()
+    journal.close()
+    assert journal._conn is None
+    reopened = Journal(journal.path)
+    assert reopened.counts() == {"pending": 8, "failed": 0}
+    reopened.close()
+
+
+def test_stop_lets_the_in_flight_flush_finish(tmp_path, monkeypatch):
+    async def slow_persist(items):
+        await asyncio.sleep(0.2)
+        return [{"case_id": n} for n in range(len(items))]
+
+    monkeypatch.setattr(write_behind, "persist_batch", slow_persist)
+    queue = WriteBehindQueue(Journal(str(tmp_path / "wb.sqlite")), batch_size=3, interval=10)
+
+    async def run():
+        queue.start()
+        for n in range(3):
+            await queue.enqueue("a@example.com", f"t{n}", "", None, {})  # the third wakes the flusher
+        await asyncio.sleep(0.05)  # flush is now waiting on the database
+        await queue.stop(drain_timeout=5)
+
+    asyncio.run(run())
+    assert queue.journal.counts() == {"pending": 0, "failed": 0}
+    queue.journal.close()
+
+
+def test_flush_cancelled_by_stop_timeout_unclaims_its_batch(tmp_path, monkeypatch):
+    async def hung_persist(items):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(write_behind, "persist_batch", hung_persist)
+    queue = WriteBehindQueue(Journal(str(tmp_path / "wb.sqlite")), batch_size=2, interval=10)
+
+    async def run():
+        queue.start()
+        for n in range(2):
+            await queue.enqueue("a@example.com", f"t{n}", "", None, {})
+        await asyncio.sleep(0.05)
+        await queue.stop(drain_timeout=0.2)
+
+    asyncio.run(run())
+    rows = queue.journal._conn.execute("SELECT claimed_by, attempts FROM pending").fetchall()
+    assert rows == [(None, 0), (None, 0)]
+    queue.journal.close()
@@ -0,0 +1,347 @@
+"""
+write_behind.py
+
+Optional write-behind queue for stored analyses. Instead of one session and
+transaction per request, analyses are appended to a durable journal (a WAL SQLite
+file, fsynced on commit) and the request returns as soon as the append commits.
+A background flusher drains the journal into the database in batches, using
+persistence.persist_batch() (multi-row INSERT ... RETURNING, one transaction per batch).
+
+A batch is flushed when WRITE_BEHIND_BATCH items are pending or WRITE_BEHIND_INTERVAL
+seconds have passed, and the journal is drained on shutdown. Entries are only deleted
+after their batch commits, so a crashed worker's entries are picked up again (by any
+worker sharing the journal) once their claim lease expires: delivery is at least once.
+After a failed flush the flusher backs off exponentially (interval, 2x, 4x, ... up to
+WRITE_BEHIND_MAX_BACKOFF) instead of retrying at the normal pace, and the shutdown drain
+stops at the first failure; what is left stays journaled for the next start.
+
+Configuration (environment):
+- WRITE_BEHIND: enable the queue for store=true analyses (default false)
+- WRITE_BEHIND_JOURNAL: journal file (default backend/.cache/write_behind.sqlite)
+- WRITE_BEHIND_BATCH: items per flush (default 100)
+- WRITE_BEHIND_INTERVAL: max seconds an item waits before a flush (default 1.0)
+- WRITE_BEHIND_LEASE: seconds before a claimed but unflushed batch is retried (default 60)
+- WRITE_BEHIND_MAX_ATTEMPTS: failed flushes before an entry is parked as failed (default 5)
+- WRITE_BEHIND_MAX_BACKOFF: max seconds between flush retries while the database fails (default 60)
+- WRITE_BEHIND_DRAIN_TIMEOUT: max seconds spent draining on shutdown (default 30)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from . import metrics
+    from .persistence import async_persistence_enabled, persist_batch, report_summary
+except Exception:
+    import metrics
+    from persistence import async_persistence_enabled, persist_batch, report_summary
+
+
+class Journal:
+    """
+    Durable FIFO of pending analyses, safe to share between worker processes. Within a
+    process one connection is shared by the flusher threads, guarded by a lock.
+    """
+
+    def __init__(self, path: str, lease: float = 60.0, max_attempts: int = 5):
+        self.path = path
+        self.lease = float(lease)
+        self.max_attempts = max(1, int(max_attempts))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        conn = self._conn
+        # FULL: a committed append survives power loss, which is what "enqueued" promises
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, enqueued_at REAL NOT NULL,"
+            " claimed_by TEXT, claimed_at REAL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " failed INTEGER NOT NULL DEFAULT 0, last_error TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_claim ON pending (failed, claimed_by, id)")
+
+    def append(self, payload: Dict[str, Any]) -> int:
+        data = json.dumps(payload, ensure_ascii=False, default=str)
+        with self._lock:
+            cur = self._conn.execute("INSERT INTO pending (payload, enqueued_at) VALUES (?, ?)", (data, time.time()))
+        return int(cur.lastrowid)
+
+    def claim(self, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """Claim up to limit unclaimed (or lease-expired) entries, oldest first."""
+        token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE pending SET claimed_by = ?, claimed_at = ? WHERE id IN ("
+                    " SELECT id FROM pending WHERE failed = 0 AND (claimed_by IS NULL OR claimed_at <= ?)"
+                    " ORDER BY id LIMIT ?)",
+                    (token, now, now - self.lease, int(limit)),
+                )
+                rows = conn.execute(
+                    "SELECT id, payload FROM pending WHERE claimed_by = ? ORDER BY id", (token,)
+                ).fetchall()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [(int(i), json.loads(p)) for i, p in rows]
+
+    def unclaim(self, ids: List[int]) -> None:
+        """Return claimed entries to the queue without counting an attempt."""
+        if ids:
+            with self._lock:
+                self._conn.execute(
+                    f"UPDATE pending SET claimed_by = NULL, claimed_at = NULL WHERE id IN ({','.join('?' * len(ids))})",
+                    ids,
+                )
+
+    def complete(self, ids: List[int]) -> None:
+        if ids:
+            with self._lock:
+                self._conn.execute(f"DELETE FROM pending WHERE id IN ({','.join('?' * len(ids))})", ids)
+
+    def release(self, ids: List[int], error: str) -> int:
+        """Return entries to the queue after a failed flush; returns how many were parked as failed."""
+        if not ids:
+            return 0
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"UPDATE pending SET claimed_by = NULL, claimed_at = NULL, attempts = attempts + 1,"
+                    f" last_error = ?, failed = (attempts + 1 >= ?) WHERE id IN ({marks})",
+                    (error, self.max_attempts, *ids),
+                )
+                parked = conn.execute(
+                    f"SELECT COUNT(*) FROM pending WHERE failed = 1 AND id IN ({marks})", ids
+                ).fetchone()[0]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return int(parked)
+
+    def fail(self, entries: List[Tuple[int, str]]) -> None:
+        """Park entries that can never succeed (e.g. unknown user) so they are not retried."""
+        if entries:
+            with self._lock:
+                self._conn.executemany(
+                    "UPDATE pending SET failed = 1, claimed_by = NULL, last_error = ? WHERE id = ?",
+                    [(err, i) for i, err in entries],
+                )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            pending, failed = self._conn.execute(
+                "SELECT COALESCE(SUM(failed = 0), 0), COALESCE(SUM(failed = 1), 0) FROM pending"
+            ).fetchone()
+        return {"pending": int(pending), "failed": int(failed)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class WriteBehindQueue:
+    def __init__(self, journal: Journal, batch_size: int = 100, interval: float = 1.0, max_backoff: float = 60.0):
+        self.journal = journal
+        self.batch_size = max(1, int(batch_size))
+        self.interval = max(0.01, float(interval))
+        self.max_backoff = max(self.interval, float(max_backoff))
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._since_flush = 0
+        # Consecutive failed flushes; drives the retry backoff
+        self._failures = 0
+
+    def start(self) -> None:
+        """Start the flusher (also replays entries left behind by a previous run)."""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def enqueue(
+        self,
+        user_email: str,
+        title: Optional[str],
+        issue_description: Optional[str],
+        classification: Any,
+        eligibility: Dict[str, Any],
+        final_report: Any = None,
+    ) -> Dict[str, Any]:
+        """Durably journal one analysis; returns once the append is committed to disk."""
+        payload = {
+            "user_email": user_email,
+            "title": title,
+            "issue_description": issue_description,
+            "classification": classification,
+            "eligibility": eligibility,
+            "summary": report_summary(final_report),
+            "at": datetime.utcnow().isoformat(),
+        }
+        journal_id = await asyncio.to_thread(self.journal.append, payload)
+        metrics.incr("write_behind.enqueued")
+        self._since_flush += 1
+        if self._since_flush >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return {"queued": True, "journal_id": journal_id}
+
+    def backoff(self) -> float:
+        """Seconds to wait before the next flush attempt after consecutive failures."""
+        if not self._failures:
+            return 0.0
+        return min(self.max_backoff, self.interval * 2 ** min(self._failures - 1, 30))
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            # Database failing: wait out the backoff; full batches must not trigger a retry
+            event = self._stop if self._failures else self._wake
+            try:
+                await asyncio.wait_for(event.wait(), timeout=self.backoff() or self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stop.is_set():
+                return
+            self._wake.clear()
+            try:
+                # Keep going while full batches are waiting
+                while await self.flush() >= self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception as e:
+                self._failures += 1
+                print(f"[write_behind] flush error: {e}")
+
+    async def flush(self) -> int:
+        """Write one batch to the database; returns the number of entries written (0 if it failed)."""
+        self._since_flush = 0
+        batch = await asyncio.to_thread(self.journal.claim, self.batch_size)
+        if not batch:
+            return 0
+        ids = [i for i, _ in batch]
+        started = time.perf_counter()
+        try:
+            results = await persist_batch([payload for _, payload in batch])
+        except asyncio.CancelledError:
+            # Hand the claim back now rather than after the lease, so the shutdown drain
+            # (or the next start) retries these entries; not counted as an attempt
+            self.journal.unclaim(ids)
+            raise
+        except Exception as e:
+            self._failures += 1
+            parked = await asyncio.to_thread(self.journal.release, ids, str(e))
+            metrics.incr("write_behind.flush_errors")
+            if parked:
+                metrics.incr("write_behind.failed", parked)
+            print(f"[write_behind] batch of {len(ids)} failed (retry in {self.backoff():.1f}s): {e}")
+            return 0
+        self._failures = 0
+        rejected = [(i, r["error"]) for i, r in zip(ids, results) if r.get("error")]
+        await asyncio.to_thread(self.journal.fail, rejected)
+        await asyncio.to_thread(self.journal.complete, [i for i, r in zip(ids, results) if not r.get("error")])
+        metrics.incr("write_behind.batches")
+        metrics.incr("write_behind.flushed", len(batch) - len(rejected))
+        if rejected:
+            metrics.incr("write_behind.failed", len(rejected))
+        metrics.set_gauge("write_behind.last_batch_ms", round((time.perf_counter() - started) * 1000, 1))
+        return len(batch)
+
+    async def stop(self, drain_timeout: float = 30.0) -> None:
+        """
+        Stop the flusher and drain what is left in the journal, all within drain_timeout.
+        A flush already in progress is allowed to finish first; only if it outlasts the
+        timeout is it cancelled (its entries are then unclaimed, not left leased).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        task, self._task = self._task, None
+        if task is not None:
+            self._stop.set()
+            self._wake.set()
+            try:
+                # wait_for cancels the task if the in-flight flush does not finish in time
+                await asyncio.wait_for(task, timeout=drain_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError, Exception):
+                pass
+
+        async def drain() -> None:
+            # flush() returns 0 on failure: stop there rather than spend the entries'
+            # attempts against a database that is down
+            self._failures = 0
+            while await self.flush():
+                pass
+            if self._failures:
+                print("[write_behind] drain stopped after a failed flush; entries stay journaled")
+
+        try:
+            await asyncio.wait_for(drain(), timeout=max(0.0, deadline - loop.time()))
+        except Exception as e:
+            # Whatever is left stays in the journal and is replayed on next start
+            print(f"[write_behind] drain incomplete: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.batch_size,
+            "interval": self.interval,
+            "running": self._task is not None,
+            "consecutive_failures": self._failures,
+            **self.journal.counts(),
+        }
+
+
+_QUEUE: Optional[WriteBehindQueue] = None
+
+
+def write_behind_enabled() -> bool:
+    if os.getenv("WRITE_BEHIND", "false").strip().lower() not in {"1", "true", "yes"}:
+        return False
+    return async_persistence_enabled()
+
+
+def get_write_behind() -> WriteBehindQueue:
+    global _QUEUE
+    if _QUEUE is None:
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "write_behind.sqlite")
+        journal = Journal(
+            os.getenv("WRITE_BEHIND_JOURNAL", default_path),
+            lease=float(os.getenv("WRITE_BEHIND_LEASE", "60")),
+            max_attempts=int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5")),
+        )
+        _QUEUE = WriteBehindQueue(
+            journal,
+            batch_size=int(os.getenv("WRITE_BEHIND_BATCH", "100")),
+            interval=float(os.getenv("WRITE_BEHIND_INTERVAL", "1.0")),
+            max_backoff=float(os.getenv("WRITE_BEHIND_MAX_BACKOFF", "60")),
+        )
+    return _QUEUE
+
+
+async def shutdown_write_behind() -> None:
+    """Flush-on-shutdown hook: drain the journal, then close it."""
+    global _QUEUE
+    queue, _QUEUE = _QUEUE, None
+    if queue is None:
+        return
+    await queue.stop(float(os.getenv("WRITE_BEHIND_DRAIN_TIMEOUT", "30")))
+    queue.journal.close()
@@ -0,0 +1,48 @@
+--
+-- 001: indexes for the keyset-paginated /dashboard/overview (backend/case/main.py)
+--
+-- Pages are read newest first, either by case id or by (updated_at, id), optionally
+-- filtered by case status, owner or needs_review. Each filter gets a composite index
+-- that ends in the sort key, so a page is one index range scan that stops after
+-- LIMIT rows instead of a sort over every matching case.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block:
+--   psql -d final5620 -f migrations/001_dashboard_overview_indexes.sql
+--
+
+-- updated_at is the keyset for order=updated_at. A NULL would sort first under DESC,
+-- cannot be encoded in a cursor, and fails the (updated_at, id) < (...) comparison,
+-- so such a case would be misplaced or skipped by later pages. Backfill from
+-- created_at (with the bump trigger off, which would otherwise stamp now()) and
+-- make the column NOT NULL; SET NOT NULL scans the table under an exclusive lock.
+BEGIN;
+ALTER TABLE public."case" DISABLE TRIGGER trg_case_bump_updated;
+UPDATE public."case" SET updated_at = coalesce(created_at, now()) WHERE updated_at IS NULL;
+ALTER TABLE public."case" ENABLE TRIGGER trg_case_bump_updated;
+ALTER TABLE public."case" ALTER COLUMN updated_at SET DEFAULT now(), ALTER COLUMN updated_at SET NOT NULL;
+COMMIT;
+
+-- ORDER BY id DESC with WHERE status = ... / user_id = ...
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_status_id ON public."case" USING btree (status, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_user_id ON public."case" USING btree (user_id, id DESC);
+
+-- Cases waiting for review are a small slice of the table: partial index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_review_id ON public."case" USING btree (id DESC) WHERE needs_review;
+
+-- ORDER BY updated_at DESC, id DESC (unfiltered and per status / per user)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_updated_id ON public."case" USING btree (updated_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_status_updated_id ON public."case" USING btree (status, updated_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_user_updated_id ON public."case" USING btree (user_id, updated_at DESC, id DESC);
+
+-- Latest decision per case (the LATERAL ... ORDER BY decided_at DESC LIMIT 1 in
+-- v_case_overview): one index probe, and INCLUDE makes it index-only
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_elig_case_decided
+    ON public.eligibility_decision USING btree (case_id, decided_at DESC) INCLUDE (status, lenient_flag);
+
+-- The single-column indexes are prefixes of the ones above
+DROP INDEX CONCURRENTLY IF EXISTS public.idx_case_status;
+DROP INDEX CONCURRENTLY IF EXISTS public.idx_case_user;
+DROP INDEX CONCURRENTLY IF EXISTS public.idx_elig_case;
+
+ANALYZE public."case";
+ANALYZE public.eligibility_decision;
@@ -0,0 +1,111 @@
+--
+-- 002: keep the latest eligibility decision on "case" instead of looking it up per row
+--
+-- v_case_overview used LEFT JOIN LATERAL (... ORDER BY decided_at DESC LIMIT 1) into
+-- eligibility_decision for every case it returned. trg_sync_case_status_fn already
+-- updates "case" on every decision insert, so it now also records the decision's
+-- status / lenient_flag / decided_at, and the view reads those columns directly.
+-- That also makes the view's eligibility_status filterable by index.
+--
+-- Run with psql, after 001 (the backfill commits in batches, the indexes are CONCURRENTLY):
+--   psql -d final5620 -f migrations/002_case_latest_decision.sql
+--
+
+-- 1) Columns (nullable, no default: instant on large tables)
+ALTER TABLE public."case"
+    ADD COLUMN IF NOT EXISTS latest_eligibility_status text,
+    ADD COLUMN IF NOT EXISTS latest_lenient_flag boolean,
+    ADD COLUMN IF NOT EXISTS latest_decided_at timestamp with time zone;
+
+-- 2) Triggers
+-- updated_at is a user-facing "last activity" time: let maintenance writes (the
+-- backfill below) opt out of the bump with SET app.skip_updated_bump = 'on'
+CREATE OR REPLACE FUNCTION public.trg_bump_case_updated_fn() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+  IF coalesce(current_setting('app.skip_updated_bump', true), '') = 'on' THEN
+    RETURN NEW;
+  END IF;
+  NEW.updated_at := now();
+  RETURN NEW;
+END$$;
+
+-- Case status follows the inserted decision as before; the latest_* columns follow the
+-- decision with the greatest decided_at. SET expressions all see the row's old values,
+-- so each CASE compares against the previous latest_decided_at.
+--
+-- Ordering rule, used by this trigger, the refresh trigger and the backfill alike:
+-- decided_at DESC NULLS LAST. A decision without a time (decided_at defaults to now(),
+-- so only an explicit NULL) never displaces a dated one. This differs from the old
+-- LATERAL, whose plain DESC put NULLs first; with no NULL decided_at rows the two agree.
+CREATE OR REPLACE FUNCTION public.trg_sync_case_status_fn() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+  UPDATE "case"
+     SET status = CASE
+                    WHEN NEW.status = 'eligible'      THEN 'eligible'
+                    WHEN NEW.status = 'needs_review'  THEN 'in_review'
+                    ELSE 'rejected'
+                  END,
+         needs_review = (NEW.status = 'needs_review'),
+         latest_eligibility_status = CASE WHEN latest_decided_at IS NULL OR NEW.decided_at >= latest_decided_at
+                                          THEN NEW.status ELSE latest_eligibility_status END,
+         latest_lenient_flag       = CASE WHEN latest_decided_at IS NULL OR NEW.decided_at >= latest_decided_at
+                                          THEN NEW.lenient_flag ELSE latest_lenient_flag END,
+         latest_decided_at         = CASE WHEN latest_decided_at IS NULL OR NEW.decided_at >= latest_decided_at
+                                          THEN NEW.decided_at ELSE latest_decided_at END
+   WHERE id = NEW.case_id;
+  RETURN NEW;
+END$$;
+
+-- Decisions are append-only in the application; if one is corrected or deleted by hand,
+-- recompute the affected case's latest_* columns from what is left
+CREATE OR REPLACE FUNCTION public.trg_refresh_case_latest_decision_fn() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+  UPDATE "case" c
+     SET (latest_eligibility_status, latest_lenient_flag, latest_decided_at) = (
+         SELECT e.status, e.lenient_flag, e.decided_at
+           FROM eligibility_decision e
+          WHERE e.case_id = c.id
+          ORDER BY e.decided_at DESC NULLS LAST
+          LIMIT 1)
+   WHERE c.id = OLD.case_id
+      OR (TG_OP = 'UPDATE' AND c.id = NEW.case_id);
+  RETURN NULL;
+END$$;
+
+ALTER FUNCTION public.trg_refresh_case_latest_decision_fn() OWNER TO postgres;
+
+DROP TRIGGER IF EXISTS trg_refresh_case_latest_decision ON public.eligibility_decision;
+CREATE TRIGGER trg_refresh_case_latest_decision
+    AFTER DELETE OR UPDATE OF case_id, status, lenient_flag, decided_at ON public.eligibility_decision
+    FOR EACH ROW EXECUTE FUNCTION public.trg_refresh_case_latest_decision_fn();
+
+-- 3) Backfill existing cases (batched, resumable, does not bump updated_at)
+\ir include/002_backfill_latest_decision.sql
+
+-- 4) The view reads the columns; same column names, order and types as before
+CREATE OR REPLACE VIEW public.v_case_overview AS
+ SELECT c.id AS case_id,
+    c.user_id,
+    c.status AS case_status,
+    c.needs_review,
+    c.latest_summary,
+    c.created_at,
+    c.updated_at,
+    c.latest_eligibility_status AS eligibility_status,
+    c.latest_lenient_flag AS lenient_flag,
+    c.latest_decided_at AS decided_at
+   FROM public."case" c;
+
+-- 5) eligibility_status is a plain column now: index it like the other dashboard filters
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_elig_id
+    ON public."case" USING btree (latest_eligibility_status, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_elig_updated_id
+    ON public."case" USING btree (latest_eligibility_status, updated_at DESC, id DESC);
+
+ANALYZE public."case";
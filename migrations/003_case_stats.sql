@@ -0,0 +1,170 @@
+--
+-- 003: case_stats, incrementally maintained dashboard counters
+--
+-- One row per (dimension, bucket, shard) holding a count:
+--   status              case.status
+--   needs_review        case.needs_review ('true' / 'false')
+--   eligibility_status  case.latest_eligibility_status (migration 002; 'none' if no decision)
+--   day                 case.created_at, UTC date
+--   classification      issue.classification ('unclassified' if NULL), counted per issue
+--
+-- Statement-level triggers on "case" and issue fold each statement's transition tables
+-- into +1/-1 deltas, so a multi-row INSERT (the write-behind flush) costs one upsert per
+-- touched bucket, not one per row. Eligibility decisions need no trigger of their own:
+-- trg_sync_case_status turns every decision into an UPDATE of "case", which is counted.
+-- Counts are spread over 16 shards (by case id) so concurrent writers to the same bucket
+-- do not queue on one row; readers sum the shards. That helps single-case writes; a
+-- statement whose rows span all shards (a large write-behind batch) still touches
+-- every shard of its buckets, so two such batches queue on each other just as without
+-- sharding. Every upsert writes its rows in (dimension, bucket, shard) order, so
+-- overlapping statements take the row locks in the same order and wait instead of
+-- deadlocking.
+--
+-- Rebuild from scratch (also run at the end of this migration):
+--   SELECT public.case_stats_rebuild();    or    python -m backend.case.reconcile_stats
+--
+--   psql -d final5620 -f migrations/003_case_stats.sql
+--
+
+CREATE TABLE IF NOT EXISTS public.case_stats (
+    dimension text NOT NULL,
+    bucket text NOT NULL,
+    shard smallint NOT NULL,
+    n bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, bucket, shard)
+);
+
+ALTER TABLE public.case_stats OWNER TO postgres;
+
+-- Buckets of a case row, for every counted dimension
+CREATE OR REPLACE FUNCTION public.case_stats_buckets(c public."case")
+    RETURNS TABLE (dimension text, bucket text)
+    LANGUAGE sql IMMUTABLE
+    AS $$
+  VALUES ('status', coalesce(c.status, 'none')),
+         ('needs_review', coalesce(c.needs_review, false)::text),
+         ('eligibility_status', coalesce(c.latest_eligibility_status, 'none')),
+         ('day', coalesce(((c.created_at AT TIME ZONE 'UTC')::date)::text, 'none'))
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_case_stats_case_fn() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+  -- Only the transition tables of the firing event exist, so each branch names its own
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO case_stats (dimension, bucket, shard, n)
+    SELECT b.dimension, b.bucket, (r.id % 16)::smallint, count(*)
+      FROM new_rows r CROSS JOIN LATERAL case_stats_buckets(r) b
+     GROUP BY 1, 2, 3
+     ORDER BY 1, 2, 3
+    ON CONFLICT (dimension, bucket, shard) DO UPDATE SET n = case_stats.n + EXCLUDED.n;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO case_stats (dimension, bucket, shard, n)
+    SELECT b.dimension, b.bucket, (r.id % 16)::smallint, -count(*)
+      FROM old_rows r CROSS JOIN LATERAL case_stats_buckets(r) b
+     GROUP BY 1, 2, 3
+     ORDER BY 1, 2, 3
+    ON CONFLICT (dimension, bucket, shard) DO UPDATE SET n = case_stats.n + EXCLUDED.n;
+  ELSE
+    -- Net change per bucket; updates that move no bucket (e.g. latest_summary) write nothing
+    INSERT INTO case_stats (dimension, bucket, shard, n)
+    SELECT dimension, bucket, shard, sum(delta)
+      FROM (SELECT b.dimension, b.bucket, (r.id % 16)::smallint AS shard, 1 AS delta
+              FROM new_rows r CROSS JOIN LATERAL case_stats_buckets(r) b
+            UNION ALL
+            SELECT b.dimension, b.bucket, (r.id % 16)::smallint, -1
+              FROM old_rows r CROSS JOIN LATERAL case_stats_buckets(r) b) d
+     GROUP BY 1, 2, 3
+    HAVING sum(delta) <> 0
+     ORDER BY 1, 2, 3
+    ON CONFLICT (dimension, bucket, shard) DO UPDATE SET n = case_stats.n + EXCLUDED.n;
+  END IF;
+  RETURN NULL;
+END$$;
+
+CREATE OR REPLACE FUNCTION public.trg_case_stats_issue_fn() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO case_stats (dimension, bucket, shard, n)
+    SELECT 'classification', coalesce(r.classification, 'unclassified'), (r.case_id % 16)::smallint, count(*)
+      FROM new_rows r
+     GROUP BY 1, 2, 3
+     ORDER BY 1, 2, 3
+    ON CONFLICT (dimension, bucket, shard) DO UPDATE SET n = case_stats.n + EXCLUDED.n;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO case_stats (dimension, bucket, shard, n)
+    SELECT 'classification', coalesce(r.classification, 'unclassified'), (r.case_id % 16)::smallint, -count(*)
+      FROM old_rows r
+     GROUP BY 1, 2, 3
+     ORDER BY 1, 2, 3
+    ON CONFLICT (dimension, bucket, shard) DO UPDATE SET n = case_stats.n + EXCLUDED.n;
+  ELSE
+    INSERT INTO case_stats (dimension, bucket, shard, n)
+    SELECT 'classification', bucket, shard, sum(delta)
+      FROM (SELECT coalesce(r.classification, 'unclassified') AS bucket, (r.case_id % 16)::smallint AS shard, 1 AS delta
+              FROM new_rows r
+            UNION ALL
+            SELECT coalesce(r.classification, 'unclassified'), (r.case_id % 16)::smallint, -1
+              FROM old_rows r) d
+     GROUP BY 1, 2, 3
+    HAVING sum(delta) <> 0
+     ORDER BY 1, 2, 3
+    ON CONFLICT (dimension, bucket, shard) DO UPDATE SET n = case_stats.n + EXCLUDED.n;
+  END IF;
+  RETURN NULL;
+END$$;
+
+ALTER FUNCTION public.trg_case_stats_case_fn() OWNER TO postgres;
+ALTER FUNCTION public.trg_case_stats_issue_fn() OWNER TO postgres;
+
+-- Transition tables allow one event per trigger, hence three per table
+DROP TRIGGER IF EXISTS trg_case_stats_ins ON public."case";
+DROP TRIGGER IF EXISTS trg_case_stats_upd ON public."case";
+DROP TRIGGER IF EXISTS trg_case_stats_del ON public."case";
+CREATE TRIGGER trg_case_stats_ins AFTER INSERT ON public."case"
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.trg_case_stats_case_fn();
+CREATE TRIGGER trg_case_stats_upd AFTER UPDATE ON public."case"
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.trg_case_stats_case_fn();
+CREATE TRIGGER trg_case_stats_del AFTER DELETE ON public."case"
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION public.trg_case_stats_case_fn();
+
+DROP TRIGGER IF EXISTS trg_case_stats_ins ON public.issue;
+DROP TRIGGER IF EXISTS trg_case_stats_upd ON public.issue;
+DROP TRIGGER IF EXISTS trg_case_stats_del ON public.issue;
+CREATE TRIGGER trg_case_stats_ins AFTER INSERT ON public.issue
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.trg_case_stats_issue_fn();
+CREATE TRIGGER trg_case_stats_upd AFTER UPDATE ON public.issue
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION public.trg_case_stats_issue_fn();
+CREATE TRIGGER trg_case_stats_del AFTER DELETE ON public.issue
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION public.trg_case_stats_issue_fn();
+
+-- Recount everything. The EXCLUSIVE lock lets readers continue but makes concurrent
+-- writers' trigger upserts wait, so their deltas land on top of the rebuilt counts.
+CREATE OR REPLACE FUNCTION public.case_stats_rebuild() RETURNS bigint
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+  rows_written bigint;
+BEGIN
+  LOCK TABLE case_stats IN EXCLUSIVE MODE;
+  DELETE FROM case_stats;
+  INSERT INTO case_stats (dimension, bucket, shard, n)
+  SELECT b.dimension, b.bucket, (c.id % 16)::smallint, count(*)
+    FROM "case" c CROSS JOIN LATERAL case_stats_buckets(c) b
+   GROUP BY 1, 2, 3
+   ORDER BY 1, 2, 3;
+  INSERT INTO case_stats (dimension, bucket, shard, n)
+  SELECT 'classification', coalesce(i.classification, 'unclassified'), (i.case_id % 16)::smallint, count(*)
+    FROM issue i
+   GROUP BY 1, 2, 3
+   ORDER BY 1, 2, 3;
+  SELECT count(*) INTO rows_written FROM case_stats;
+  RETURN rows_written;
+END$$;
+
+ALTER FUNCTION public.case_stats_rebuild() OWNER TO postgres;
+
+SELECT public.case_stats_rebuild();
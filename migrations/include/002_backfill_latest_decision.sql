@@ -0,0 +1,45 @@
+--
+-- 002 backfill: copy each case's latest eligibility decision into case.latest_*
+--
+-- Included by ../002_case_latest_decision.sql (kept in include/ so that running the
+-- top-level migrations in name order never runs it before the columns exist); safe to
+-- re-run on its own. Walks case ids
+-- in batches and commits after each one, so locks are short and an interrupted run
+-- simply continues. Cases already kept current by the trigger are left untouched
+-- (IS DISTINCT FROM), and updated_at is not bumped. Decisions without a decided_at
+-- rank after dated ones (NULLS LAST), as in the triggers of 002.
+--
+-- Needs PostgreSQL 11+ and psql's default autocommit mode (COMMIT inside DO).
+--
+
+DO $$
+DECLARE
+  batch_size constant bigint := 10000;
+  lo bigint;
+  max_id bigint;
+  touched bigint := 0;
+  n bigint;
+BEGIN
+  SELECT min(id), max(id) INTO lo, max_id FROM "case";
+  WHILE lo IS NOT NULL AND lo <= max_id LOOP
+    PERFORM set_config('app.skip_updated_bump', 'on', true);
+    UPDATE "case" c
+       SET latest_eligibility_status = d.status,
+           latest_lenient_flag       = d.lenient_flag,
+           latest_decided_at         = d.decided_at
+      FROM (SELECT DISTINCT ON (e.case_id) e.case_id, e.status, e.lenient_flag, e.decided_at
+              FROM eligibility_decision e
+             WHERE e.case_id >= lo AND e.case_id < lo + batch_size
+             ORDER BY e.case_id, e.decided_at DESC NULLS LAST) d
+     WHERE c.id = d.case_id
+       AND (c.latest_eligibility_status, c.latest_lenient_flag, c.latest_decided_at)
+           IS DISTINCT FROM (d.status, d.lenient_flag, d.decided_at)
+       -- a decision inserted while this runs is newer than our snapshot: keep the trigger's value
+       AND (c.latest_decided_at IS NULL OR d.decided_at >= c.latest_decided_at);
+    GET DIAGNOSTICS n = ROW_COUNT;
+    touched := touched + n;
+    COMMIT;
+    lo := lo + batch_size;
+  END LOOP;
+  RAISE NOTICE 'latest decision backfill: % cases updated', touched;
+END$$;